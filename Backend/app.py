@@ -1,25 +1,48 @@
+import time
+_BOOT_STARTED = time.perf_counter()
+
+# eventlet debe parchear la librería estándar antes de importar el resto
+# (lo necesitan la cola de mensajes de SocketIO y el pool de conexiones)
+import eventlet
+eventlet.monkey_patch()
+
 import os
 import jwt
-import requests
+import click
 from datetime import datetime, timedelta
 from functools import wraps
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g
 from flask_socketio import SocketIO
+from src.config.database import Database
+from src.config.settings import (
+    SOCKETIO_MESSAGE_QUEUE, SOCKETIO_CHANNEL, UPLOAD_MAX_BYTES, UPLOAD_FOLDER, METRICS_USER_IDS
+)
+from src.services.metrics import Metrics
+from src.sockets import socket_json
 
 # Configuración Flask
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('FLASK_SECRET', 'tu_clave_secreta')
-app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(__file__), 'static', 'uploads')
+app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET', '1')
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(minutes=1440)
+# Werkzeug corta el cuerpo al pasar este límite mientras lo lee (413),
+# en lugar de aceptarlo entero y comprobar el tamaño después
+app.config['MAX_CONTENT_LENGTH'] = UPLOAD_MAX_BYTES + 1024 * 1024  # + cabeceras multipart
 
-# Configuración SocketIO
+# Configuración SocketIO (con SOCKETIO_MESSAGE_QUEUE varios workers comparten salas)
 socketio = SocketIO(app,
                     cors_allowed_origins="*",
                     async_mode='eventlet',
+                    message_queue=SOCKETIO_MESSAGE_QUEUE,
+                    channel=SOCKETIO_CHANNEL,
+                    json=socket_json,
                     logger=True,
                     engineio_logger=True)
 
+# Métricas de arranque: importación del módulo y primera petición servida
+startup_stats = {'import_seconds': None, 'first_request_seconds': None}
+
 # Crear carpeta de uploads si no existe
 if not os.path.exists(app.config['UPLOAD_FOLDER']):
     os.makedirs(app.config['UPLOAD_FOLDER'])
@@ -44,6 +67,17 @@ def token_required(f):
         return f(*args, **kwargs)
     return decorated
 
+# Un UnitOfWork por petición: los modelos comparten una conexión del pool
+@app.before_request
+def open_db_scope():
+    g.db_scope_token = Database.begin_scope()
+
+@app.teardown_request
+def close_db_scope(exc):
+    token = g.pop('db_scope_token', None)
+    if token is not None:
+        Database.end_scope(token)
+
 # Configuración CORS
 @app.after_request
 def after_request(response):
@@ -53,6 +87,13 @@ def after_request(response):
     response.headers.add('Access-Control-Allow-Credentials', 'true')
     return response
 
+@app.after_request
+def record_first_request(response):
+    if startup_stats['first_request_seconds'] is None:
+        startup_stats['first_request_seconds'] = round(time.perf_counter() - _BOOT_STARTED, 4)
+        print(f"⏱️ Primera petición servida {startup_stats['first_request_seconds']}s tras importar app")
+    return response
+
 # Importar blueprints
 from src.routes.auth import auth_bp
 from src.routes.users import users_bp
@@ -64,6 +105,8 @@ from src.routes.periods import period_bp
 from src.routes.emergency_contacts import contacts_bp
 from src.routes.resources import resources_bp
 from src.routes.chat import chats_bp
+from src.routes.sync import sync_bp
+from src.routes.uploads import uploads_bp
 
 # Registrar todos los blueprints
 app.register_blueprint(auth_bp, url_prefix='/api/auth')
@@ -76,11 +119,19 @@ app.register_blueprint(period_bp, url_prefix='/api/period')
 app.register_blueprint(contacts_bp, url_prefix='/api/emergency-contacts')
 app.register_blueprint(resources_bp, url_prefix='/api/resources')
 app.register_blueprint(chats_bp, url_prefix='/api/chats')
+app.register_blueprint(sync_bp, url_prefix='/api/sync')
+app.register_blueprint(uploads_bp)
 
 # Importar y registrar namespaces de SocketIO
 from src.sockets.chat import ChatNamespace
 socketio.on_namespace(ChatNamespace('/chat'))
 
+# Registrar métricas de arranque y precalentar el pool en segundo plano
+# (la conexión a la BD ya no se abre al importar: si no responde, arranca igual)
+Metrics.register('startup', lambda: dict(startup_stats))
+socketio.start_background_task(Database.warm_up)
+startup_stats['import_seconds'] = round(time.perf_counter() - _BOOT_STARTED, 4)
+
 # Ruta de prueba
 @app.route('/')
 def home():
@@ -98,7 +149,8 @@ def home():
             "events": "/api/events",
             "periods": "/api/period",
             "contacts": "/api/emergency-contacts",
-            "resources": "/api/resources"
+            "resources": "/api/resources",
+            "sync": "/api/sync"
         }
     })
 
@@ -111,9 +163,20 @@ def status_check():
         "socketio": "running"
     })
 
+# Métricas del proceso (pool de conexiones, cachés, sockets...). Sin
+# consultar la BD, para que respondan aunque el pool esté agotado
+@app.route('/api/metrics')
+@token_required
+def metrics():
+    if request.user_id not in METRICS_USER_IDS:
+        return jsonify({"error": "No autorizado"}), 403
+    return jsonify(Metrics.snapshot())
+
 # ➕ RUTA INTEGRADA: Obtener empleos desde Adzuna API
 @app.route('/api/jobs/adzuna', methods=['GET'])
 def get_adzuna_jobs():
+    import requests  # solo lo usa esta ruta; no se carga al arrancar
+
     query = request.args.get('q', '')
     location = request.args.get('loc', '')
 
@@ -158,6 +221,43 @@ def get_adzuna_jobs():
 
     return jsonify(all_jobs)
 
+# Comandos de mantenimiento (flask --app app <comando>)
+@app.cli.command('rebuild-chat-summaries')
+@click.option('--chat-id', type=int, default=None, help='Reconstruye solo este chat')
+def rebuild_chat_summaries(chat_id):
+    """Reconstruye chat_summaries y los contadores de no leídos"""
+    from src.models.chat import Chat
+    result = Chat.rebuild_summaries(chat_id)
+    click.echo(f"Resúmenes actualizados: {result['summaries']}, "
+               f"participantes recalculados: {result['participants']}")
+
+@app.cli.command('prune-uploads')
+@click.option('--max-age', type=int, default=None, help='Segundos sin actividad')
+def prune_uploads(max_age):
+    """Borra las subidas por partes abandonadas"""
+    from src.routes.chat import chunked_uploads
+    from src.config.settings import UPLOAD_INCOMPLETE_TTL
+    removed = chunked_uploads.prune_incomplete(max_age or UPLOAD_INCOMPLETE_TTL)
+    click.echo(f"Subidas incompletas eliminadas: {removed}")
+
+@app.cli.command('gc-uploads')
+@click.option('--grace', type=int, default=None, help='Segundos sin uso antes de borrar un blob')
+def gc_uploads(grace):
+    """Borra los adjuntos que ya no usa ningún mensaje"""
+    from src.routes.chat import blob_store
+    from src.config.settings import UPLOAD_BLOB_GRACE
+    removed, freed = blob_store.collect_garbage(UPLOAD_BLOB_GRACE if grace is None else grace)
+    click.echo(f"Blobs eliminados: {removed} ({freed} bytes liberados)")
+
+@app.cli.command('prune-change-log')
+@click.option('--days', type=int, default=None, help='Antigüedad máxima a conservar')
+def prune_change_log(days):
+    """Borra entradas antiguas de change_log (sincronización incremental)"""
+    from src.models.change_log import ChangeLog
+    from src.config.settings import CHANGE_LOG_RETENTION_DAYS
+    deleted = ChangeLog.prune(days or CHANGE_LOG_RETENTION_DAYS)
+    click.echo(f"Entradas eliminadas: {deleted}")
+
 # Manejo de errores global
 @app.errorhandler(400)
 def bad_request(error):
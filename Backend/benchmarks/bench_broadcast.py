@@ -0,0 +1,107 @@
+"""Prueba de carga: rendimiento de difusión en salas con varios workers.
+
+Conecta --listeners clientes al namespace /chat repartidos en round-robin
+entre los workers, todos unidos al mismo chat, y un emisor en el primer
+worker envía --messages mensajes. Mide entregas por segundo (mensajes x
+oyentes) hasta que todos los oyentes los reciben.
+
+Con --spawn N arranca N workers locales (python app.py, puertos desde
+--base-port) compartiendo SOCKETIO_MESSAGE_QUEUE, que debe apuntar a un
+servidor compatible con Redis, p. ej. redis://localhost:6379/0.
+
+Uso (desde Backend/):
+    SOCKETIO_MESSAGE_QUEUE=redis://localhost:6379/0 \\
+    python -m benchmarks.bench_broadcast --spawn 1 --chat-id 1 --user-id 1 --token $JWT
+    ... --spawn 2, --spawn 4 para ver cómo escala
+    python -m benchmarks.bench_broadcast --url http://localhost:5001 --url http://localhost:5002 ...
+"""
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import socketio
+
+
+def spawn_workers(count, base_port):
+    processes = []
+    for i in range(count):
+        env = dict(os.environ, PORT=str(base_port + i))
+        processes.append(subprocess.Popen([sys.executable, 'app.py'], env=env,
+                                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+    time.sleep(3)
+    return processes, [f"http://localhost:{base_port + i}" for i in range(count)]
+
+
+def connect(url, token):
+    client = socketio.Client(reconnection=False)
+    client.connect(url, namespaces=['/chat'], transports=['websocket'],
+                   headers={'Authorization': f'Bearer {token}'} if token else None,
+                   auth={'token': token} if token else None)
+    return client
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', action='append', default=[], help='URL de un worker (repetible)')
+    parser.add_argument('--spawn', type=int, default=0, help='Workers locales a arrancar')
+    parser.add_argument('--base-port', type=int, default=5101)
+    parser.add_argument('--chat-id', type=int, required=True)
+    parser.add_argument('--user-id', type=int, required=True)
+    parser.add_argument('--token', default=None, help='JWT para autenticar los sockets')
+    parser.add_argument('--listeners', type=int, default=50)
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--timeout', type=float, default=60)
+    args = parser.parse_args()
+
+    processes = []
+    urls = list(args.url)
+    if args.spawn:
+        processes, urls = spawn_workers(args.spawn, args.base_port)
+    if not urls:
+        parser.error('Indica --url o --spawn')
+
+    received = [0]
+    lock = threading.Lock()
+    done = threading.Event()
+    expected = args.listeners * args.messages
+    clients = []
+
+    def on_new_message(data):
+        with lock:
+            received[0] += 1
+            if received[0] >= expected:
+                done.set()
+
+    try:
+        for i in range(args.listeners):
+            client = connect(urls[i % len(urls)], args.token)
+            client.on('new_message', on_new_message, namespace='/chat')
+            client.emit('join_chat', {'chat_id': args.chat_id, 'user_id': args.user_id},
+                        namespace='/chat')
+            clients.append(client)
+        sender = connect(urls[0], args.token)
+        clients.append(sender)
+        time.sleep(1)
+
+        start = time.perf_counter()
+        for i in range(args.messages):
+            sender.emit('new_message', {'chat_id': args.chat_id, 'user_id': args.user_id,
+                                        'content': f'bench {i}'}, namespace='/chat')
+        done.wait(args.timeout)
+        elapsed = time.perf_counter() - start
+
+        print(f"workers={len(urls)} oyentes={args.listeners} mensajes={args.messages}")
+        print(f"entregas={received[0]}/{expected} en {elapsed:.2f}s "
+              f"-> {received[0] / elapsed:.1f} entregas/s")
+    finally:
+        for client in clients:
+            client.disconnect()
+        for process in processes:
+            process.terminate()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Benchmark de la codificación de new_message: JSON frente a MessagePack compacto.
+
+Genera mensajes realistas (contenido variable, nombres y URLs de avatar de
+los remitentes) para una sala pequeña y otra grande y mide, por mensaje:
+bytes del frame, CPU de codificación y bytes totales enviados a la sala.
+En la compacta se suma, amortizado, el evento 'profiles' que recibe cada
+miembro al unirse. Una difusión se codifica una vez por sala en los dos
+casos, así que la CPU no depende del tamaño de la sala; los bytes sí.
+
+No necesita BD ni servidor. Uso (desde Backend/):
+    python -m benchmarks.bench_encoding --messages 2000
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from src.sockets import encoding, socket_json
+from src.sockets.chat import versioned
+
+WORDS = ('hola', 'qué', 'tal', 'mañana', 'examen', 'clase', 'nos', 'vemos',
+         'gracias', 'ánimo', 'tarea', 'biblioteca', 'a', 'las', 'cinco', 'ok')
+
+
+def build_room(members, senders, messages, seed=1):
+    rng = random.Random(seed)
+    users = [{
+        'id': 1000 + i,
+        'name': f"Estudiante {i} {rng.choice(('García', 'López', 'Quispe', 'Mamani'))}",
+        'avatar_url': f"https://cdn.unipulse.app/avatars/{1000 + i}/{rng.getrandbits(64):016x}.jpg"
+    } for i in range(members)]
+    start = datetime(2025, 5, 1, 9, 0, 0)
+    payloads = []
+    for n in range(messages):
+        sender = users[rng.randrange(min(senders, members))]
+        payloads.append({'chat_id': 42, 'message': {
+            'id': 500000 + n,
+            'chat_id': 42,
+            'user_id': sender['id'],
+            'content': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 25))),
+            'message_type': 'text',
+            'file_url': None,
+            'file_size': None,
+            'sent_at': start + timedelta(seconds=n * 7),
+            'read_at': None,
+            'status': 'sent',
+            'message_status': 'sent',
+            'user_name': sender['name'],
+            'user_avatar': sender['avatar_url']
+        }})
+    return users, payloads
+
+
+def measure(encode, payloads, repeat):
+    sizes = [len(encode(versioned(p))) for p in payloads]
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for payload in payloads:
+            encode(versioned(payload))
+    seconds = (time.perf_counter() - start) / (repeat * len(payloads))
+    return sum(sizes) / len(sizes), seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    if encoding.msgpack is None:
+        raise SystemExit('Falta msgpack (pip install -r requirements.txt)')
+
+    rooms = (('sala pequeña', 2, 2), ('sala grande', 200, 50))
+    print(f"{'sala':<14}{'codificación':<14}{'bytes/msg':>10}{'µs/msg':>9}{'bytes a la sala/msg':>22}")
+    for label, members, senders in rooms:
+        users, payloads = build_room(members, senders, args.messages)
+        json_bytes, json_cpu = measure(lambda d: socket_json.dumps(d, separators=(',', ':')),
+                                       payloads, args.repeat)
+        compact_bytes, compact_cpu = measure(encoding.encode, payloads, args.repeat)
+        # Cada miembro recibe una vez la tabla de perfiles al unirse
+        profiles = len(encoding.encode(versioned(encoding.profiles_payload(users))))
+        amortized = compact_bytes + profiles / len(payloads)
+        print(f"{label:<14}{'json':<14}{json_bytes:>10.1f}{json_cpu * 1e6:>9.2f}"
+              f"{json_bytes * members:>22.0f}")
+        print(f"{label:<14}{'msgpack':<14}{amortized:>10.1f}{compact_cpu * 1e6:>9.2f}"
+              f"{amortized * members:>22.0f}")
+        print(f"{'':<14}{'ahorro':<14}{1 - amortized / json_bytes:>10.0%}")
+
+
+if __name__ == '__main__':
+    main()
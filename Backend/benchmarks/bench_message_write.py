@@ -0,0 +1,81 @@
+"""Benchmark del camino de escritura de mensajes con remitentes concurrentes.
+
+Compara el camino anterior (INSERT en una conexión + Chat.update_last_message
+en una segunda conexión con SELECT ... FOR UPDATE antes del commit) con el
+camino actual de Message.create (una transacción, una conexión).
+
+Uso (desde Backend/, contra una base de datos de pruebas):
+    python -m benchmarks.bench_message_write --chat-id 1 --user-id 1 \\
+        --senders 8 --messages 200
+"""
+import argparse
+import threading
+import time
+
+from src.config.database import Database
+from src.models.chat import Chat, Message
+
+
+def legacy_create(chat_id, user_id, content):
+    """Reproduce el camino de escritura anterior (dos conexiones del pool)"""
+    connection = Database.get_connection()
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute(
+            """INSERT INTO messages 
+            (chat_id, user_id, content, message_type, sent_at, status) 
+            VALUES (%s, %s, %s, 'text', NOW(), 'sent')""",
+            (chat_id, user_id, content)
+        )
+        Chat.update_last_message(chat_id)
+        message_id = cursor.lastrowid
+        connection.commit()
+        return message_id
+    except Exception as e:
+        connection.rollback()
+        print(f"Error en legacy_create(): {str(e)}")
+        return 0
+    finally:
+        Database.close_connection(connection, cursor)
+
+
+def current_create(chat_id, user_id, content):
+    return Message.create(chat_id, user_id, content)
+
+
+def run(write, chat_id, user_id, senders, messages):
+    errors = []
+
+    def sender(n):
+        for i in range(messages):
+            if not write(chat_id, user_id, f"bench {n}-{i}"):
+                errors.append(1)
+
+    threads = [threading.Thread(target=sender, args=(n,)) for n in range(senders)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    total = senders * messages
+    return total / elapsed, len(errors), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--chat-id', type=int, required=True)
+    parser.add_argument('--user-id', type=int, required=True)
+    parser.add_argument('--senders', type=int, default=8)
+    parser.add_argument('--messages', type=int, default=200, help='Mensajes por remitente')
+    args = parser.parse_args()
+
+    for name, write in (('antes (2 conexiones)', legacy_create),
+                        ('después (1 transacción)', current_create)):
+        rate, errors, elapsed = run(write, args.chat_id, args.user_id,
+                                    args.senders, args.messages)
+        print(f"{name:26s} {rate:9.1f} msg/s  errores={errors}  tiempo={elapsed:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
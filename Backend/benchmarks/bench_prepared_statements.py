@@ -0,0 +1,108 @@
+"""Micro-benchmark: protocolo de texto vs sentencias preparadas en caché.
+
+Ejecuta las diez consultas más frecuentes de los modelos N veces con un
+cursor normal y con un cursor preparado reutilizado (lo que hace la caché de
+DB_PREPARED_STATEMENTS) y muestra el tiempo medio por ejecución. Las
+escrituras se hacen dentro de una transacción que se revierte al final.
+
+Uso (desde Backend/, contra una base de datos de pruebas):
+    python -m benchmarks.bench_prepared_statements --chat-id 1 --user-id 1 -n 500
+"""
+import argparse
+import time
+
+import mysql.connector
+from src.config import settings
+
+
+def top_queries(chat_id, user_id):
+    return [
+        ("insertar mensaje",
+         """INSERT INTO messages 
+         (chat_id, user_id, content, message_type, file_url, file_size, sent_at, status) 
+         VALUES (%s, %s, %s, %s, %s, %s, NOW(), 'sent')""",
+         (chat_id, user_id, 'bench', 'text', None, None)),
+        ("historial de mensajes",
+         """SELECT m.id, m.chat_id, m.user_id, m.content, m.message_type, 
+         m.file_url, m.file_size, m.sent_at, m.read_at, 
+         m.status as message_status, u.name as user_name, u.avatar_url as user_avatar
+         FROM messages m JOIN users u ON m.user_id = u.id
+         WHERE m.chat_id = %s AND m.deleted_at IS NULL ORDER BY m.id DESC LIMIT %s""",
+         (chat_id, 50)),
+        ("mensaje por id",
+         """SELECT m.*, u.name as user_name, u.avatar_url as user_avatar
+         FROM messages m JOIN users u ON m.user_id = u.id
+         WHERE m.id = %s AND m.deleted_at IS NULL""",
+         (1,)),
+        ("User.get_by_id / perfil JWT",
+         """SELECT id, email, name, lastname_paternal, lastname_maternal,
+         avatar_url, bio, currently_working, working_hours_per_day,
+         stress_frequency, points, language, theme, created_at
+         FROM users WHERE id = %s""",
+         (user_id,)),
+        ("perfil del remitente",
+         "SELECT name, avatar_url FROM users WHERE id = %s",
+         (user_id,)),
+        ("bandeja de chats",
+         """SELECT c.id, c.name, c.is_group, c.theme, c.photo_url, c.last_message_at,
+         cp.unread_count, s.last_message_id, s.last_message_preview, s.last_message_sender
+         FROM chat_participants cp JOIN chats c ON c.id = cp.chat_id
+         LEFT JOIN chat_summaries s ON s.chat_id = c.id
+         WHERE cp.user_id = %s AND cp.left_at IS NULL ORDER BY c.last_message_at DESC""",
+         (user_id,)),
+        ("participantes",
+         """SELECT u.id, u.name, u.avatar_url, cp.is_admin, cp.joined_at, cp.status
+         FROM users u JOIN chat_participants cp ON u.id = cp.user_id
+         WHERE cp.chat_id = %s AND cp.left_at IS NULL""",
+         (chat_id,)),
+        ("no leídos +1",
+         """UPDATE chat_participants SET unread_count = unread_count + 1 
+         WHERE chat_id = %s AND user_id != %s AND left_at IS NULL""",
+         (chat_id, user_id)),
+        ("last_message_at",
+         "UPDATE chats SET last_message_at = NOW() WHERE id = %s",
+         (chat_id,)),
+        ("notas del usuario",
+         "SELECT id, title, content, color, pinned FROM notes WHERE user_id = %s",
+         (user_id,)),
+    ]
+
+
+def measure(connection, sql, params, n, prepared):
+    cursor = connection.cursor(prepared=prepared, dictionary=True)
+    try:
+        start = time.perf_counter()
+        for _ in range(n):
+            cursor.execute(sql, params)
+            if cursor.with_rows:
+                cursor.fetchall()
+        return (time.perf_counter() - start) / n
+    finally:
+        cursor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--chat-id', type=int, required=True)
+    parser.add_argument('--user-id', type=int, required=True)
+    parser.add_argument('-n', type=int, default=500, help='Ejecuciones por consulta')
+    args = parser.parse_args()
+
+    connection = mysql.connector.connect(
+        host=settings.DB_HOST, port=settings.DB_PORT, user=settings.DB_USER,
+        password=settings.DB_PASSWORD, database=settings.DB_NAME)
+    try:
+        connection.start_transaction()
+        print(f"{'consulta':30s} {'texto (µs)':>12s} {'preparada (µs)':>15s} {'ahorro':>8s}")
+        for name, sql, params in top_queries(args.chat_id, args.user_id):
+            text = measure(connection, sql, params, args.n, prepared=False)
+            prepared = measure(connection, sql, params, args.n, prepared=True)
+            saving = (1 - prepared / text) * 100 if text else 0
+            print(f"{name:30s} {text * 1e6:12.1f} {prepared * 1e6:15.1f} {saving:7.1f}%")
+    finally:
+        connection.rollback()
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
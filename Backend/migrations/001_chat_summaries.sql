@@ -0,0 +1,20 @@
+-- Resumen desnormalizado por chat para la bandeja de entrada (GET /api/chats/).
+-- Se mantiene desde Message.create / Message.delete / Message.mark_as_read
+-- y se reconstruye con `flask rebuild-chat-summaries`.
+
+CREATE TABLE IF NOT EXISTS chat_summaries (
+    chat_id INT NOT NULL PRIMARY KEY,
+    last_message_id INT NULL,
+    last_message_preview VARCHAR(255) NULL,
+    last_message_sender VARCHAR(255) NULL,
+    last_message_sender_id INT NULL,
+    last_message_at DATETIME NULL,
+    CONSTRAINT fk_chat_summaries_chat FOREIGN KEY (chat_id) REFERENCES chats(id) ON DELETE CASCADE
+);
+
+-- Contador de no leídos por participante
+ALTER TABLE chat_participants
+    ADD COLUMN unread_count INT NOT NULL DEFAULT 0;
+
+-- La bandeja filtra por usuario y participantes activos
+CREATE INDEX idx_chat_participants_user ON chat_participants (user_id, left_at, chat_id);
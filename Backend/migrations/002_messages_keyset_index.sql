@@ -0,0 +1,2 @@
+-- Paginación por keyset del historial: WHERE chat_id = ? AND id < / > ? ORDER BY id
+CREATE INDEX idx_messages_chat_id_id ON messages (chat_id, id);
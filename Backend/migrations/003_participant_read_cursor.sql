@@ -0,0 +1,16 @@
+-- Estado de lectura por participante: último mensaje leído de cada uno.
+-- Los no leídos son los mensajes de otros con id > last_read_message_id
+-- (rango sobre idx_messages_chat_id_id) y se mantienen en unread_count.
+
+ALTER TABLE chat_participants
+    ADD COLUMN last_read_message_id INT NULL;
+
+-- Punto de partida: lo último que el participante envió o que ya figuraba
+-- como leído con el read_at global anterior
+UPDATE chat_participants cp
+SET cp.last_read_message_id = (
+    SELECT MAX(m.id) FROM messages m
+    WHERE m.chat_id = cp.chat_id
+    AND (m.user_id = cp.user_id OR m.read_at IS NOT NULL));
+
+-- Después ejecutar: flask --app app rebuild-chat-summaries
@@ -0,0 +1,23 @@
+-- Registro de cambios por usuario para la sincronización incremental
+-- (GET /api/sync?since=<token>). El id autoincremental es la versión: es
+-- monótono para cada usuario y el token del cliente es el último id aplicado.
+-- op = 'upsert' (creado/modificado) o 'delete' (tombstone).
+-- La actividad de mensajes no pasa por aquí: los chats con mensajes nuevos
+-- se detectan por chat_summaries.last_message_at.
+
+CREATE TABLE change_log (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    entity VARCHAR(16) NOT NULL,
+    entity_id INT NOT NULL,
+    op ENUM('upsert', 'delete') NOT NULL,
+    changed_at DATETIME(6) NOT NULL,
+    KEY idx_change_log_user_id (user_id, id),
+    KEY idx_change_log_changed_at (changed_at)
+);
+
+-- Para leer la actividad de chats desde el último token
+CREATE INDEX idx_chat_summaries_last_message_at ON chat_summaries (last_message_at);
+
+-- Limpieza periódica: flask --app app prune-change-log --days 30
+-- (los clientes con un token anterior reciben una instantánea completa)
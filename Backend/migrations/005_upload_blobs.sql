@@ -0,0 +1,15 @@
+-- Almacenamiento de adjuntos por contenido: cada archivo se guarda una vez
+-- en uploads/blobs/<aa>/<sha256>.<ext> y ref_count cuenta los mensajes que
+-- lo usan (Message.create suma, Message.delete resta). Los blobs sin
+-- referencias y sin uso reciente los borra: flask --app app gc-uploads
+
+CREATE TABLE upload_blobs (
+    sha256 CHAR(64) NOT NULL,
+    extension VARCHAR(16) NOT NULL,
+    size BIGINT NOT NULL,
+    ref_count INT NOT NULL DEFAULT 0,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    last_referenced_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (sha256, extension),
+    KEY idx_upload_blobs_gc (ref_count, last_referenced_at)
+);
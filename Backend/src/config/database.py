@@ -1,30 +1,603 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
 import mysql.connector
-from mysql.connector import pooling
+from flask import has_request_context, request
+from mysql.connector.errors import PoolError
+from src.config import settings
+from src.services.metrics import Histogram, Metrics
+
+
+class PoolTimeout(PoolError):
+    """No se liberó ninguna conexión dentro del tiempo de espera del pool"""
+
+
+class PooledConnection:
+    """Conexión prestada por el pool. close() la devuelve al pool en lugar
+    de cerrarla; el resto de atributos se delegan a la conexión real.
+    on_commit, si se asigna, se llama tras cada commit() correcto."""
+
+    def __init__(self, pool, raw, created_at):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+        self.on_commit = None
+
+    def close(self):
+        if self._raw is not None:
+            raw, self._raw = self._raw, None
+            self._pool._release(raw, self._created_at)
+
+    def commit(self):
+        if self._raw is None:
+            raise PoolError("La conexión ya fue devuelta al pool")
+        self._raw.commit()
+        if self.on_commit is not None:
+            self.on_commit()
+
+    def cursor(self, *args, **kwargs):
+        # Con DB_PREPARED_STATEMENTS los cursores normales de los modelos
+        # (cursor() / cursor(dictionary=True)) usan la caché de sentencias
+        if self._raw is None:
+            raise PoolError("La conexión ya fue devuelta al pool")
+        raw = self._raw
+        statements = self._pool.statement_cache(raw)
+        if statements is None or args or set(kwargs) - {'dictionary'}:
+            return raw.cursor(*args, **kwargs)
+        return CachedStatementCursor(raw, statements, bool(kwargs.get('dictionary')))
+
+    def __getattr__(self, name):
+        if self._raw is None:
+            raise PoolError("La conexión ya fue devuelta al pool")
+        return getattr(self._raw, name)
+
+
+class StatementCache:
+    """Sentencias preparadas en el servidor para una conexión física, con
+    expulsión LRU. La clave es el texto SQL: como los modelos usan literales,
+    la misma consulta reutiliza siempre el mismo cursor preparado."""
+
+    def __init__(self, raw, capacity, stats):
+        self._raw = raw
+        self._capacity = capacity
+        self._stats = stats
+        self._cursors = OrderedDict()  # (sql, dictionary) -> (sql, cursor preparado)
+
+    def get(self, operation, dictionary):
+        key = (operation, dictionary)
+        entry = self._cursors.get(key)
+        if entry is not None:
+            self._cursors.move_to_end(key)
+            self._stats.hit()
+            return entry
+        self._stats.miss()
+        # Se guarda el propio objeto str: el cursor preparado solo vuelve a
+        # preparar si recibe un objeto SQL distinto del último ejecutado
+        entry = (operation, self._raw.cursor(prepared=True, dictionary=dictionary))
+        self._cursors[key] = entry
+        while len(self._cursors) > self._capacity:
+            _, (_, cursor) = self._cursors.popitem(last=False)
+            self._stats.evict()
+            try:
+                cursor.close()
+            except Exception:
+                pass
+        return entry
+
+
+class StatementCacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def evict(self):
+        with self._lock:
+            self.evictions += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+
+class CachedStatementCursor:
+    """Cursor que los modelos usan como uno normal: las consultas con
+    parámetros van por su sentencia preparada en caché y el resto por un
+    cursor de texto. fetch*, rowcount, lastrowid... salen del último usado."""
+
+    def __init__(self, raw, statements, dictionary):
+        self._raw = raw
+        self._statements = statements
+        self._dictionary = dictionary
+        self._plain = None
+        self._active = None
+
+    def _plain_cursor(self):
+        if self._plain is None:
+            self._plain = self._raw.cursor(dictionary=self._dictionary)
+        return self._plain
+
+    def execute(self, operation, params=None):
+        self._drain()
+        if params:
+            operation, cursor = self._statements.get(operation, self._dictionary)
+        else:
+            cursor = self._plain_cursor()
+        self._active = cursor
+        return cursor.execute(operation, params)
+
+    def _drain(self):
+        # Los cursores preparados siguen abiertos en la caché: se descartan
+        # las filas no leídas para poder reutilizar la conexión
+        if self._active is not None and self._active is not self._plain and self._raw.unread_result:
+            try:
+                self._active.fetchall()
+            except Exception:
+                pass
+
+    def close(self):
+        self._drain()
+        self._active = None
+        if self._plain is not None:
+            self._plain.close()
+            self._plain = None
+
+    def __getattr__(self, name):
+        return getattr(self._active or self._plain_cursor(), name)
+
+
+class UnitOfWork:
+    """Ámbito de una petición HTTP (o de un bloque explícito): todas las
+    llamadas a Database.get_connection() dentro de él comparten la misma
+    conexión por pool, que se devuelve al pool al cerrar el ámbito."""
+
+    def __init__(self):
+        self.connections = {}  # 'primary' / 'replica' -> PooledConnection
+        self.checkouts = 0
+        self.in_transaction = False
+        self.rollback_only = False
+        self.on_commit = []  # avisos aplazados hasta el commit de la transacción
+
+    def close(self):
+        for connection in self.connections.values():
+            connection.close()
+        self.connections.clear()
+
+
+class ScopedConnection:
+    """Conexión compartida dentro de un UnitOfWork. close() no la devuelve
+    al pool y, dentro de Database.transaction(), commit()/rollback() se
+    aplazan hasta el final de la transacción, igual que on_commit."""
+
+    def __init__(self, scope, connection, on_commit=None):
+        self._scope = scope
+        self._connection = connection
+        self._on_commit = on_commit
+
+    def close(self):
+        pass
+
+    def commit(self):
+        if self._scope.in_transaction:
+            if self._on_commit is not None:
+                self._scope.on_commit.append(self._on_commit)
+            return
+        self._connection.commit()
+        if self._on_commit is not None:
+            self._on_commit()
+
+    def rollback(self):
+        if self._scope.in_transaction:
+            self._scope.rollback_only = True
+        else:
+            self._connection.rollback()
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+_current_scope = ContextVar('db_unit_of_work', default=None)
+
+
+class ConnectionPool:
+    """Pool de conexiones MySQL con espera bloqueante (con timeout),
+    conexiones de desborde, reciclado por antigüedad y métricas en vivo"""
+
+    def __init__(self, name, size, max_overflow, timeout, recycle, **connect_args):
+        self.name = name
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self._connect_args = connect_args
+        self._idle = deque()  # (conexión, creada_en)
+        self._open = 0
+        self._in_use = 0
+        self._waiters = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._errors = 0
+        self._latency = Histogram()
+        self._cond = threading.Condition()
+        self._statement_caches = {}  # conexión física -> StatementCache
+        self._statement_stats = StatementCacheStats()
+
+    def _connect(self):
+        return mysql.connector.connect(**self._connect_args)
+
+    def get_connection(self):
+        start = time.monotonic()
+        deadline = start + self.timeout
+        raw = None
+        created_at = None
+        with self._cond:
+            self._waiters += 1
+            try:
+                while True:
+                    if self._idle:
+                        raw, created_at = self._idle.pop()
+                        break
+                    if self._open < self.size + self.max_overflow:
+                        # Se reserva el hueco y se conecta fuera del lock
+                        self._open += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        self._errors += 1
+                        raise PoolTimeout(
+                            f"Pool '{self.name}' agotado: sin conexiones libres "
+                            f"tras {self.timeout}s")
+                    self._cond.wait(remaining)
+            finally:
+                self._waiters -= 1
+
+        try:
+            if raw is not None and self.recycle and time.monotonic() - created_at > self.recycle:
+                self._discard(raw)
+                raw = None
+            if raw is None:
+                raw = self._connect()
+                created_at = time.monotonic()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._errors += 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self._in_use += 1
+            self._checkouts += 1
+        self._latency.observe(time.monotonic() - start)
+        return PooledConnection(self, raw, created_at)
+
+    def warm_up(self, count):
+        """Abre por adelantado hasta `count` conexiones (sin pasar de size)
+        y las deja libres en el pool. Devuelve cuántas se abrieron."""
+        opened = 0
+        for _ in range(count):
+            with self._cond:
+                if self._open >= self.size:
+                    break
+                self._open += 1
+            try:
+                raw = self._connect()
+            except Exception:
+                with self._cond:
+                    self._open -= 1
+                    self._errors += 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._idle.append((raw, time.monotonic()))
+                self._cond.notify()
+            opened += 1
+        return opened
+
+    def statement_cache(self, raw):
+        """Caché de sentencias preparadas de la conexión (None si está
+        desactivada con DB_PREPARED_STATEMENTS)"""
+        if not settings.DB_PREPARED_STATEMENTS:
+            return None
+        cache = self._statement_caches.get(raw)
+        if cache is None:
+            cache = StatementCache(raw, settings.DB_STATEMENT_CACHE_SIZE, self._statement_stats)
+            self._statement_caches[raw] = cache
+        return cache
+
+    def _discard(self, raw):
+        # El servidor libera las sentencias preparadas al cerrar la conexión
+        self._statement_caches.pop(raw, None)
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def _release(self, raw, created_at):
+        keep = True
+        try:
+            # Deja la conexión limpia para el siguiente uso sin el viaje
+            # extra de reset_session
+            if raw.unread_result:
+                raw.consume_results()
+            if raw.in_transaction:
+                raw.rollback()
+        except Exception:
+            keep = False
+            with self._cond:
+                self._errors += 1
+
+        with self._cond:
+            self._in_use -= 1
+            if keep and self._open <= self.size:
+                self._idle.append((raw, created_at))
+            else:
+                # Conexiones de desborde (o rotas) se cierran al devolverse
+                self._open -= 1
+                keep = False
+            self._cond.notify()
+        if not keep:
+            self._discard(raw)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'size': self.size,
+                'max_overflow': self.max_overflow,
+                'timeout': self.timeout,
+                'recycle': self.recycle,
+                'open': self._open,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'waiters': self._waiters,
+                'checkouts': self._checkouts,
+                'timeouts': self._timeouts,
+                'errors': self._errors,
+                'checkout_latency': self._latency.snapshot(),
+                'prepared_statements': self._statement_stats.snapshot()
+            }
+
 
 class Database:
     __connection_pool = None
+    __replica_pool = None
+    __init_lock = threading.Lock()
+    __recent_writers = {}  # user_id -> instante hasta el que lee del primario
+    __routing_lock = threading.Lock()
+    __routing = {'writes': 0, 'primary_checkouts': 0, 'reads_primary': 0,
+                 'reads_replica': 0, 'sticky_reads': 0}
+    __scope_stats = {'scopes': 0, 'scoped_checkouts': 0, 'max_checkouts_per_scope': 0,
+                     'unscoped_checkouts': 0}
 
     @classmethod
-    def initialize(cls):
-        cls.__connection_pool = pooling.MySQLConnectionPool(
-            pool_name="uni_pulse_pool",
-            pool_size=5,
-            host="yamabiko.proxy.rlwy.net",
-            user="root",
-            password="JIVvbRgjWgWEykiknkjMHYjzGMdVkTPK",
-            database="railway",
-            port=52867
+    def initialize(cls, pool=None, replica_pool=None):
+        """Crea los pools a partir de la configuración (DB_* en settings),
+        o usa los pools recibidos"""
+        if pool is None and (not settings.DB_HOST or settings.DB_PASSWORD is None):
+            raise RuntimeError("Faltan DB_HOST y/o DB_PASSWORD en el entorno")
+        cls.__connection_pool = pool or ConnectionPool(
+            name="uni_pulse_pool",
+            size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_POOL_MAX_OVERFLOW,
+            timeout=settings.DB_POOL_TIMEOUT,
+            recycle=settings.DB_POOL_RECYCLE,
+            host=settings.DB_HOST,
+            user=settings.DB_USER,
+            password=settings.DB_PASSWORD,
+            database=settings.DB_NAME,
+            port=settings.DB_PORT
         )
+        if replica_pool is None and settings.DB_REPLICA_HOST:
+            replica_pool = ConnectionPool(
+                name="uni_pulse_replica_pool",
+                size=settings.DB_REPLICA_POOL_SIZE,
+                max_overflow=settings.DB_POOL_MAX_OVERFLOW,
+                timeout=settings.DB_POOL_TIMEOUT,
+                recycle=settings.DB_POOL_RECYCLE,
+                host=settings.DB_REPLICA_HOST,
+                user=settings.DB_REPLICA_USER,
+                password=settings.DB_REPLICA_PASSWORD,
+                database=settings.DB_REPLICA_NAME,
+                port=settings.DB_REPLICA_PORT
+            )
+        cls.__replica_pool = replica_pool
+        Metrics.register('db_pool', cls.__connection_pool.stats)
+        if cls.__replica_pool:
+            Metrics.register('db_pool_replica', cls.__replica_pool.stats)
+        Metrics.register('db_routing', cls.routing_stats)
+        Metrics.register('db_unit_of_work', cls.scope_stats)
+
+    @classmethod
+    def _ensure_initialized(cls):
+        # Los pools se crean en el primer checkout, no al importar el módulo
+        if cls.__connection_pool is None:
+            with cls.__init_lock:
+                if cls.__connection_pool is None:
+                    cls.initialize()
+
+    @classmethod
+    def warm_up(cls, count=None):
+        """Pre-abre conexiones en el primario (y réplica). Pensado para
+        lanzarse en segundo plano al arrancar: si la BD no responde solo se
+        registra el error y el pool seguirá conectando bajo demanda."""
+        try:
+            cls._ensure_initialized()
+        except Exception as e:
+            # Sin configuración (DB_HOST / DB_PASSWORD): lo volverá a
+            # intentar, y a fallar con el mismo error, el primer checkout
+            print(f"Error en Database.warm_up(): {str(e)}")
+            return 0
+        count = settings.DB_POOL_WARMUP if count is None else count
+        start = time.monotonic()
+        opened = 0
+        for pool in (cls.__connection_pool, cls.__replica_pool):
+            if pool is None:
+                continue
+            try:
+                opened += pool.warm_up(count)
+            except Exception as e:
+                print(f"Error en Database.warm_up() ({pool.name}): {str(e)}")
+        print(f"Pool precalentado: {opened} conexiones en {time.monotonic() - start:.2f}s")
+        return opened
+
+    @staticmethod
+    def _current_user(user_id):
+        if user_id is not None:
+            return user_id
+        if has_request_context():
+            return getattr(request, 'user_id', None)
+        return None
+
+    @classmethod
+    def _record_write(cls, user_id):
+        """Tras un commit en el primario: durante DB_READ_STICKY_SECONDS las
+        lecturas de ese usuario también van al primario"""
+        now = time.monotonic()
+        with cls.__routing_lock:
+            cls.__routing['writes'] += 1
+            if user_id is not None:
+                cls.__recent_writers[user_id] = now + settings.DB_READ_STICKY_SECONDS
+            if len(cls.__recent_writers) > 10000:
+                cls.__recent_writers = {
+                    uid: until for uid, until in cls.__recent_writers.items() if until > now
+                }
+
+    @classmethod
+    def get_connection(cls, read_only=False, user_id=None):
+        """Devuelve una conexión del primario, o de la réplica si el llamador
+        declara read_only. user_id (por defecto el usuario autenticado de la
+        petición) sirve para leer del primario justo después de escribir:
+        lo que cuenta como escritura es el commit, no pedir el primario."""
+        cls._ensure_initialized()
+        user_id = cls._current_user(user_id)
+        now = time.monotonic()
+        with cls.__routing_lock:
+            if not read_only:
+                cls.__routing['primary_checkouts'] += 1
+            elif cls.__replica_pool is None:
+                read_only = False
+                cls.__routing['reads_primary'] += 1
+            elif user_id is not None and cls.__recent_writers.get(user_id, 0) > now:
+                read_only = False
+                cls.__routing['reads_primary'] += 1
+                cls.__routing['sticky_reads'] += 1
+            else:
+                cls.__routing['reads_replica'] += 1
+
+        scope = _current_scope.get()
+        if scope is None:
+            with cls.__routing_lock:
+                cls.__scope_stats['unscoped_checkouts'] += 1
+            if read_only:
+                return cls.__replica_pool.get_connection()
+            connection = cls.__connection_pool.get_connection()
+            connection.on_commit = lambda: cls._record_write(user_id)
+            return connection
+
+        # Dentro de un ámbito: si ya hay conexión al primario (o estamos en
+        # una transacción) las lecturas también la usan
+        key = 'replica' if read_only else 'primary'
+        if key == 'replica' and ('primary' in scope.connections or scope.in_transaction):
+            key = 'primary'
+        if key not in scope.connections:
+            pool = cls.__replica_pool if key == 'replica' else cls.__connection_pool
+            scope.connections[key] = pool.get_connection()
+            scope.checkouts += 1
+        on_commit = None
+        if key == 'primary':
+            on_commit = lambda: cls._record_write(user_id)
+        return ScopedConnection(scope, scope.connections[key], on_commit)
+
+    @classmethod
+    def begin_scope(cls):
+        """Abre un UnitOfWork en el contexto actual y devuelve el token para
+        end_scope(). Las conexiones se piden al pool solo cuando se usan."""
+        return _current_scope.set(UnitOfWork())
 
     @classmethod
-    def get_connection(cls):
-        return cls.__connection_pool.get_connection()
+    def end_scope(cls, token):
+        scope = _current_scope.get()
+        try:
+            if scope is not None:
+                scope.close()
+                with cls.__routing_lock:
+                    cls.__scope_stats['scopes'] += 1
+                    cls.__scope_stats['scoped_checkouts'] += scope.checkouts
+                    if scope.checkouts > cls.__scope_stats['max_checkouts_per_scope']:
+                        cls.__scope_stats['max_checkouts_per_scope'] = scope.checkouts
+        finally:
+            _current_scope.reset(token)
+
+    @classmethod
+    def current_scope(cls):
+        return _current_scope.get()
+
+    @classmethod
+    @contextmanager
+    def transaction(cls):
+        """Agrupa varias llamadas a modelos en una sola transacción sobre una
+        conexión del primario. Los commit()/rollback() de los modelos se
+        aplazan; al salir se hace commit, o rollback si hubo una excepción o
+        algún modelo pidió rollback."""
+        token = cls.begin_scope() if _current_scope.get() is None else None
+        scope = _current_scope.get()
+        if scope.in_transaction:
+            # Transacción anidada: se une a la exterior
+            yield
+            return
+        scope.in_transaction = True
+        try:
+            yield
+            connection = scope.connections.get('primary')
+            if connection is not None:
+                if scope.rollback_only:
+                    connection.rollback()
+                else:
+                    connection.commit()
+                    for on_commit in scope.on_commit:
+                        on_commit()
+        except Exception:
+            connection = scope.connections.get('primary')
+            if connection is not None:
+                connection.rollback()
+            raise
+        finally:
+            scope.in_transaction = False
+            scope.rollback_only = False
+            scope.on_commit.clear()
+            if token is not None:
+                cls.end_scope(token)
+
+    @classmethod
+    def scope_stats(cls):
+        with cls.__routing_lock:
+            stats = dict(cls.__scope_stats)
+        stats['checkouts_per_scope'] = (
+            round(stats['scoped_checkouts'] / stats['scopes'], 3) if stats['scopes'] else 0)
+        return stats
+
+    @classmethod
+    def routing_stats(cls):
+        with cls.__routing_lock:
+            stats = dict(cls.__routing)
+            stats['replica_configured'] = cls.__replica_pool is not None
+            stats['sticky_users'] = len(cls.__recent_writers)
+            return stats
 
     @classmethod
     def close_connection(cls, connection, cursor=None):
         if cursor:
             cursor.close()
         connection.close()
-
-# Inicializamos el pool de conexiones al arrancar
-Database.initialize()
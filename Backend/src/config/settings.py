@@ -55,9 +55,148 @@ def token_required(f):
 
 
 
-# Configuración de uploads
-UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), '..', 'uploads')
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'pdf', 'doc', 'docx', 'mp4'}
+# Configuración de base de datos. DB_HOST y DB_PASSWORD son obligatorios
+# en el entorno: no hay credenciales por defecto en el código
+DB_HOST = os.getenv('DB_HOST')
+DB_PORT = int(os.getenv('DB_PORT', 3306))
+DB_USER = os.getenv('DB_USER', 'root')
+DB_PASSWORD = os.getenv('DB_PASSWORD')
+DB_NAME = os.getenv('DB_NAME', 'railway')
+
+# Pool de conexiones (eventlet y HTTP comparten el mismo pool)
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+DB_POOL_MAX_OVERFLOW = int(os.getenv('DB_POOL_MAX_OVERFLOW', 5))  # conexiones extra temporales
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 10))  # segundos esperando una conexión libre
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))  # segundos antes de reabrir una conexión
+DB_POOL_WARMUP = int(os.getenv('DB_POOL_WARMUP', 2))  # conexiones a pre-abrir en segundo plano al arrancar
+# Caché LRU por conexión de sentencias preparadas en el servidor. Desactivada
+# por defecto: mysql-connector envía COM_STMT_RESET antes de cada ejecución, así
+# que conviene medir con benchmarks/bench_prepared_statements.py antes de activarla.
+DB_PREPARED_STATEMENTS = os.getenv('DB_PREPARED_STATEMENTS', '0') == '1'
+DB_STATEMENT_CACHE_SIZE = int(os.getenv('DB_STATEMENT_CACHE_SIZE', 32))
+
+# Réplica de lectura (opcional). Sin DB_REPLICA_HOST todas las lecturas van
+# al primario; para pruebas locales puede apuntar al mismo MySQL que el primario.
+DB_REPLICA_HOST = os.getenv('DB_REPLICA_HOST', '')
+DB_REPLICA_PORT = int(os.getenv('DB_REPLICA_PORT', DB_PORT))
+DB_REPLICA_USER = os.getenv('DB_REPLICA_USER', DB_USER)
+DB_REPLICA_PASSWORD = os.getenv('DB_REPLICA_PASSWORD', DB_PASSWORD)
+DB_REPLICA_NAME = os.getenv('DB_REPLICA_NAME', DB_NAME)
+DB_REPLICA_POOL_SIZE = int(os.getenv('DB_REPLICA_POOL_SIZE', DB_POOL_SIZE))
+# Tras un commit, las lecturas del mismo usuario van al primario durante este
+# tiempo para que vea sus propios cambios aunque la réplica vaya atrasada
+DB_READ_STICKY_SECONDS = float(os.getenv('DB_READ_STICKY_SECONDS', 5))
+
+# GET /api/metrics expone el pool, los sockets y las subidas: solo lo ven
+# los usuarios con id en METRICS_USER_IDS (lista separada por comas; vacía = nadie)
+METRICS_USER_IDS = {int(uid) for uid in os.getenv('METRICS_USER_IDS', '').split(',') if uid.strip()}
+
+# Paginación del historial de mensajes (GET /api/chats/<id>/messages)
+MESSAGES_PAGE_SIZE = int(os.getenv('MESSAGES_PAGE_SIZE', 50))
+MESSAGES_PAGE_MAX = int(os.getenv('MESSAGES_PAGE_MAX', 100))  # límite que impone el servidor
+
+# Ventana caliente de mensajes recientes por chat (src/services/message_cache.py)
+MESSAGE_CACHE_WINDOW = int(os.getenv('MESSAGE_CACHE_WINDOW', 50))  # mensajes por chat
+MESSAGE_CACHE_MAX_MESSAGES = int(os.getenv('MESSAGE_CACHE_MAX_MESSAGES', 20000))  # límite global
+MESSAGE_CACHE_TTL = int(os.getenv('MESSAGE_CACHE_TTL', 60))  # segundos
+
+# Configuración de uploads: única raíz de todo lo subido (blobs, miniaturas,
+# subidas en curso y archivos antiguos), servida en /uploads/<ruta>
+UPLOAD_FOLDER = os.path.abspath(
+    os.getenv('UPLOAD_FOLDER') or os.path.join(os.path.dirname(__file__), '..', 'static', 'uploads')
+)
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'pdf', 'doc', 'docx', 'mp4', 'mp3'}
+
+# Servir /uploads: los blobs y sus miniaturas no cambian nunca (su nombre es
+# el hash) y se cachean como inmutables; los archivos antiguos, durante
+# UPLOAD_CACHE_MAX_AGE segundos. Con UPLOAD_ACCEL_REDIRECT (p. ej.
+# /_uploads/, una location internal de nginx con alias a UPLOAD_FOLDER) la
+# app solo responde cabeceras y nginx envía el archivo con sendfile
+UPLOAD_CACHE_MAX_AGE = int(os.getenv('UPLOAD_CACHE_MAX_AGE', 86400))
+UPLOAD_ACCEL_REDIRECT = os.getenv('UPLOAD_ACCEL_REDIRECT') or None
+
+# Subidas por partes (/api/chats/uploads): tamaño máximo de un archivo,
+# tamaño de parte sugerido al cliente, búfer de lectura al escribir en
+# disco y antigüedad a partir de la cual se borra una subida sin terminar
+UPLOAD_MAX_BYTES = int(os.getenv('UPLOAD_MAX_BYTES', 100 * 1024 * 1024))
+UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', 1024 * 1024))
+UPLOAD_CHUNK_BUFFER = int(os.getenv('UPLOAD_CHUNK_BUFFER', 64 * 1024))
+UPLOAD_INCOMPLETE_TTL = int(os.getenv('UPLOAD_INCOMPLETE_TTL', 24 * 3600))  # segundos
 
 # Configuración de WebSocket
-SOCKETIO_MESSAGE_QUEUE = 'redis://localhost:6379/0'  # Para producción con múltiples workers
\ No newline at end of file
+# Cola compartida para que varios workers repartan los eventos de las salas
+# (redis://, rediss://, amqp://, kafka://...). Vacía = un solo proceso.
+# En local sirve cualquier servidor compatible con Redis: redis://localhost:6379/0
+SOCKETIO_MESSAGE_QUEUE = os.getenv('SOCKETIO_MESSAGE_QUEUE') or None
+SOCKETIO_CHANNEL = os.getenv('SOCKETIO_CHANNEL', 'uni-pulse-socketio')
+
+# Caché de perfiles públicos (nombre y avatar) usada al emitir mensajes
+PROFILE_CACHE_TTL = int(os.getenv('PROFILE_CACHE_TTL', 300))  # segundos
+PROFILE_CACHE_MAX_ENTRIES = int(os.getenv('PROFILE_CACHE_MAX_ENTRIES', 10000))
+
+# Indicadores de "escribiendo": como mucho un cambio por usuario y chat cada
+# TYPING_EMIT_INTERVAL segundos; sin refresco caducan a los TYPING_TTL segundos
+TYPING_EMIT_INTERVAL = float(os.getenv('TYPING_EMIT_INTERVAL', 1.0))
+TYPING_TTL = float(os.getenv('TYPING_TTL', 6.0))
+
+# Caché de pertenencia (usuario, chat) para autorizar eventos de socket
+MEMBERSHIP_CACHE_TTL = int(os.getenv('MEMBERSHIP_CACHE_TTL', 300))  # segundos
+MEMBERSHIP_CACHE_MAX_ENTRIES = int(os.getenv('MEMBERSHIP_CACHE_MAX_ENTRIES', 50000))
+
+# Presencia: el cliente envía "heartbeat" cada PRESENCE_HEARTBEAT_INTERVAL
+# segundos y un socket sin latido caduca a los PRESENCE_TTL segundos.
+# PRESENCE_STORE_URL (redis://...) comparte el estado entre workers; si está
+# vacío se usa la cola de SocketIO cuando es Redis y, si no, memoria local.
+PRESENCE_HEARTBEAT_INTERVAL = int(os.getenv('PRESENCE_HEARTBEAT_INTERVAL', 25))
+PRESENCE_TTL = int(os.getenv('PRESENCE_TTL', 60))
+PRESENCE_STORE_URL = os.getenv('PRESENCE_STORE_URL') or None
+PRESENCE_DIFF_INTERVAL = float(os.getenv('PRESENCE_DIFF_INTERVAL', 1.0))  # segundos
+PRESENCE_BATCH_MAX = int(os.getenv('PRESENCE_BATCH_MAX', 200))
+
+# Sincronización incremental (GET /api/sync): cambios por página y margen
+# para que una transacción aún sin confirmar no quede detrás del token
+SYNC_PAGE_SIZE = int(os.getenv('SYNC_PAGE_SIZE', 500))
+SYNC_SETTLE_SECONDS = int(os.getenv('SYNC_SETTLE_SECONDS', 2))
+CHANGE_LOG_RETENTION_DAYS = int(os.getenv('CHANGE_LOG_RETENTION_DAYS', 30))
+
+# Entrega de mensajes por socket: cola de mensajes sin "ack" por
+# dispositivo, solo para los clientes que al conectar envían en auth
+# {'acks': true, 'device_id': ...}; se le reenvían al reconectar. Se acota a
+# DELIVERY_QUEUE_MAX mensajes por dispositivo (lo que no cabe se señala como
+# hueco para pedirlo por REST) y la cola de un dispositivo sin conectar ni
+# enviar latidos caduca a los DELIVERY_QUEUE_TTL segundos.
+# DELIVERY_STORE_URL (redis://...) la comparte entre workers; si está vacío
+# se usa la cola de SocketIO cuando es Redis y, si no, memoria local.
+DELIVERY_QUEUE_MAX = int(os.getenv('DELIVERY_QUEUE_MAX', 200))
+DELIVERY_QUEUE_TTL = int(os.getenv('DELIVERY_QUEUE_TTL', 600))
+DELIVERY_MAX_QUEUES = int(os.getenv('DELIVERY_MAX_QUEUES', 20000))
+DELIVERY_STORE_URL = os.getenv('DELIVERY_STORE_URL') or None
+
+# Codificación compacta (MessagePack) para los clientes de /chat que la
+# pidan al conectar; desactivada por defecto (todos reciben JSON). Con un
+# solo worker la variante compacta solo se emite si la sala tiene algún
+# socket compacto; con cola de mensajes no se sabe, y cada difusión se
+# publica una vez por variante de sala (JSON y compacta).
+SOCKET_COMPACT_ENCODING = os.getenv('SOCKET_COMPACT_ENCODING', '0') == '1'
+
+# Micro-batching de difusiones a salas de /chat: los eventos de una sala se
+# agrupan en un evento 'events' y esperan como mucho SOCKET_BATCH_WINDOW_MS
+# (0 = desactivado; los clientes deben entender 'events' antes de activarlo)
+# o hasta juntar SOCKET_BATCH_MAX_EVENTS
+SOCKET_BATCH_WINDOW_MS = int(os.getenv('SOCKET_BATCH_WINDOW_MS', 0))
+SOCKET_BATCH_MAX_EVENTS = int(os.getenv('SOCKET_BATCH_MAX_EVENTS', 32))
+
+# Blobs de adjuntos sin referencias: se conservan UPLOAD_BLOB_GRACE segundos
+# desde su último uso (subido y aún no enviado) antes de que gc-uploads los borre
+UPLOAD_BLOB_GRACE = int(os.getenv('UPLOAD_BLOB_GRACE', 3600))
+
+# Miniaturas de adjuntos: para imágenes, una por tamaño (lado mayor en px);
+# para mp4, además un póster con el primer fotograma (requiere ffmpeg). Se
+# generan en segundo plano con THUMBNAIL_WORKERS hilos; si la cola está
+# llena se reintenta cuando un mensaje use el adjunto. Sin Pillow no hay
+# miniaturas de imágenes y sin ffmpeg no hay pósters.
+THUMBNAIL_SIZES = [int(size) for size in os.getenv('THUMBNAIL_SIZES', '160,480,960').split(',') if size]
+THUMBNAIL_QUALITY = int(os.getenv('THUMBNAIL_QUALITY', 80))
+THUMBNAIL_WORKERS = int(os.getenv('THUMBNAIL_WORKERS', 2))
+THUMBNAIL_QUEUE_MAX = int(os.getenv('THUMBNAIL_QUEUE_MAX', 500))
+THUMBNAIL_FFMPEG = os.getenv('THUMBNAIL_FFMPEG', 'ffmpeg')
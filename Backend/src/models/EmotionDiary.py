@@ -32,7 +32,7 @@ class EmotionDiary:
 
     @staticmethod
     def get_emotional_history(user_id, days=30):
-        connection = Database.get_connection()
+        connection = Database.get_connection(read_only=True, user_id=user_id)
         cursor = connection.cursor(dictionary=True)
         try:
             cursor.execute(
@@ -53,7 +53,7 @@ class EmotionDiary:
 
     @staticmethod
     def get_emotional_stats(user_id):
-        connection = Database.get_connection()
+        connection = Database.get_connection(read_only=True, user_id=user_id)
         cursor = connection.cursor(dictionary=True)
         try:
             cursor.execute(
@@ -74,7 +74,7 @@ class EmotionDiary:
 
     @staticmethod
     def get_weekly_summary(user_id):
-        connection = Database.get_connection()
+        connection = Database.get_connection(read_only=True, user_id=user_id)
         cursor = connection.cursor(dictionary=True)
         try:
             cursor.execute(
@@ -95,7 +95,7 @@ class EmotionDiary:
 # Modifica el método detect_patterns en EmotionDiary
     @staticmethod
     def detect_patterns(user_id):
-        connection = Database.get_connection()
+        connection = Database.get_connection(read_only=True, user_id=user_id)
         cursor = connection.cursor(dictionary=True)
         try:
         # Consulta mejorada para patrones
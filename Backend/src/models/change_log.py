@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta
+from src.config.database import Database
+
+
+class ChangeLog:
+    """Registro de cambios por usuario (tabla change_log). Las escrituras
+    usan el cursor de la transacción del modelo, así el cambio y su
+    entrada se confirman juntos."""
+
+    @staticmethod
+    def record(cursor, user_id, entity, entity_id, op='upsert'):
+        """Anota un cambio de `entity` para un usuario; no hace commit"""
+        cursor.execute(
+            """INSERT INTO change_log (user_id, entity, entity_id, op, changed_at)
+            VALUES (%s, %s, %s, %s, %s)""",
+            (user_id, entity, entity_id, op, datetime.now())
+        )
+
+    @staticmethod
+    def record_chat(cursor, chat_id, op='upsert'):
+        """Anota un cambio del chat para todos sus participantes activos"""
+        cursor.execute(
+            """INSERT INTO change_log (user_id, entity, entity_id, op, changed_at)
+            SELECT user_id, 'chat', chat_id, %s, %s
+            FROM chat_participants WHERE chat_id = %s AND left_at IS NULL""",
+            (op, datetime.now(), chat_id)
+        )
+
+    @staticmethod
+    def get_since(user_id, since_id, limit):
+        """Cambios del usuario posteriores a since_id, en orden (limit filas)"""
+        # Siempre al primario: con el retraso de una réplica el token podría
+        # avanzar por delante de cambios que aún no han llegado
+        connection = Database.get_connection()
+        cursor = connection.cursor(dictionary=True)
+        try:
+            cursor.execute(
+                """SELECT id, entity, entity_id, op, changed_at
+                FROM change_log
+                WHERE user_id = %s AND id > %s
+                ORDER BY id LIMIT %s""",
+                (user_id, since_id, limit)
+            )
+            return cursor.fetchall()
+        finally:
+            Database.close_connection(connection, cursor)
+
+    @staticmethod
+    def get_settled_id(user_id, settled_before):
+        """Último id del usuario escrito antes de `settled_before` (0 si no hay)"""
+        connection = Database.get_connection()
+        cursor = connection.cursor()
+        try:
+            # Recorre (user_id, id) hacia atrás y para en la primera fila asentada
+            cursor.execute(
+                """SELECT id FROM change_log 
+                WHERE user_id = %s AND changed_at <= %s 
+                ORDER BY id DESC LIMIT 1""",
+                (user_id, settled_before)
+            )
+            row = cursor.fetchone()
+            return row[0] if row else 0
+        finally:
+            Database.close_connection(connection, cursor)
+
+    @staticmethod
+    def get_first_id():
+        """Id más antiguo conservado tras la limpieza (None si está vacío)"""
+        connection = Database.get_connection()
+        cursor = connection.cursor()
+        try:
+            cursor.execute("SELECT MIN(id) FROM change_log")
+            return cursor.fetchone()[0]
+        finally:
+            Database.close_connection(connection, cursor)
+
+    @staticmethod
+    def prune(days):
+        """Borra las entradas con más de `days` días; devuelve cuántas"""
+        connection = Database.get_connection()
+        cursor = connection.cursor()
+        try:
+            cursor.execute(
+                "DELETE FROM change_log WHERE changed_at < %s",
+                (datetime.now() - timedelta(days=days),)
+            )
+            connection.commit()
+            return cursor.rowcount
+        except Exception as e:
+            connection.rollback()
+            print(f"Error en ChangeLog.prune(): {str(e)}")
+            raise e
+        finally:
+            Database.close_connection(connection, cursor)
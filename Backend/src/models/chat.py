@@ -1,11 +1,17 @@
 from datetime import datetime
 from src.config.database import Database
+from src.models.change_log import ChangeLog
+from src.models.upload_blob import UploadBlob
+from src.services.profile_cache import ProfileCache
+from src.services.message_cache import RecentMessageCache
+from src.services.membership import MembershipCache
+from src.config.settings import MESSAGE_CACHE_WINDOW
 
 class Chat:
     @staticmethod
     def create(name, is_group, created_by, theme=None, photo_url=None, participants=None):
         """Crea un nuevo chat (individual o grupal)"""
-        connection = Database.get_connection()
+        connection = Database.get_connection(user_id=created_by)
         cursor = connection.cursor(dictionary=True)
         try:
             # Insertar el chat principal
@@ -37,7 +43,10 @@ class Chat:
                             (chat_id, user_id, False)
                         )
             
+            ChangeLog.record_chat(cursor, chat_id)
             connection.commit()
+            for user_id in {created_by, *(participants or [])}:
+                MembershipCache.invalidate(user_id, chat_id)
             return chat_id
         except Exception as e:
             connection.rollback()
@@ -49,7 +58,7 @@ class Chat:
     @staticmethod
     def get_or_create_private_chat(user1_id, user2_id):
         """Obtiene o crea un chat privado entre dos usuarios"""
-        connection = Database.get_connection()
+        connection = Database.get_connection(user_id=user1_id)
         cursor = connection.cursor(dictionary=True)
         try:
         # Buscar si ya existe un chat privado entre estos usuarios
@@ -91,7 +100,10 @@ class Chat:
                     (chat_id, user_id, False)
                 )
         
+            ChangeLog.record_chat(cursor, chat_id)
             connection.commit()
+            MembershipCache.invalidate(user1_id, chat_id)
+            MembershipCache.invalidate(user2_id, chat_id)
             return chat_id
         except Exception as e:
             connection.rollback()
@@ -101,14 +113,16 @@ class Chat:
             Database.close_connection(connection, cursor)
 
     @staticmethod
-    def get_user_chats(user_id):
-        """Obtiene todos los chats del usuario"""
-        connection = Database.get_connection()
+    def get_user_chats(user_id, chat_ids=None, active_since=None):
+        """Obtiene todos los chats del usuario. Para la sincronización
+        incremental se limita a `chat_ids` y a los chats con mensajes
+        posteriores a `active_since`."""
+        connection = Database.get_connection(read_only=True, user_id=user_id)
         cursor = connection.cursor(dictionary=True)
         try:
-            
-            cursor.execute(
-                """
+            # Lee el resumen mantenido (chat_summaries) y el contador por
+            # participante en lugar de subconsultas correlacionadas por chat
+            query = """
             SELECT 
                 c.id,
                 c.name,
@@ -116,22 +130,27 @@ class Chat:
                 c.theme,
                 c.photo_url,
                 c.last_message_at,
-                (SELECT COUNT(*) FROM messages m 
-                 WHERE m.chat_id = c.id AND m.read_at IS NULL AND m.user_id != %s) as unread_count,
-                (SELECT content FROM messages 
-                 WHERE chat_id = c.id AND deleted_at IS NULL 
-                 ORDER BY sent_at DESC LIMIT 1) as last_message_content,
-                (SELECT u.name FROM messages 
-                 JOIN users u ON messages.user_id = u.id 
-                 WHERE chat_id = c.id AND deleted_at IS NULL 
-                 ORDER BY sent_at DESC LIMIT 1) as last_message_sender
-            FROM chats c
-            JOIN chat_participants cp ON c.id = cp.chat_id
-            WHERE cp.user_id = %s AND cp.left_at IS NULL 
-            ORDER BY c.last_message_at DESC
-        """,
-                (user_id, user_id)
-            )
+                cp.unread_count,
+                cp.last_read_message_id,
+                s.last_message_id,
+                s.last_message_preview as last_message_content,
+                s.last_message_sender
+            FROM chat_participants cp
+            JOIN chats c ON c.id = cp.chat_id
+            LEFT JOIN chat_summaries s ON s.chat_id = c.id
+            WHERE cp.user_id = %s AND cp.left_at IS NULL"""
+            params = [user_id]
+            if chat_ids is not None or active_since is not None:
+                conditions = ["FALSE"]
+                if chat_ids:
+                    conditions.append(f"c.id IN ({', '.join(['%s'] * len(chat_ids))})")
+                    params.extend(chat_ids)
+                if active_since is not None:
+                    conditions.append("s.last_message_at > %s")
+                    params.append(active_since)
+                query += f" AND ({' OR '.join(conditions)})"
+            query += " ORDER BY c.last_message_at DESC"
+            cursor.execute(query, params)
             return cursor.fetchall()
         except Exception as e:
             print(f"Error en Chat.get_user_chats(): {str(e)}")
@@ -142,7 +161,7 @@ class Chat:
     @staticmethod
     def get_chat_details(chat_id):
         """Obtiene detalles de un chat específico"""
-        connection = Database.get_connection()
+        connection = Database.get_connection(read_only=True)
         cursor = connection.cursor(dictionary=True)
         try:
             cursor.execute(
@@ -172,14 +191,19 @@ class Chat:
         connection = Database.get_connection()
         cursor = connection.cursor()
         try:
+            # El nuevo participante empieza sin no leídos: su cursor de
+            # lectura arranca en el último mensaje del chat
             cursor.execute(
                 """INSERT INTO chat_participants 
-                (chat_id, user_id, is_admin, joined_at, status) 
-                VALUES (%s, %s, %s, NOW(), 'active')
+                (chat_id, user_id, is_admin, joined_at, status, last_read_message_id, unread_count) 
+                VALUES (%s, %s, %s, NOW(), 'active', 
+                    (SELECT last_message_id FROM chat_summaries WHERE chat_id = %s), 0)
                 ON DUPLICATE KEY UPDATE left_at = NULL, status = 'active'""",
-                (chat_id, user_id, is_admin)
+                (chat_id, user_id, is_admin, chat_id)
             )
+            ChangeLog.record(cursor, user_id, 'chat', chat_id)
             connection.commit()
+            MembershipCache.invalidate(user_id, chat_id)
             return True
         except Exception as e:
             connection.rollback()
@@ -191,7 +215,7 @@ class Chat:
     @staticmethod
     def get_participants(chat_id):
         """Obtiene participantes de un chat"""
-        connection = Database.get_connection()
+        connection = Database.get_connection(read_only=True)
         cursor = connection.cursor(dictionary=True)
         try:
             cursor.execute(
@@ -210,6 +234,76 @@ class Chat:
         finally:
             Database.close_connection(connection, cursor)
 
+    @staticmethod
+    def get_participant_ids(chat_id):
+        """IDs de los participantes activos (destinatarios de un mensaje),
+        desde MembershipCache salvo en un fallo de caché"""
+        cached = MembershipCache.get_members(chat_id)
+        if cached is not None:
+            return cached
+        # Del primario: lo que se lea queda en caché MEMBERSHIP_CACHE_TTL y
+        # una réplica atrasada dejaría fuera a quien se acaba de unir
+        connection = Database.get_connection()
+        cursor = connection.cursor()
+        try:
+            cursor.execute(
+                """SELECT user_id FROM chat_participants 
+                WHERE chat_id = %s AND left_at IS NULL""",
+                (chat_id,)
+            )
+            user_ids = frozenset(row[0] for row in cursor.fetchall())
+            MembershipCache.set_members(chat_id, user_ids)
+            return user_ids
+        except Exception as e:
+            print(f"Error en Chat.get_participant_ids(): {str(e)}")
+            return frozenset()
+        finally:
+            Database.close_connection(connection, cursor)
+
+    @staticmethod
+    def get_chat_ids(user_id):
+        """IDs de los chats activos del usuario (salas a las que avisar de su presencia)"""
+        connection = Database.get_connection(read_only=True)
+        cursor = connection.cursor()
+        try:
+            cursor.execute(
+                """SELECT chat_id FROM chat_participants 
+                WHERE user_id = %s AND left_at IS NULL""",
+                (user_id,)
+            )
+            return [row[0] for row in cursor.fetchall()]
+        except Exception as e:
+            print(f"Error en Chat.get_chat_ids(): {str(e)}")
+            return []
+        finally:
+            Database.close_connection(connection, cursor)
+
+    @staticmethod
+    def is_participant(chat_id, user_id):
+        """Indica si el usuario participa (activo) en el chat. Se responde
+        desde MembershipCache y solo en un fallo se consulta la BD."""
+        if MembershipCache.get(user_id, chat_id):
+            return True
+        # Del primario, y un "no" no se guarda: a quien se acaba de añadir
+        # (quizá desde otro worker) no se le puede rechazar durante el TTL
+        connection = Database.get_connection()
+        cursor = connection.cursor()
+        try:
+            cursor.execute(
+                """SELECT 1 FROM chat_participants 
+                WHERE chat_id = %s AND user_id = %s AND left_at IS NULL""",
+                (chat_id, user_id)
+            )
+            is_member = cursor.fetchone() is not None
+            if is_member:
+                MembershipCache.set(user_id, chat_id, True)
+            return is_member
+        except Exception as e:
+            print(f"Error en Chat.is_participant(): {str(e)}")
+            return False
+        finally:
+            Database.close_connection(connection, cursor)
+
     @staticmethod
     def update_last_message(chat_id):
         """Actualiza la última fecha de mensaje en un chat"""
@@ -237,39 +331,194 @@ class Chat:
         finally:
             Database.close_connection(connection, cursor)
 
+    @staticmethod
+    def refresh_summary(cursor, chat_id=None):
+        """Recalcula el resumen del último mensaje (de un chat o de todos)
+        usando el cursor de la transacción en curso"""
+        query = """INSERT INTO chat_summaries 
+                (chat_id, last_message_id, last_message_preview, 
+                 last_message_sender, last_message_sender_id, last_message_at)
+                SELECT c.id, m.id, LEFT(m.content, 255), u.name, u.id, m.sent_at
+                FROM chats c
+                LEFT JOIN messages m ON m.id = (
+                    SELECT id FROM messages 
+                    WHERE chat_id = c.id AND deleted_at IS NULL 
+                    ORDER BY sent_at DESC, id DESC LIMIT 1)
+                LEFT JOIN users u ON m.user_id = u.id"""
+        params = ()
+        if chat_id is not None:
+            query += " WHERE c.id = %s"
+            params = (chat_id,)
+        query += """
+                ON DUPLICATE KEY UPDATE 
+                last_message_id = VALUES(last_message_id),
+                last_message_preview = VALUES(last_message_preview),
+                last_message_sender = VALUES(last_message_sender),
+                last_message_sender_id = VALUES(last_message_sender_id),
+                last_message_at = VALUES(last_message_at)"""
+        cursor.execute(query, params)
+
+    @staticmethod
+    def refresh_unread_counts(cursor, chat_id=None):
+        """Recalcula los contadores de no leídos por participante a partir de
+        su cursor de lectura (last_read_message_id)"""
+        query = """UPDATE chat_participants cp
+                SET cp.unread_count = (
+                    SELECT COUNT(*) FROM messages m 
+                    WHERE m.chat_id = cp.chat_id 
+                    AND m.id > COALESCE(cp.last_read_message_id, 0) 
+                    AND m.deleted_at IS NULL AND m.user_id != cp.user_id)"""
+        params = ()
+        if chat_id is not None:
+            query += " WHERE cp.chat_id = %s"
+            params = (chat_id,)
+        cursor.execute(query, params)
+
+    @staticmethod
+    def rebuild_summaries(chat_id=None):
+        """Reconstruye resúmenes y contadores de no leídos (backfill)"""
+        connection = Database.get_connection()
+        cursor = connection.cursor()
+        try:
+            Chat.refresh_summary(cursor, chat_id)
+            summaries = cursor.rowcount
+            Chat.refresh_unread_counts(cursor, chat_id)
+            participants = cursor.rowcount
+            connection.commit()
+            return {"summaries": summaries, "participants": participants}
+        except Exception as e:
+            connection.rollback()
+            print(f"Error en Chat.rebuild_summaries(): {str(e)}")
+            raise e
+        finally:
+            Database.close_connection(connection, cursor)
+
 
 class Message:
     @staticmethod
     def create(chat_id, user_id, content, message_type='text', file_url=None, file_size=None):
-        """Crea un nuevo mensaje"""
-        connection = Database.get_connection()
+        """Crea un nuevo mensaje y devuelve el mensaje persistido completo
+        (listo para emitir), o None si no se pudo crear"""
+        connection = Database.get_connection(user_id=user_id)
         cursor = connection.cursor(dictionary=True)
         try:
+            # El perfil del remitente sale de la caché; solo en un fallo de
+            # caché se consulta, y con esta misma conexión
+            sender = ProfileCache.load(cursor, user_id)
+            if not sender:
+                return None
+
+            sent_at = datetime.now().replace(microsecond=0)
             cursor.execute(
                 """INSERT INTO messages 
                 (chat_id, user_id, content, message_type, file_url, file_size, sent_at, status) 
-                VALUES (%s, %s, %s, %s, %s, %s, NOW(), 'sent')""",
-                (chat_id, user_id, content, message_type, file_url, file_size)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, 'sent')""",
+                (chat_id, user_id, content, message_type, file_url, file_size, sent_at)
             )
-            
-            Chat.update_last_message(chat_id)
-            
             message_id = cursor.lastrowid
+            # Si el adjunto es un blob, el mensaje cuenta como referencia
+            UploadBlob.add_ref(cursor, file_url)
+
+            # Todo el camino de escritura va en una sola transacción y una
+            # sola conexión del pool: resumen, no leídos y last_message_at.
+            # Dos envíos simultáneos pueden llegar aquí en distinto orden que
+            # sus ids: solo gana el mensaje más nuevo. MySQL asigna en orden,
+            # así que last_message_id va al final (el resto compara con el
+            # valor anterior).
+            cursor.execute(
+                """INSERT INTO chat_summaries 
+                (chat_id, last_message_id, last_message_preview, 
+                 last_message_sender, last_message_sender_id, last_message_at)
+                VALUES (%s, %s, LEFT(%s, 255), %s, %s, %s)
+                ON DUPLICATE KEY UPDATE 
+                last_message_preview = IF(VALUES(last_message_id) > COALESCE(last_message_id, 0),
+                    VALUES(last_message_preview), last_message_preview),
+                last_message_sender = IF(VALUES(last_message_id) > COALESCE(last_message_id, 0),
+                    VALUES(last_message_sender), last_message_sender),
+                last_message_sender_id = IF(VALUES(last_message_id) > COALESCE(last_message_id, 0),
+                    VALUES(last_message_sender_id), last_message_sender_id),
+                last_message_at = IF(VALUES(last_message_id) > COALESCE(last_message_id, 0),
+                    VALUES(last_message_at), last_message_at),
+                last_message_id = GREATEST(VALUES(last_message_id), COALESCE(last_message_id, 0))""",
+                (chat_id, message_id, content, sender['name'], user_id, sent_at)
+            )
+            # +1 no leído para el resto; el remitente queda al día
+            cursor.execute(
+                """UPDATE chat_participants 
+                SET unread_count = IF(user_id = %s, 0, unread_count + 1),
+                    last_read_message_id = IF(user_id = %s,
+                        GREATEST(COALESCE(last_read_message_id, 0), %s), last_read_message_id)
+                WHERE chat_id = %s AND left_at IS NULL""",
+                (user_id, user_id, message_id, chat_id)
+            )
+            # El UPDATE ya bloquea la fila del chat; se hace al final para
+            # mantener el bloqueo el menor tiempo posible
+            cursor.execute(
+                """UPDATE chats SET last_message_at = GREATEST(COALESCE(last_message_at, %s), %s)
+                WHERE id = %s""",
+                (sent_at, sent_at, chat_id)
+            )
+
             connection.commit()
-            return message_id
+            # Misma forma que las filas de get_message / get_by_chat
+            message = {
+                'id': message_id,
+                'chat_id': chat_id,
+                'user_id': user_id,
+                'content': content,
+                'message_type': message_type,
+                'file_url': file_url,
+                'file_size': file_size,
+                'sent_at': sent_at,
+                'read_at': None,
+                'status': 'sent',
+                'message_status': 'sent',
+                'user_name': sender['name'],
+                'user_avatar': sender['avatar_url']
+            }
+            RecentMessageCache.append(message)
+            return message
         except Exception as e:
             connection.rollback()
             print(f"Error en Message.create(): {str(e)}")
-            return 0
+            return None
         finally:
             Database.close_connection(connection, cursor)
 
     @staticmethod
-    def get_by_chat(chat_id, limit=50, before_message_id=None):
-        """Obtiene mensajes de un chat"""
-        connection = Database.get_connection()
+    def get_by_chat(chat_id, limit=50, before_message_id=None, after_message_id=None):
+        """Obtiene una página de mensajes de un chat con paginación por keyset
+        sobre (chat_id, id). Sin cursor devuelve los más recientes; con
+        before_message_id los anteriores y con after_message_id los
+        posteriores. Los mensajes van en orden cronológico y has_more indica
+        si quedan más en la dirección pedida.
+
+        La primera página de los chats activos se sirve desde la ventana
+        caliente en memoria (RecentMessageCache): solo se consulta el último
+        id del resumen para comprobar que la ventana está al día."""
+        first_page = not before_message_id and not after_message_id
+        # La primera página va al primario: con ella se llena la ventana que
+        # ven todos los participantes, y una réplica con retraso la dejaría
+        # sin los últimos mensajes (también los del propio remitente)
+        connection = Database.get_connection(read_only=not first_page)
         cursor = connection.cursor(dictionary=True)
         try:
+            if first_page:
+                cursor.execute(
+                    "SELECT last_message_id FROM chat_summaries WHERE chat_id = %s",
+                    (chat_id,)
+                )
+                summary = cursor.fetchone()
+                cached = RecentMessageCache.get_latest(
+                    chat_id, limit, summary['last_message_id'] if summary else None
+                )
+                if cached is not None:
+                    return cached
+                # En un fallo se lee la ventana completa para llenar la caché
+                fetch = max(limit, MESSAGE_CACHE_WINDOW)
+            else:
+                fetch = limit
+
             query = """SELECT 
                       m.id, m.chat_id, m.user_id, m.content, m.message_type, 
                       m.file_url, m.file_size, m.sent_at, m.read_at, 
@@ -281,26 +530,37 @@ class Message:
             
             params = [chat_id]
             
-            if before_message_id:
-                query += " AND m.id < %s"
-                params.append(before_message_id)
-            
-            query += " ORDER BY m.sent_at DESC LIMIT %s"
-            params.append(limit)
+            if after_message_id:
+                query += " AND m.id > %s ORDER BY m.id ASC LIMIT %s"
+                params.append(after_message_id)
+            else:
+                if before_message_id:
+                    query += " AND m.id < %s"
+                    params.append(before_message_id)
+                query += " ORDER BY m.id DESC LIMIT %s"
+            # Se pide una fila de más para saber si hay otra página
+            params.append(fetch + 1)
             
             cursor.execute(query, params)
             messages = cursor.fetchall()
-            return list(reversed(messages))
+            if not after_message_id:
+                messages.reverse()
+            if first_page:
+                RecentMessageCache.fill(chat_id, messages[-fetch:], complete=len(messages) <= fetch)
+                return {"messages": messages[-limit:], "has_more": len(messages) > limit}
+            has_more = len(messages) > limit
+            messages = messages[-limit:] if not after_message_id else messages[:limit]
+            return {"messages": messages, "has_more": has_more}
         except Exception as e:
             print(f"Error en Message.get_by_chat(): {str(e)}")
-            return []
+            return {"messages": [], "has_more": False}
         finally:
             Database.close_connection(connection, cursor)
 
     @staticmethod
     def get_message(message_id):
         """Obtiene un mensaje específico"""
-        connection = Database.get_connection()
+        connection = Database.get_connection(read_only=True)
         cursor = connection.cursor(dictionary=True)
         try:
             cursor.execute(
@@ -319,37 +579,162 @@ class Message:
 
     @staticmethod
     def mark_as_read(message_id, user_id):
-        """Marca un mensaje como leído"""
-        connection = Database.get_connection()
-        cursor = connection.cursor()
+        """Marca un mensaje como leído (y con él todos los anteriores del
+        chat: el estado de lectura es un cursor por participante)"""
+        connection = Database.get_connection(user_id=user_id)
+        cursor = connection.cursor(dictionary=True)
         try:
             cursor.execute(
-                """UPDATE messages 
-                SET read_at = NOW(), status = 'read' 
-                WHERE id = %s AND user_id != %s AND read_at IS NULL""",
-                (message_id, user_id)
+                "SELECT chat_id FROM messages WHERE id = %s AND deleted_at IS NULL",
+                (message_id,)
             )
+            message = cursor.fetchone()
+            if not message:
+                return
+            Message.advance_read_cursor(cursor, message['chat_id'], user_id, message_id)
             connection.commit()
+            RecentMessageCache.mark_read_up_to(message['chat_id'], message_id, user_id,
+                                               datetime.now().replace(microsecond=0))
         except Exception as e:
             print(f"Error en Message.mark_as_read(): {str(e)}")
             connection.rollback()
         finally:
             Database.close_connection(connection, cursor)
 
+    @staticmethod
+    def mark_read_up_to(chat_id, user_id, up_to_message_id):
+        """Avanza el cursor de lectura del usuario hasta up_to_message_id.
+        Devuelve {'marked': mensajes que dejaron de estar no leídos,
+        'up_to_message_id': id aplicado (acotado al último del chat)}, None
+        si falla, o ValueError si el id no es de un mensaje del chat."""
+        if up_to_message_id <= 0:
+            raise ValueError("up_to_message_id debe ser positivo")
+        connection = Database.get_connection(user_id=user_id)
+        cursor = connection.cursor(dictionary=True)
+        try:
+            result = Message.advance_read_cursor(cursor, chat_id, user_id, up_to_message_id)
+            if result is None:
+                raise ValueError("El mensaje no pertenece al chat")
+            marked, up_to_message_id = result
+            connection.commit()
+            RecentMessageCache.mark_read_up_to(chat_id, up_to_message_id, user_id,
+                                               datetime.now().replace(microsecond=0))
+            return {'marked': marked, 'up_to_message_id': up_to_message_id}
+        except ValueError:
+            connection.rollback()
+            raise
+        except Exception as e:
+            print(f"Error en Message.mark_read_up_to(): {str(e)}")
+            connection.rollback()
+            return None
+        finally:
+            Database.close_connection(connection, cursor)
+
+    @staticmethod
+    def advance_read_cursor(cursor, chat_id, user_id, up_to_message_id):
+        """Mueve last_read_message_id del participante (solo hacia delante) y
+        recalcula su contador con un conteo de rango sobre (chat_id, id).
+        up_to_message_id debe ser un mensaje del chat y se acota al último
+        (chat_summaries.last_message_id): un id inventado no puede dejar el
+        cursor por delante de mensajes futuros. Devuelve (marcados, id
+        aplicado), o None si el mensaje no es del chat.
+        Usa el cursor de la transacción en curso; no hace commit."""
+        cursor.execute(
+            """SELECT LEAST(m.id, COALESCE(s.last_message_id, m.id)) AS up_to
+            FROM messages m
+            LEFT JOIN chat_summaries s ON s.chat_id = m.chat_id
+            WHERE m.id = %s AND m.chat_id = %s""",
+            (up_to_message_id, chat_id)
+        )
+        row = cursor.fetchone()
+        if not row:
+            return None
+        up_to_message_id = row['up_to']
+
+        cursor.execute(
+            """SELECT last_read_message_id, unread_count FROM chat_participants 
+            WHERE chat_id = %s AND user_id = %s AND left_at IS NULL FOR UPDATE""",
+            (chat_id, user_id)
+        )
+        participant = cursor.fetchone()
+        if not participant or (participant['last_read_message_id'] or 0) >= up_to_message_id:
+            return 0, up_to_message_id
+
+        cursor.execute(
+            """SELECT COUNT(*) as unread FROM messages 
+            WHERE chat_id = %s AND id > %s AND user_id != %s AND deleted_at IS NULL""",
+            (chat_id, up_to_message_id, user_id)
+        )
+        unread = cursor.fetchone()['unread']
+        cursor.execute(
+            """UPDATE chat_participants 
+            SET last_read_message_id = %s, unread_count = %s 
+            WHERE chat_id = %s AND user_id = %s""",
+            (up_to_message_id, unread, chat_id, user_id)
+        )
+        ChangeLog.record(cursor, user_id, 'chat', chat_id)
+
+        # messages.read_at/status se conservan como "leído por alguien"
+        # (los checks de los clientes); ya no se usan para contar no leídos
+        read_at = datetime.now().replace(microsecond=0)
+        cursor.execute(
+            """UPDATE messages 
+            SET read_at = %s, status = 'read' 
+            WHERE chat_id = %s AND id > %s AND id <= %s 
+            AND user_id != %s AND read_at IS NULL AND deleted_at IS NULL""",
+            (read_at, chat_id, participant['last_read_message_id'] or 0,
+             up_to_message_id, user_id)
+        )
+        return max(participant['unread_count'] - unread, 0), up_to_message_id
+
     @staticmethod
     def delete(message_id, user_id):
         """Elimina un mensaje (borrado lógico)"""
-        connection = Database.get_connection()
-        cursor = connection.cursor()
+        connection = Database.get_connection(user_id=user_id)
+        cursor = connection.cursor(dictionary=True)
         try:
+            cursor.execute(
+                """SELECT chat_id, file_url FROM messages 
+                WHERE id = %s AND user_id = %s AND deleted_at IS NULL 
+                FOR UPDATE""",
+                (message_id, user_id)
+            )
+            message = cursor.fetchone()
+            if not message:
+                return False
+
             cursor.execute(
                 """UPDATE messages 
                 SET deleted_at = NOW() 
-                WHERE id = %s AND user_id = %s AND deleted_at IS NULL""",
-                (message_id, user_id)
+                WHERE id = %s""",
+                (message_id,)
             )
+            # El blob queda para gc-uploads si era su última referencia
+            UploadBlob.release_ref(cursor, message['file_url'])
+
+            # Solo lo tenían como no leído quienes no habían pasado de él
+            cursor.execute(
+                """UPDATE chat_participants 
+                SET unread_count = GREATEST(unread_count - 1, 0) 
+                WHERE chat_id = %s AND user_id != %s 
+                AND COALESCE(last_read_message_id, 0) < %s""",
+                (message['chat_id'], user_id, message_id)
+            )
+
+            # Solo hay que recalcular el resumen si era el último mensaje
+            cursor.execute(
+                "SELECT last_message_id FROM chat_summaries WHERE chat_id = %s",
+                (message['chat_id'],)
+            )
+            summary = cursor.fetchone()
+            if summary and summary['last_message_id'] == message_id:
+                Chat.refresh_summary(cursor, message['chat_id'])
+            # Cambian no leídos y quizá el resumen: no se ve en last_message_at
+            ChangeLog.record_chat(cursor, message['chat_id'])
+
             connection.commit()
-            return cursor.rowcount > 0
+            RecentMessageCache.remove(message['chat_id'], message_id)
+            return True
         except Exception as e:
             print(f"Error en Message.delete(): {str(e)}")
             connection.rollback()
@@ -362,7 +747,7 @@ class Message:
     @staticmethod
     def delete_chat(chat_id, user_id):
         """Elimina un chat (solo para grupos o si es admin)"""
-        connection = Database.get_connection()
+        connection = Database.get_connection(user_id=user_id)
         cursor = connection.cursor(dictionary=True)
         try:
         # Verificar si el usuario es admin o es chat privado
@@ -395,8 +780,11 @@ class Message:
                 SET left_at = NOW(), status = 'inactive'
                 WHERE chat_id = %s AND user_id = %s
             """, (chat_id, user_id))
+            ChangeLog.record(cursor, user_id, 'chat', chat_id, 'delete')
         
             connection.commit()
+            RecentMessageCache.invalidate(chat_id)
+            MembershipCache.invalidate(user_id, chat_id)
             return True
         except Exception as e:
             connection.rollback()
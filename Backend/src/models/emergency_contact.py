@@ -19,7 +19,7 @@ class EmergencyContact:
 
     @staticmethod
     def get_all():
-        connection = Database.get_connection()
+        connection = Database.get_connection(read_only=True)
         cursor = connection.cursor(dictionary=True)
         try:
             cursor.execute("SELECT * FROM emergency_contacts")
@@ -29,7 +29,7 @@ class EmergencyContact:
 
     @staticmethod
     def get_by_id(contact_id):
-        connection = Database.get_connection()
+        connection = Database.get_connection(read_only=True)
         cursor = connection.cursor(dictionary=True)
         try:
             cursor.execute(
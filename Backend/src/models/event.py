@@ -1,4 +1,5 @@
 from src.config.database import Database
+from src.models.change_log import ChangeLog
 from datetime import datetime
 
 class Event:
@@ -28,26 +29,33 @@ class Event:
                 VALUES (%s, %s, %s, %s, %s, %s)""",
                 (user_id, title, description, start_datetime, end_datetime, location)
             )
+            event_id = cursor.lastrowid
+            ChangeLog.record(cursor, user_id, 'event', event_id)
             connection.commit()
-            return cursor.lastrowid
+            return event_id
         except Exception as e:
             connection.rollback()
             raise e
         finally:
             Database.close_connection(connection, cursor)
     @staticmethod
-    def get_by_user(user_id):
-        connection = Database.get_connection()
+    def get_by_user(user_id, ids=None):
+        """Elementos del usuario; con `ids` solo esos (sincronización incremental)"""
+        if ids is not None and not ids:
+            return []
+        connection = Database.get_connection(read_only=True, user_id=user_id)
         cursor = connection.cursor(dictionary=True)
         try:
-            cursor.execute(
-                """SELECT id, title, description, 
+            query = """SELECT id, title, description, 
                     start_datetime, 
                     end_datetime, 
                     location 
-                FROM events WHERE user_id = %s""",
-                (user_id,)
-            )
+                FROM events WHERE user_id = %s"""
+            params = [user_id]
+            if ids is not None:
+                query += f" AND id IN ({', '.join(['%s'] * len(ids))})"
+                params.extend(ids)
+            cursor.execute(query, params)
             events = cursor.fetchall()
             
             # Formatear fechas a strings
@@ -85,8 +93,11 @@ class Event:
                 start_datetime, end_datetime,
                 data.get('location'), event_id, user_id)
             )
+            updated = cursor.rowcount > 0
+            if updated:
+                ChangeLog.record(cursor, user_id, 'event', event_id)
             connection.commit()
-            return cursor.rowcount > 0
+            return updated
         except Exception as e:
             connection.rollback()
             raise e
@@ -102,8 +113,11 @@ class Event:
                 "DELETE FROM events WHERE id = %s AND user_id = %s",
                 (event_id, user_id)
             )
+            deleted = cursor.rowcount > 0
+            if deleted:
+                ChangeLog.record(cursor, user_id, 'event', event_id, 'delete')
             connection.commit()
-            return cursor.rowcount > 0
+            return deleted
         except Exception as e:
             connection.rollback()
             raise e
@@ -112,7 +126,7 @@ class Event:
 
     @staticmethod
     def get_upcoming(user_id, limit=5):
-        connection = Database.get_connection()
+        connection = Database.get_connection(read_only=True, user_id=user_id)
         cursor = connection.cursor(dictionary=True)
         try:
             cursor.execute(
@@ -1,4 +1,5 @@
 from src.config.database import Database
+from src.models.change_log import ChangeLog
 
 class Note:
     @staticmethod
@@ -12,8 +13,10 @@ class Note:
                 VALUES (%s, %s, %s, %s, %s)""",
                 (user_id, title, content, color, pinned)
             )
+            note_id = cursor.lastrowid
+            ChangeLog.record(cursor, user_id, 'note', note_id)
             connection.commit()
-            return cursor.lastrowid
+            return note_id
         except Exception as e:
             connection.rollback()
             raise e
@@ -21,14 +24,19 @@ class Note:
             Database.close_connection(connection, cursor)
 
     @staticmethod
-    def get_by_user(user_id):
-        connection = Database.get_connection()
+    def get_by_user(user_id, ids=None):
+        """Elementos del usuario; con `ids` solo esos (sincronización incremental)"""
+        if ids is not None and not ids:
+            return []
+        connection = Database.get_connection(read_only=True, user_id=user_id)
         cursor = connection.cursor(dictionary=True)
         try:
-            cursor.execute(
-                "SELECT id, title, content, color, pinned FROM notes WHERE user_id = %s",
-                (user_id,)
-            )
+            query = "SELECT id, title, content, color, pinned FROM notes WHERE user_id = %s"
+            params = [user_id]
+            if ids is not None:
+                query += f" AND id IN ({', '.join(['%s'] * len(ids))})"
+                params.extend(ids)
+            cursor.execute(query, params)
             return cursor.fetchall()
         except Exception as e:
             raise e
@@ -47,8 +55,11 @@ class Note:
                 (data['title'], data['content'], data.get('color'), data.get('pinned', False), 
                 note_id, user_id)
             )
+            updated = cursor.rowcount > 0
+            if updated:
+                ChangeLog.record(cursor, user_id, 'note', note_id)
             connection.commit()
-            return cursor.rowcount > 0
+            return updated
         finally:
             Database.close_connection(connection, cursor)
 
@@ -61,14 +72,17 @@ class Note:
                 "DELETE FROM notes WHERE id = %s AND user_id = %s",
                 (note_id, user_id)
             )
+            deleted = cursor.rowcount > 0
+            if deleted:
+                ChangeLog.record(cursor, user_id, 'note', note_id, 'delete')
             connection.commit()
-            return cursor.rowcount > 0
+            return deleted
         finally:
             Database.close_connection(connection, cursor)
 
     @staticmethod
     def search(user_id, query):
-        connection = Database.get_connection()
+        connection = Database.get_connection(read_only=True, user_id=user_id)
         cursor = connection.cursor(dictionary=True)
         try:
             cursor.execute(
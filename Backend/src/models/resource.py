@@ -19,7 +19,7 @@ class Resource:
 
     @staticmethod
     def get_all(resource_type=None):
-        connection = Database.get_connection()
+        connection = Database.get_connection(read_only=True)
         cursor = connection.cursor(dictionary=True)
         try:
             if resource_type:
@@ -35,7 +35,7 @@ class Resource:
 
     @staticmethod
     def get_by_id(resource_id):
-        connection = Database.get_connection()
+        connection = Database.get_connection(read_only=True)
         cursor = connection.cursor(dictionary=True)
         try:
             cursor.execute(
@@ -1,4 +1,5 @@
 from src.config.database import Database
+from src.models.change_log import ChangeLog
 
 class Task:
     @staticmethod
@@ -12,21 +13,28 @@ class Task:
                 VALUES (%s, %s, %s, %s, %s)""",
                 (user_id, title, description, due_date, priority)
             )
+            task_id = cursor.lastrowid
+            ChangeLog.record(cursor, user_id, 'task', task_id)
             connection.commit()
-            return cursor.lastrowid
+            return task_id
         finally:
             Database.close_connection(connection, cursor)
 
     @staticmethod
-    def get_by_user(user_id):
-        connection = Database.get_connection()
+    def get_by_user(user_id, ids=None):
+        """Elementos del usuario; con `ids` solo esos (sincronización incremental)"""
+        if ids is not None and not ids:
+            return []
+        connection = Database.get_connection(read_only=True, user_id=user_id)
         cursor = connection.cursor(dictionary=True)
         try:
-            cursor.execute(
-                """SELECT id, title, description, due_date, priority, status 
-                FROM tasks WHERE user_id = %s""",
-                (user_id,)
-            )
+            query = """SELECT id, title, description, due_date, priority, status 
+                FROM tasks WHERE user_id = %s"""
+            params = [user_id]
+            if ids is not None:
+                query += f" AND id IN ({', '.join(['%s'] * len(ids))})"
+                params.extend(ids)
+            cursor.execute(query, params)
             return cursor.fetchall()
         finally:
             Database.close_connection(connection, cursor)
@@ -43,8 +51,11 @@ class Task:
                 (data.get('title'), data.get('description'), data.get('due_date'),
                  data.get('priority'), data.get('status'), task_id, user_id)
             )
+            updated = cursor.rowcount > 0
+            if updated:
+                ChangeLog.record(cursor, user_id, 'task', task_id)
             connection.commit()
-            return cursor.rowcount > 0
+            return updated
         finally:
             Database.close_connection(connection, cursor)
 
@@ -57,14 +68,17 @@ class Task:
                 "DELETE FROM tasks WHERE id = %s AND user_id = %s",
                 (task_id, user_id)
             )
+            deleted = cursor.rowcount > 0
+            if deleted:
+                ChangeLog.record(cursor, user_id, 'task', task_id, 'delete')
             connection.commit()
-            return cursor.rowcount > 0
+            return deleted
         finally:
             Database.close_connection(connection, cursor)
 
     @staticmethod
     def search(user_id, query):
-        connection = Database.get_connection()
+        connection = Database.get_connection(read_only=True, user_id=user_id)
         cursor = connection.cursor(dictionary=True)
         try:
             cursor.execute(
@@ -0,0 +1,115 @@
+import re
+from datetime import datetime, timedelta
+from src.config.database import Database
+
+
+class UploadBlob:
+    """Registro de blobs de adjuntos (tabla upload_blobs) y sus referencias"""
+    URL_PREFIX = '/uploads/blobs/'
+    _URL = re.compile(r'^/uploads/blobs/[0-9a-f]{2}/([0-9a-f]{64})\.([a-z0-9]{1,16})$')
+
+    @staticmethod
+    def url_for(sha256, extension):
+        return f"{UploadBlob.URL_PREFIX}{sha256[:2]}/{sha256}.{extension}"
+
+    @staticmethod
+    def parse_url(file_url):
+        """(sha256, extensión) si file_url apunta a un blob, si no None"""
+        match = UploadBlob._URL.match(file_url or '')
+        return match.groups() if match else None
+
+    @staticmethod
+    def get(sha256, extension):
+        connection = Database.get_connection()
+        cursor = connection.cursor(dictionary=True)
+        try:
+            cursor.execute(
+                """SELECT sha256, extension, size, ref_count FROM upload_blobs
+                WHERE sha256 = %s AND extension = %s""",
+                (sha256, extension)
+            )
+            return cursor.fetchone()
+        finally:
+            Database.close_connection(connection, cursor)
+
+    @staticmethod
+    def register(sha256, extension, size):
+        """Da de alta el blob o, si ya existía, renueva su último uso (así
+        gc-uploads no lo borra mientras se envía). True si es nuevo."""
+        connection = Database.get_connection()
+        cursor = connection.cursor()
+        try:
+            cursor.execute(
+                """INSERT INTO upload_blobs (sha256, extension, size)
+                VALUES (%s, %s, %s)
+                ON DUPLICATE KEY UPDATE last_referenced_at = NOW()""",
+                (sha256, extension, size)
+            )
+            connection.commit()
+            return cursor.rowcount == 1
+        except Exception as e:
+            connection.rollback()
+            raise e
+        finally:
+            Database.close_connection(connection, cursor)
+
+    @staticmethod
+    def add_ref(cursor, file_url):
+        """Suma una referencia si file_url es un blob; usa el cursor de la
+        transacción del mensaje y no hace commit"""
+        key = UploadBlob.parse_url(file_url)
+        if key:
+            cursor.execute(
+                """UPDATE upload_blobs
+                SET ref_count = ref_count + 1, last_referenced_at = NOW()
+                WHERE sha256 = %s AND extension = %s""",
+                key
+            )
+
+    @staticmethod
+    def release_ref(cursor, file_url):
+        key = UploadBlob.parse_url(file_url)
+        if key:
+            cursor.execute(
+                """UPDATE upload_blobs
+                SET ref_count = GREATEST(ref_count - 1, 0), last_referenced_at = NOW()
+                WHERE sha256 = %s AND extension = %s""",
+                key
+            )
+
+    @staticmethod
+    def collect_garbage(grace_seconds, remove_files):
+        """Borra los blobs sin referencias ni uso en `grace_seconds` y
+        devuelve los borrados. remove_files(blob) elimina sus archivos
+        antes del commit: mientras, la fila borrada sigue bloqueada y una
+        subida del mismo contenido espera en register(), así que su
+        archivo se coloca después y no lo borra esta pasada."""
+        cutoff = datetime.now() - timedelta(seconds=grace_seconds)
+        connection = Database.get_connection()
+        cursor = connection.cursor(dictionary=True)
+        try:
+            cursor.execute(
+                """SELECT sha256, extension, size FROM upload_blobs
+                WHERE ref_count = 0 AND last_referenced_at < %s""",
+                (cutoff,)
+            )
+            removed = []
+            for blob in cursor.fetchall():
+                # Se vuelve a comprobar al borrar: pudo reutilizarse entretanto
+                cursor.execute(
+                    """DELETE FROM upload_blobs
+                    WHERE sha256 = %s AND extension = %s
+                    AND ref_count = 0 AND last_referenced_at < %s""",
+                    (blob['sha256'], blob['extension'], cutoff)
+                )
+                if cursor.rowcount:
+                    remove_files(blob)
+                    removed.append(blob)
+                connection.commit()
+            return removed
+        except Exception as e:
+            connection.rollback()
+            print(f"Error en UploadBlob.collect_garbage(): {str(e)}")
+            raise e
+        finally:
+            Database.close_connection(connection, cursor)
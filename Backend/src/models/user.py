@@ -1,10 +1,11 @@
 from src.config.database import Database
+from src.services.profile_cache import ProfileCache
 import bcrypt
 
 class User:
     @staticmethod
     def get_by_id(user_id):
-        connection = Database.get_connection()
+        connection = Database.get_connection(read_only=True, user_id=user_id)
         cursor = connection.cursor(dictionary=True)
         try:
             cursor.execute("""
@@ -44,6 +45,7 @@ class User:
             values.append(user_id)
             cursor.execute(query, tuple(values))
             connection.commit()
+            ProfileCache.invalidate(user_id)
             return cursor.rowcount > 0
         except Exception as e:
             connection.rollback()
@@ -58,6 +60,7 @@ class User:
         try:
             cursor.execute("DELETE FROM users WHERE id = %s", (user_id,))
             connection.commit()
+            ProfileCache.invalidate(user_id)
             return cursor.rowcount > 0
         except Exception as e:
             connection.rollback()
@@ -108,7 +111,7 @@ class User:
 
     @staticmethod
     def get_all_except(user_id):
-        connection = Database.get_connection()
+        connection = Database.get_connection(read_only=True, user_id=user_id)
         cursor = connection.cursor(dictionary=True)
         try:
             cursor.execute("SELECT id, name, avatar_url FROM users WHERE id != %s", (user_id,))
@@ -1,21 +1,47 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from src.models.chat import Chat, Message
-from src.config.settings import token_required
-import os
-from werkzeug.utils import secure_filename
-from datetime import datetime
+from src.sockets.chat import emit_to_chat, attachment_ready
+from src.config.settings import (
+    token_required, MESSAGES_PAGE_SIZE, MESSAGES_PAGE_MAX, UPLOAD_FOLDER, ALLOWED_EXTENSIONS
+)
 from src.config.database import Database
+from src.services.blob_store import BlobStore
+from src.services.metrics import Metrics
+from src.services.thumbnails import thumbnails
+from src.services.uploads import ChunkedUploadStore, UploadError
 
 chats_bp = Blueprint('chats', __name__)
 
-# Configuración de uploads
-UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), '..', 'static', 'uploads')
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'pdf', 'doc', 'docx', 'mp4', 'mp3'}
-
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+blob_store = BlobStore(UPLOAD_FOLDER)
+chunked_uploads = ChunkedUploadStore(UPLOAD_FOLDER, blob_store)
+Metrics.register('uploads', blob_store.stats)
+thumbnails.configure(blob_store, attachment_ready)
+
+def upload_error(e):
+    return jsonify({"success": False, "error": str(e), **e.details}), e.status
+
+def upload_response(blob, file_name):
+    """Respuesta común de /upload y de las subidas por partes. Las
+    miniaturas se generan aparte: si aún no están, thumbnails_pending y
+    llegan luego por socket con 'attachment_ready'"""
+    urls = thumbnails.urls(blob['file_url'])
+    pending = urls is None and thumbnails.submit(
+        current_app.extensions['socketio'], blob['file_url'], user_id=request.user_id
+    )
+    return {
+        "success": True,
+        "file_url": blob['file_url'],
+        "file_name": file_name,
+        "file_size": blob['size'],
+        "sha256": blob['sha256'],
+        "deduplicated": blob['deduplicated'],
+        "thumbnails": urls,
+        "thumbnails_pending": pending
+    }
+
 @chats_bp.route('/', methods=['GET'])
 @token_required
 def get_user_chats():
@@ -113,13 +139,41 @@ def create_group_chat():
 @chats_bp.route('/<int:chat_id>/messages', methods=['GET'])
 @token_required
 def get_chat_messages(chat_id):
-    """Obtiene mensajes de un chat"""
+    """Obtiene una página de mensajes de un chat.
+
+    Query params: before / after (id de mensaje usado como cursor) y limit
+    (máximo MESSAGES_PAGE_MAX). paging.prev_cursor se pasa como before para
+    cargar mensajes anteriores y paging.next_cursor como after para los
+    posteriores; valen null cuando no hay más en esa dirección."""
     try:
         before_message_id = request.args.get('before', type=int)
-        messages = Message.get_by_chat(chat_id, before_message_id=before_message_id)
+        after_message_id = request.args.get('after', type=int)
+        if before_message_id and after_message_id:
+            return jsonify({"success": False, "error": "Usa before o after, no ambos"}), 400
+        limit = request.args.get('limit', default=MESSAGES_PAGE_SIZE, type=int)
+        limit = min(max(limit, 1), MESSAGES_PAGE_MAX)
+
+        page = Message.get_by_chat(
+            chat_id,
+            limit=limit,
+            before_message_id=before_message_id,
+            after_message_id=after_message_id
+        )
+        messages = page['messages']
+
+        if after_message_id:
+            has_older, has_newer = True, page['has_more']
+        else:
+            has_older, has_newer = page['has_more'], bool(before_message_id)
+
         return jsonify({
             "success": True,
-            "data": messages
+            "data": messages,
+            "paging": {
+                "limit": limit,
+                "prev_cursor": messages[0]['id'] if messages and has_older else None,
+                "next_cursor": messages[-1]['id'] if messages and has_newer else None
+            }
         }), 200
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
@@ -133,7 +187,7 @@ def send_message(chat_id):
         if not data or 'content' not in data:
             return jsonify({"success": False, "error": "Se requiere contenido"}), 400
 
-        message_id = Message.create(
+        message = Message.create(
             chat_id=chat_id,
             user_id=request.user_id,
             content=data['content'],
@@ -142,12 +196,14 @@ def send_message(chat_id):
             file_size=data.get('file_size')
         )
         
-        if not message_id:
+        if not message:
             return jsonify({"success": False, "error": "No se pudo enviar el mensaje"}), 500
-            
+
+        message = thumbnails.decorate(current_app.extensions['socketio'], message)
         return jsonify({
             "success": True,
-            "message_id": message_id
+            "message_id": message['id'],
+            "data": message
         }), 201
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
@@ -169,6 +225,36 @@ def mark_message_as_read(message_id):
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
+@chats_bp.route('/<int:chat_id>/read', methods=['POST'])
+@token_required
+def mark_chat_as_read(chat_id):
+    """Marca como leídos todos los mensajes hasta up_to_message_id"""
+    data = request.get_json()
+    up_to_message_id = data.get('up_to_message_id') if isinstance(data, dict) else None
+    if not isinstance(up_to_message_id, int) or isinstance(up_to_message_id, bool) \
+            or up_to_message_id <= 0:
+        return jsonify({"success": False, "error": "Se requiere up_to_message_id"}), 400
+
+    try:
+        result = Message.mark_read_up_to(chat_id, request.user_id, up_to_message_id)
+        if result is None:
+            return jsonify({"success": False, "error": "No se pudieron marcar los mensajes"}), 500
+
+        if result['marked']:
+            # Un único evento con la marca de agua (ya acotada) para todo el rango
+            emit_to_chat(current_app.extensions['socketio'], 'messages_read', {
+                'chat_id': chat_id,
+                'user_id': request.user_id,
+                'up_to_message_id': result['up_to_message_id']
+            }, chat_id)
+
+        return jsonify({"success": True, "marked": result['marked'],
+                        "up_to_message_id": result['up_to_message_id']}), 200
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
 @chats_bp.route('/messages/<int:message_id>', methods=['DELETE'])
 @token_required
 def delete_message(message_id):
@@ -194,20 +280,82 @@ def upload_file():
         return jsonify({"success": False, "error": "Nombre de archivo vacío"}), 400
         
     if file and allowed_file(file.filename):
-        filename = secure_filename(f"{datetime.now().timestamp()}_{file.filename}")
-        filepath = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(filepath)
-        
-        file_url = f"/uploads/{filename}"
-        return jsonify({
-            "success": True,
-            "file_url": file_url,
-            "file_name": file.filename,
-            "file_size": os.path.getsize(filepath)
-        }), 200
+        # Se guarda por contenido: el hash se calcula mientras se escribe
+        blob = blob_store.save_stream(file.stream, file.filename)
+        return jsonify(upload_response(blob, file.filename)), 200
         
     return jsonify({"success": False, "error": "Tipo de archivo no permitido"}), 400
 
+# Subida por partes reanudable: init -> PATCH por offset -> finalize.
+# Tras un corte, GET (o HEAD) devuelve el offset desde el que seguir.
+@chats_bp.route('/uploads', methods=['POST'])
+@token_required
+def create_upload():
+    """Inicia una subida por partes: {filename, size, sha256?}. Si el
+    cliente manda el sha256 y ese contenido ya está guardado, responde
+    con complete=true y el archivo listo, sin que haga falta enviarlo"""
+    data = request.get_json(silent=True) or {}
+    filename = data.get('filename') or ''
+    size = data.get('size')
+    if not allowed_file(filename):
+        return jsonify({"success": False, "error": "Tipo de archivo no permitido"}), 400
+    if not isinstance(size, int):
+        return jsonify({"success": False, "error": "size es requerido"}), 400
+    existing = blob_store.lookup(data.get('sha256'), filename, size)
+    if existing:
+        return jsonify({"complete": True, **upload_response(existing, filename)}), 200
+    try:
+        return jsonify({"success": True, **chunked_uploads.create(request.user_id, filename, size)}), 201
+    except UploadError as e:
+        return upload_error(e)
+
+@chats_bp.route('/uploads/<upload_id>', methods=['GET'])
+@token_required
+def get_upload(upload_id):
+    """Estado de la subida; Upload-Offset indica cuánto se ha recibido"""
+    try:
+        state = chunked_uploads.status(upload_id, request.user_id)
+    except UploadError as e:
+        return upload_error(e)
+    response = jsonify({"success": True, **state})
+    response.headers['Upload-Offset'] = str(state['offset'])
+    return response, 200
+
+@chats_bp.route('/uploads/<upload_id>', methods=['PATCH'])
+@token_required
+def append_upload(upload_id):
+    """Añade una parte: cuerpo binario y su posición en Upload-Offset (o ?offset=)"""
+    offset = request.headers.get('Upload-Offset', request.args.get('offset'))
+    if offset is None or not offset.isdigit():
+        return jsonify({"success": False, "error": "Upload-Offset es requerido"}), 400
+    try:
+        # request.stream: el cuerpo se lee por bloques, sin cargarlo entero
+        state = chunked_uploads.append(upload_id, request.user_id, int(offset), request.stream)
+    except UploadError as e:
+        return upload_error(e)
+    response = jsonify({"success": True, **state})
+    response.headers['Upload-Offset'] = str(state['offset'])
+    return response, 200
+
+@chats_bp.route('/uploads/<upload_id>/finalize', methods=['POST'])
+@token_required
+def finalize_upload(upload_id):
+    """Cierra una subida completa; responde igual que /upload"""
+    try:
+        blob, meta = chunked_uploads.finalize(upload_id, request.user_id)
+    except UploadError as e:
+        return upload_error(e)
+    return jsonify(upload_response(blob, meta['filename'])), 200
+
+@chats_bp.route('/uploads/<upload_id>', methods=['DELETE'])
+@token_required
+def cancel_upload(upload_id):
+    try:
+        chunked_uploads.cancel(upload_id, request.user_id)
+    except UploadError as e:
+        return upload_error(e)
+    return jsonify({"success": True}), 200
+
 
 
 
@@ -0,0 +1,116 @@
+from datetime import datetime, timedelta
+from flask import Blueprint, request, jsonify
+from src.models.change_log import ChangeLog
+from src.models.note import Note
+from src.models.task import Task
+from src.models.event import Event
+from src.models.chat import Chat
+from src.config.settings import token_required, SYNC_PAGE_SIZE, SYNC_SETTLE_SECONDS
+
+sync_bp = Blueprint('sync', __name__)
+
+# entidad en change_log -> (clave en la respuesta, lectura por ids)
+ENTITIES = {
+    'note': ('notes', lambda user_id, ids: Note.get_by_user(user_id, ids=ids)),
+    'task': ('tasks', lambda user_id, ids: Task.get_by_user(user_id, ids=ids)),
+    'event': ('events', lambda user_id, ids: Event.get_by_user(user_id, ids=ids)),
+}
+
+TOKEN_TIME_FORMAT = '%Y%m%d%H%M%S'
+
+
+def _encode_token(change_id, horizon):
+    return f"{change_id}.{horizon.strftime(TOKEN_TIME_FORMAT)}"
+
+
+def _decode_token(token):
+    """(último id de change_log aplicado, instante hasta el que se
+    entregó la actividad de chats); ValueError si no es válido"""
+    change_id, _, horizon = token.partition('.')
+    return int(change_id), datetime.strptime(horizon, TOKEN_TIME_FORMAT)
+
+
+@sync_bp.route('', methods=['GET'])
+@token_required
+def sync():
+    """Cambios desde `since` (notas, tareas, eventos y chats): filas creadas
+    o modificadas y tombstones de las borradas. Sin `since`, o con un token
+    anterior a la limpieza del registro, devuelve la instantánea completa.
+    El token nuevo solo avanza hasta lo ya asentado (SYNC_SETTLE_SECONDS);
+    lo más reciente puede volver a llegar en la siguiente llamada, y como
+    son upserts repetirlo no cambia nada en el cliente."""
+    user_id = request.user_id
+    # Sin microsegundos: el token guarda segundos y sent_at también
+    horizon = (datetime.now() - timedelta(seconds=SYNC_SETTLE_SECONDS)).replace(microsecond=0)
+
+    since = request.args.get('since')
+    if since:
+        try:
+            since_id, since_time = _decode_token(since)
+        except ValueError:
+            return jsonify({"error": "Token de sincronización inválido"}), 400
+        first_id = ChangeLog.get_first_id()
+        if first_id is not None and since_id < first_id - 1:
+            since = None  # el registro ya no cubre ese token
+
+    try:
+        if not since:
+            # El token se toma antes de leer: lo escrito durante la lectura
+            # se repite en la siguiente sincronización en vez de perderse
+            change_id = ChangeLog.get_settled_id(user_id, horizon)
+            response = {
+                key: {"upserts": load(user_id, None), "deleted": []}
+                for key, load in ENTITIES.values()
+            }
+            response["chats"] = {"upserts": Chat.get_user_chats(user_id), "deleted": []}
+            response.update({
+                "full": True,
+                "has_more": False,
+                "token": _encode_token(change_id, horizon)
+            })
+            return jsonify(response), 200
+
+        # change_log va primero y al primario: el resto de lecturas de la
+        # petición reutilizan esa conexión y ven lo mismo que el registro
+        rows = ChangeLog.get_since(user_id, since_id, SYNC_PAGE_SIZE + 1)
+        has_more = len(rows) > SYNC_PAGE_SIZE
+        rows = rows[:SYNC_PAGE_SIZE]
+
+        # Varios cambios de la misma fila se reducen al último
+        latest = {}
+        next_id = since_id
+        settled = True
+        for row in rows:
+            latest[(row['entity'], row['entity_id'])] = row['op']
+            settled = settled and row['changed_at'] <= horizon
+            if settled:
+                next_id = row['id']
+
+        response = {}
+        for entity, (key, load) in ENTITIES.items():
+            upsert_ids = [eid for (ent, eid), op in latest.items() if ent == entity and op == 'upsert']
+            deleted = [eid for (ent, eid), op in latest.items() if ent == entity and op == 'delete']
+            upserts = load(user_id, upsert_ids)
+            # Modificada y borrada después (fuera de esta página): tombstone
+            found = {row['id'] for row in upserts}
+            deleted.extend(eid for eid in upsert_ids if eid not in found)
+            response[key] = {"upserts": upserts, "deleted": deleted}
+
+        # Chats: los anotados en el registro más los que tienen mensajes
+        # nuevos, que se detectan por last_message_at sin escribir en change_log
+        chat_ids = [eid for (ent, eid), op in latest.items() if ent == 'chat' and op == 'upsert']
+        chats = Chat.get_user_chats(user_id, chat_ids=chat_ids, active_since=since_time)
+        found = {chat['id'] for chat in chats}
+        response["chats"] = {
+            "upserts": chats,
+            "deleted": [eid for (ent, eid), op in latest.items()
+                        if ent == 'chat' and (op == 'delete' or eid not in found)]
+        }
+        response.update({
+            "full": False,
+            "has_more": has_more,
+            "token": _encode_token(next_id, max(horizon, since_time))
+        })
+        return jsonify(response), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
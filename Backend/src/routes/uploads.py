@@ -0,0 +1,72 @@
+import os
+import re
+from urllib.parse import quote
+from flask import Blueprint, request, jsonify, send_file, current_app
+from werkzeug.security import safe_join
+from werkzeug.utils import send_file as werkzeug_send_file
+from werkzeug.wsgi import wrap_file
+from src.config.settings import UPLOAD_FOLDER, UPLOAD_CACHE_MAX_AGE, UPLOAD_ACCEL_REDIRECT
+
+uploads_bp = Blueprint('uploads', __name__)
+
+# blobs/<aa>/<sha256>.<ext> y sus derivados <blob>.<variante>.jpg
+_BLOB_PATH = re.compile(r'^blobs/[0-9a-f]{2}/([0-9a-f]{64})\.[a-z0-9]{1,16}(?:\.([a-z0-9]+)\.jpg)?$')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+@uploads_bp.route('/uploads/<path:filename>', methods=['GET', 'HEAD'])
+def serve_upload(filename):
+    """Sirve un archivo subido: Range (206), ETag fuerte con If-None-Match
+    (304) y caché larga para los blobs, que no cambian nunca"""
+    path = safe_join(UPLOAD_FOLDER, filename)
+    # Las rutas ocultas (.incoming: subidas sin terminar) no se sirven
+    if path is None or any(part.startswith('.') for part in filename.split('/')) \
+            or not os.path.isfile(path):
+        return jsonify({"success": False, "error": "Archivo no encontrado"}), 404
+
+    match = _BLOB_PATH.match(filename)
+    if match:
+        # El hash del contenido es el ETag; en un derivado, hash y variante
+        etag = '.'.join(part for part in match.groups() if part)
+        max_age = None
+    else:
+        etag = True  # archivos antiguos: mtime, tamaño y ruta
+        max_age = UPLOAD_CACHE_MAX_AGE
+
+    if UPLOAD_ACCEL_REDIRECT:
+        response = _accel_redirect(path, filename, etag, max_age)
+    else:
+        response = send_file(path, conditional=True, etag=etag, max_age=max_age)
+        if response.status_code == 206:
+            _sendfile_range(response, path)
+    # También en el 200, para que el reproductor sepa que puede pedir rangos
+    response.accept_ranges = 'bytes'
+    if match:
+        response.headers['Cache-Control'] = IMMUTABLE
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    return response
+
+
+def _accel_redirect(path, filename, etag, max_age):
+    """Solo cabeceras: nginx envía el archivo (sendfile) y atiende Range.
+    El 304 se resuelve aquí con nuestro ETag, sin llegar a nginx."""
+    response = werkzeug_send_file(path, request.environ, conditional=False, etag=etag,
+                                  max_age=max_age, use_x_sendfile=True,
+                                  response_class=current_app.response_class)
+    del response.headers['X-Sendfile']
+    response.make_conditional(request.environ)
+    if response.status_code == 200:
+        response.headers['X-Accel-Redirect'] = UPLOAD_ACCEL_REDIRECT + quote(filename)
+    return response
+
+
+def _sendfile_range(response, path):
+    """send_file sirve un rango leyendo el archivo en Python. Si el servidor
+    ofrece wsgi.file_wrapper (gunicorn: sendfile), se le pasa el archivo ya
+    situado al inicio del rango; Content-Length limita lo que envía."""
+    if 'wsgi.file_wrapper' not in request.environ:
+        return
+    file = open(path, 'rb')
+    file.seek(response.content_range.start)
+    response.response.close()
+    response.response = wrap_file(request.environ, file)
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from src.models.user import User
-from src.config.settings import token_required
+from src.config.settings import token_required, PRESENCE_BATCH_MAX
+from src.services.presence import presence
 
 users_bp = Blueprint('users', __name__)
 
@@ -92,3 +93,18 @@ def get_user_by_id(user_id):
 def listar_usuarios():
     usuarios = User.get_all_except(request.user_id)
     return jsonify({"users": usuarios}), 200
+
+
+@users_bp.route('/presence', methods=['POST'])
+@token_required
+def get_presence():
+    """Estado en línea de un lote de usuarios, respondido desde memoria"""
+    data = request.get_json(silent=True) or {}
+    user_ids = data.get('user_ids')
+    if not isinstance(user_ids, list) or not all(isinstance(u, int) for u in user_ids):
+        return jsonify({"error": "user_ids debe ser una lista de enteros"}), 400
+    if len(user_ids) > PRESENCE_BATCH_MAX:
+        return jsonify({"error": f"Máximo {PRESENCE_BATCH_MAX} usuarios por consulta"}), 400
+
+    status = presence.online(list(dict.fromkeys(user_ids)))
+    return jsonify({"presence": {str(user_id): online for user_id, online in status.items()}}), 200
@@ -0,0 +1,136 @@
+"""Almacenamiento de adjuntos por contenido.
+
+Cada archivo se guarda una sola vez en `folder`/blobs/<aa>/<sha256>.<ext>
+(aa = dos primeros caracteres del hash) y su URL pública se deriva del
+hash. El hash se calcula mientras llegan los datos; si el mismo contenido
+ya está guardado, la copia recién recibida se descarta y se reutiliza el
+blob existente. upload_blobs lleva la cuenta de mensajes que lo usan y
+gc-uploads borra los que se quedan sin ninguno."""
+import glob
+import hashlib
+import os
+import re
+import secrets
+import threading
+from src.config.settings import UPLOAD_CHUNK_BUFFER
+from src.models.upload_blob import UploadBlob
+
+_SHA256 = re.compile(r'^[0-9a-f]{64}$')
+
+
+def extension_of(filename):
+    return filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+
+
+class BlobStore:
+    def __init__(self, folder, buffer_size=UPLOAD_CHUNK_BUFFER):
+        self.folder = folder
+        self.root = os.path.join(folder, 'blobs')
+        self.incoming = os.path.join(folder, '.incoming')
+        self.buffer_size = buffer_size
+        os.makedirs(self.incoming, exist_ok=True)
+        self._lock = threading.Lock()
+        self._stats = {'uploads': 0, 'received_bytes': 0, 'stored_bytes': 0,
+                       'dedup_hits': 0, 'disk_bytes_saved': 0,
+                       'preflight_hits': 0, 'transfer_bytes_saved': 0,
+                       'rehashed': 0, 'gc_removed': 0, 'gc_bytes_freed': 0}
+
+    def path_for(self, sha256, extension):
+        return os.path.join(self.root, sha256[:2], f"{sha256}.{extension}")
+
+    def _count(self, **increments):
+        with self._lock:
+            for key, value in increments.items():
+                self._stats[key] += value
+
+    def save_stream(self, stream, filename):
+        """Guarda lo que llega por `stream` calculando el hash a la vez"""
+        temp_path = os.path.join(self.incoming, f"{secrets.token_hex(16)}.tmp")
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(temp_path, 'wb') as f:
+                while True:
+                    chunk = stream.read(self.buffer_size)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            return self.ingest(temp_path, filename, size, digest.hexdigest())
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def ingest(self, path, filename, size, sha256=None):
+        """Convierte el archivo completo en `path` en un blob (lo mueve o, si
+        ya existía ese contenido, lo borra). Sin `sha256` se calcula leyendo
+        el archivo. Devuelve {'file_url', 'sha256', 'size', 'deduplicated'}."""
+        if sha256 is None:
+            sha256 = self.hash_file(path)
+            self._count(rehashed=1)
+        extension = extension_of(filename)
+        # Primero la fila: renueva last_referenced_at y así gc-uploads no
+        # borra el blob entre esta comprobación y el envío del mensaje
+        created = UploadBlob.register(sha256, extension, size)
+        target = self.path_for(sha256, extension)
+        if created or not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(path, target)
+            self._count(uploads=1, received_bytes=size, stored_bytes=size)
+            deduplicated = False
+        else:
+            os.remove(path)
+            self._count(uploads=1, received_bytes=size, dedup_hits=1, disk_bytes_saved=size)
+            deduplicated = True
+        return {'file_url': UploadBlob.url_for(sha256, extension),
+                'sha256': sha256, 'size': size, 'deduplicated': deduplicated}
+
+    def lookup(self, sha256, filename, size):
+        """Blob con ese hash y tamaño, si ya está guardado: el cliente que
+        anuncia el hash al iniciar la subida no necesita enviar los datos"""
+        sha256 = (sha256 or '').lower()
+        if not _SHA256.match(sha256):
+            return None
+        extension = extension_of(filename)
+        blob = UploadBlob.get(sha256, extension)
+        if not blob or blob['size'] != size or not os.path.exists(self.path_for(sha256, extension)):
+            return None
+        if UploadBlob.register(sha256, extension, size):
+            # gc-uploads lo borró entre la consulta y el registro: que se suba
+            return None
+        self._count(uploads=1, preflight_hits=1, transfer_bytes_saved=size)
+        return {'file_url': UploadBlob.url_for(sha256, extension),
+                'sha256': sha256, 'size': size, 'deduplicated': True}
+
+    def hash_file(self, path):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(self.buffer_size), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def collect_garbage(self, grace_seconds):
+        """Borra los blobs sin referencias; devuelve (blobs, bytes liberados)"""
+        freed = 0
+
+        def remove_files(blob):
+            nonlocal freed
+            path = self.path_for(blob['sha256'], blob['extension'])
+            if os.path.exists(path):
+                os.remove(path)
+                freed += blob['size']
+            # Miniaturas y pósters derivados (<blob>.<variante>.jpg)
+            for derived in glob.glob(glob.escape(path) + '.*.jpg'):
+                os.remove(derived)
+
+        # Cada archivo se borra dentro de la transacción que borra su fila
+        removed = UploadBlob.collect_garbage(grace_seconds, remove_files)
+        self._count(gc_removed=len(removed), gc_bytes_freed=freed)
+        return len(removed), freed
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['dedup_ratio'] = round(stats['dedup_hits'] / stats['uploads'], 3) if stats['uploads'] else 0
+        return stats
@@ -0,0 +1,289 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+from src.config.settings import (
+    DELIVERY_QUEUE_MAX, DELIVERY_QUEUE_TTL, DELIVERY_MAX_QUEUES, DELIVERY_STORE_URL
+)
+from src.services.metrics import Metrics
+from src.services.redis_url import resolve_redis_url
+
+
+class _DeviceQueue:
+    __slots__ = ('entries', 'gaps', 'expires_at')
+
+    def __init__(self):
+        self.entries = OrderedDict()  # message_id -> (chat_id, payload), en orden de id
+        self.gaps = {}                # chat_id -> primer message_id descartado
+        self.expires_at = 0.0
+
+
+class LocalDeliveryStore:
+    """Colas de mensajes sin confirmar en memoria del proceso (un solo worker),
+    una por dispositivo (user_id, device_id) que pidió confirmaciones. La
+    cola existe desde register() y caduca a los `ttl` segundos sin contacto
+    del dispositivo; las caducadas y las que exceden max_queues salen por
+    el principio (orden de último contacto)."""
+
+    def __init__(self, max_len=DELIVERY_QUEUE_MAX, ttl=DELIVERY_QUEUE_TTL, max_queues=DELIVERY_MAX_QUEUES):
+        self.max_len = max_len
+        self.ttl = ttl
+        self.max_queues = max_queues
+        self._queues = OrderedDict()  # (user_id, device_id) -> _DeviceQueue
+        self._devices = {}            # user_id -> {device_id}
+        self._lock = threading.Lock()
+
+    def register(self, user_id, device_id):
+        """Alta o renovación del dispositivo (al conectar y en cada latido).
+        Si su cola ya había caducado empieza vacía: lo anterior no se guardó."""
+        now = time.monotonic()
+        key = (user_id, device_id)
+        with self._lock:
+            queue = self._queues.get(key)
+            if queue is None or queue.expires_at <= now:
+                queue = self._queues[key] = _DeviceQueue()
+                self._devices.setdefault(user_id, set()).add(device_id)
+            queue.expires_at = now + self.ttl
+            self._queues.move_to_end(key)
+            self._evict(now)
+
+    def _evict(self, now):
+        while self._queues:
+            key, first = next(iter(self._queues.items()))
+            if first.expires_at > now and len(self._queues) <= self.max_queues:
+                break
+            del self._queues[key]
+            devices = self._devices.get(key[0])
+            if devices is not None:
+                devices.discard(key[1])
+                if not devices:
+                    del self._devices[key[0]]
+
+    def devices(self, user_id):
+        """Dispositivos del usuario con cola viva"""
+        now = time.monotonic()
+        with self._lock:
+            return [device_id for device_id in self._devices.get(user_id, ())
+                    if self._queues[(user_id, device_id)].expires_at > now]
+
+    def push(self, user_id, device_id, chat_id, message_id, payload):
+        """Encola; devuelve cuántos mensajes se descartaron por el límite"""
+        dropped = 0
+        with self._lock:
+            queue = self._queues.get((user_id, device_id))
+            if queue is None or queue.expires_at <= time.monotonic():
+                return 0
+            queue.entries[message_id] = (chat_id, payload)
+            while len(queue.entries) > self.max_len:
+                old_id, (old_chat, _) = queue.entries.popitem(last=False)
+                queue.gaps.setdefault(old_chat, old_id)
+                dropped += 1
+        return dropped
+
+    def ack(self, user_id, device_id, chat_id, up_to_message_id):
+        """Confirma lo recibido de un chat hasta up_to_message_id; devuelve cuántos"""
+        with self._lock:
+            queue = self._queues.get((user_id, device_id))
+            if queue is None:
+                return 0
+            acked = [mid for mid, (cid, _) in queue.entries.items()
+                     if cid == chat_id and mid <= up_to_message_id]
+            for mid in acked:
+                del queue.entries[mid]
+            return len(acked)
+
+    def pending(self, user_id, device_id):
+        """(payloads sin confirmar en orden, huecos {chat_id: primer id perdido}).
+        Los huecos se entregan una sola vez; los mensajes siguen hasta el ack."""
+        with self._lock:
+            queue = self._queues.get((user_id, device_id))
+            if queue is None or queue.expires_at <= time.monotonic():
+                return [], {}
+            gaps, queue.gaps = queue.gaps, {}
+            return [payload for _, payload in queue.entries.values()], gaps
+
+    def count(self):
+        with self._lock:
+            return len(self._queues)
+
+
+def _encode(obj):
+    # Las fechas se guardan con su tipo para reconstruirlas al reenviar: el
+    # mensaje repetido debe salir igual que en vivo (en la codificación
+    # compacta un datetime viaja como epoch, no como texto)
+    if isinstance(obj, datetime):
+        return {'$dt': obj.isoformat()}
+    if isinstance(obj, date):
+        return {'$d': obj.isoformat()}
+    if isinstance(obj, Decimal):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _decode(obj):
+    if len(obj) == 1:
+        if '$dt' in obj:
+            return datetime.fromisoformat(obj['$dt'])
+        if '$d' in obj:
+            return date.fromisoformat(obj['$d'])
+    return obj
+
+
+def dumps_entry(entry):
+    return json.dumps(entry, default=_encode, separators=(',', ':'))
+
+
+def loads_entry(raw):
+    return json.loads(raw, object_hook=_decode)
+
+
+class RedisDeliveryStore:
+    """Mismo contrato que LocalDeliveryStore pero compartido entre workers:
+    por dispositivo, un sorted set {mensaje: message_id} y un hash de
+    huecos, y por usuario un hash {device_id: caduca_en} con sus
+    dispositivos; todo con EXPIRE, así la memoria queda acotada sin barridos."""
+
+    def __init__(self, url, max_len=DELIVERY_QUEUE_MAX, ttl=DELIVERY_QUEUE_TTL, prefix='delivery'):
+        import redis  # dependencia opcional: solo con varios workers
+        self._redis = redis.Redis.from_url(url)
+        self.max_len = max_len
+        self.ttl = ttl
+        self._prefix = prefix
+
+    def _keys(self, user_id, device_id):
+        base = f'{self._prefix}:{user_id}:{device_id}'
+        return base + ':q', base + ':gaps'
+
+    def _devices_key(self, user_id):
+        return f'{self._prefix}:{user_id}:devices'
+
+    def register(self, user_id, device_id):
+        now = time.time()
+        devices_key = self._devices_key(user_id)
+        queue_key, gaps_key = self._keys(user_id, device_id)
+        expires_at = self._redis.hget(devices_key, device_id)
+        pipe = self._redis.pipeline()
+        if expires_at is None or float(expires_at) <= now:
+            # Caducada: lo que quede de antes tiene un hueco sin señalar
+            pipe.delete(queue_key, gaps_key)
+        pipe.hset(devices_key, device_id, now + self.ttl)
+        pipe.expire(devices_key, self.ttl)
+        pipe.expire(queue_key, self.ttl)
+        pipe.expire(gaps_key, self.ttl)
+        pipe.execute()
+
+    def devices(self, user_id):
+        now = time.time()
+        devices_key = self._devices_key(user_id)
+        live, expired = [], []
+        for device_id, expires_at in self._redis.hgetall(devices_key).items():
+            if isinstance(device_id, bytes):
+                device_id = device_id.decode()
+            (live if float(expires_at) > now else expired).append(device_id)
+        if expired:
+            self._redis.hdel(devices_key, *expired)
+        return live
+
+    def push(self, user_id, device_id, chat_id, message_id, payload):
+        queue_key, gaps_key = self._keys(user_id, device_id)
+        entry = dumps_entry({'chat_id': chat_id, 'payload': payload})
+        pipe = self._redis.pipeline()
+        pipe.zadd(queue_key, {entry: message_id})
+        pipe.zcard(queue_key)
+        pipe.expire(queue_key, self.ttl)
+        _, size, _ = pipe.execute()
+        if size <= self.max_len:
+            return 0
+        # Se descartan los más antiguos; el primer id perdido de cada chat
+        # queda como hueco (HSETNX conserva el menor)
+        dropped = self._redis.zpopmin(queue_key, size - self.max_len)
+        pipe = self._redis.pipeline()
+        for raw, score in dropped:
+            pipe.hsetnx(gaps_key, loads_entry(raw)['chat_id'], int(score))
+        pipe.expire(gaps_key, self.ttl)
+        pipe.execute()
+        return len(dropped)
+
+    def ack(self, user_id, device_id, chat_id, up_to_message_id):
+        queue_key, _ = self._keys(user_id, device_id)
+        acked = [raw for raw in self._redis.zrangebyscore(queue_key, '-inf', up_to_message_id)
+                 if loads_entry(raw)['chat_id'] == chat_id]
+        if not acked:
+            return 0
+        return self._redis.zrem(queue_key, *acked)
+
+    def pending(self, user_id, device_id):
+        queue_key, gaps_key = self._keys(user_id, device_id)
+        pipe = self._redis.pipeline()
+        pipe.zrange(queue_key, 0, -1)
+        pipe.hgetall(gaps_key)
+        pipe.delete(gaps_key)
+        entries, gaps, _ = pipe.execute()
+        return ([loads_entry(raw)['payload'] for raw in entries],
+                {int(chat_id): int(first) for chat_id, first in gaps.items()})
+
+    def count(self):
+        return None  # no se cuentan claves en Redis (SCAN sería costoso)
+
+
+def create_delivery_store(url=None):
+    url = resolve_redis_url(url or DELIVERY_STORE_URL)
+    return RedisDeliveryStore(url) if url else LocalDeliveryStore()
+
+
+class DeliveryTracker:
+    """Entrega con confirmación: cada mensaje emitido queda en la cola de
+    cada dispositivo de sus destinatarios que pidió confirmaciones, hasta
+    que ese dispositivo lo confirma (evento "ack" o al marcarlo como leído
+    desde él). Al reconectar se le reenvía solo lo suyo pendiente, y si su
+    cola se desbordó, el hueco para pedirlo por REST (?after=). Los
+    clientes que no envían "ack" no tienen cola."""
+
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.Lock()
+        self._stats = {'queued': 0, 'acked': 0, 'replayed': 0, 'dropped': 0, 'gaps': 0}
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self._stats[key] += n
+
+    def register(self, user_id, device_id):
+        self.store.register(user_id, device_id)
+
+    def enqueue(self, user_ids, chat_id, message_id, payload):
+        for user_id in user_ids:
+            for device_id in self.store.devices(user_id):
+                dropped = self.store.push(user_id, device_id, chat_id, message_id, payload)
+                self._count('queued')
+                if dropped:
+                    self._count('dropped', dropped)
+
+    def ack(self, user_id, device_id, chat_id, up_to_message_id):
+        acked = self.store.ack(user_id, device_id, chat_id, up_to_message_id)
+        if acked:
+            self._count('acked', acked)
+        return acked
+
+    def replay(self, user_id, device_id):
+        """(mensajes a reenviar, huecos {chat_id: after_message_id})"""
+        payloads, gaps = self.store.pending(user_id, device_id)
+        self._count('replayed', len(payloads))
+        self._count('gaps', len(gaps))
+        return payloads, {chat_id: first - 1 for chat_id, first in gaps.items()}
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['store'] = type(self.store).__name__
+        try:
+            stats['queues'] = self.store.count()
+        except Exception as e:
+            stats['error'] = str(e)
+        return stats
+
+
+delivery = DeliveryTracker(create_delivery_store())
+Metrics.register('delivery', delivery.stats)
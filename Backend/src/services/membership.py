@@ -0,0 +1,78 @@
+import threading
+import time
+from collections import OrderedDict
+from src.config.settings import MEMBERSHIP_CACHE_TTL, MEMBERSHIP_CACHE_MAX_ENTRIES
+from src.services.metrics import Metrics
+
+
+class MembershipCache:
+    """Caché en memoria (por proceso) de pertenencia (usuario, chat) para
+    autorizar los eventos de socket con una búsqueda en diccionario.
+    Solo guarda pertenencias confirmadas en el primario (las negativas se
+    consultan siempre). La invalidan Chat.add_participant y
+    Message.delete_chat; el TTL acota lo que puede tardar en verse una
+    salida o un alta (en get_members) hecha desde otro worker."""
+    _entries = OrderedDict()  # (user_id, chat_id) -> (expira_en, es_miembro)
+    _members = OrderedDict()  # chat_id -> (expira_en, ids de participantes)
+    _lock = threading.Lock()
+    _stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    @classmethod
+    def get(cls, user_id, chat_id):
+        """True si está en caché, None si hay que consultarlo"""
+        key = (user_id, chat_id)
+        with cls._lock:
+            entry = cls._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                cls._stats['misses'] += 1
+                return None
+            cls._entries.move_to_end(key)
+            cls._stats['hits'] += 1
+            return entry[1]
+
+    @classmethod
+    def set(cls, user_id, chat_id, is_member):
+        key = (user_id, chat_id)
+        with cls._lock:
+            cls._entries[key] = (time.monotonic() + MEMBERSHIP_CACHE_TTL, is_member)
+            cls._entries.move_to_end(key)
+            while len(cls._entries) > MEMBERSHIP_CACHE_MAX_ENTRIES:
+                cls._entries.popitem(last=False)
+
+    @classmethod
+    def get_members(cls, chat_id):
+        """Participantes del chat si están en caché, None si hay que consultarlos"""
+        with cls._lock:
+            entry = cls._members.get(chat_id)
+            if entry is None or entry[0] < time.monotonic():
+                cls._stats['misses'] += 1
+                return None
+            cls._members.move_to_end(chat_id)
+            cls._stats['hits'] += 1
+            return entry[1]
+
+    @classmethod
+    def set_members(cls, chat_id, user_ids):
+        with cls._lock:
+            cls._members[chat_id] = (time.monotonic() + MEMBERSHIP_CACHE_TTL, frozenset(user_ids))
+            cls._members.move_to_end(chat_id)
+            while len(cls._members) > MEMBERSHIP_CACHE_MAX_ENTRIES:
+                cls._members.popitem(last=False)
+
+    @classmethod
+    def invalidate(cls, user_id, chat_id):
+        with cls._lock:
+            cls._members.pop(chat_id, None)
+            if cls._entries.pop((user_id, chat_id), None) is not None:
+                cls._stats['invalidations'] += 1
+
+    @classmethod
+    def stats(cls):
+        with cls._lock:
+            stats = dict(cls._stats)
+            stats['entries'] = len(cls._entries)
+            stats['chats'] = len(cls._members)
+            return stats
+
+
+Metrics.register('membership_cache', MembershipCache.stats)
@@ -0,0 +1,182 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from src.config.settings import (MESSAGE_CACHE_WINDOW, MESSAGE_CACHE_MAX_MESSAGES,
+                                 MESSAGE_CACHE_TTL)
+from src.services.metrics import Metrics
+
+
+class _Window:
+    def __init__(self, messages, complete):
+        self.messages = deque(messages, maxlen=MESSAGE_CACHE_WINDOW)
+        # complete: la ventana contiene todo el historial (no hay más antiguos)
+        self.complete = complete and len(messages) <= MESSAGE_CACHE_WINDOW
+        self.expires_at = time.monotonic() + MESSAGE_CACHE_TTL
+
+    @property
+    def newest_id(self):
+        return self.messages[-1]['id'] if self.messages else None
+
+    def insert(self, row):
+        """Inserta en orden de id (dos envíos simultáneos pueden llegar
+        al revés); devuelve cuántos mensajes añade a la ventana (0 o 1)"""
+        messages = self.messages
+        position = len(messages)
+        while position and messages[position - 1]['id'] >= row['id']:
+            if messages[position - 1]['id'] == row['id']:
+                return 0
+            position -= 1
+        if len(messages) < messages.maxlen:
+            messages.insert(position, row)
+            return 1
+        # Ventana llena: se cae el más antiguo
+        self.complete = False
+        if position == 0:
+            return 0  # más antiguo que toda la ventana: no entra
+        messages.popleft()
+        messages.insert(position - 1, row)
+        return 0
+
+
+class RecentMessageCache:
+    """Ventana caliente (por proceso) con los últimos mensajes de cada chat.
+
+    Se llena desde la primera página del historial (leída del primario) y
+    la mantienen Message.create / Message.delete. Antes de servirla se
+    compara su último id con chat_summaries.last_message_id: si no
+    coincide (un mensaje escrito desde otro worker o entre la lectura y el
+    llenado) se descarta y se vuelve a leer. La memoria total está acotada
+    por MESSAGE_CACHE_MAX_MESSAGES expulsando los chats menos usados (LRU),
+    y cada ventana caduca a los MESSAGE_CACHE_TTL segundos, lo que limita
+    lo que la comprobación no ve (lecturas y borrados de otros workers)."""
+    _chats = OrderedDict()  # chat_id -> _Window
+    _total = 0
+    _lock = threading.Lock()
+    _stats = {'hits': 0, 'misses': 0, 'stale': 0, 'evictions': 0, 'expired': 0}
+
+    @staticmethod
+    def _row(message):
+        # Misma forma que las filas de Message.get_by_chat
+        row = dict(message)
+        row.pop('status', None)
+        return row
+
+    @classmethod
+    def _get_window(cls, chat_id):
+        window = cls._chats.get(chat_id)
+        if window is None:
+            return None
+        if window.expires_at < time.monotonic():
+            cls._drop(chat_id)
+            cls._stats['expired'] += 1
+            return None
+        return window
+
+    @classmethod
+    def _drop(cls, chat_id):
+        window = cls._chats.pop(chat_id, None)
+        if window is not None:
+            cls._total -= len(window.messages)
+
+    @classmethod
+    def _evict(cls):
+        while cls._total > MESSAGE_CACHE_MAX_MESSAGES and cls._chats:
+            chat_id = next(iter(cls._chats))
+            cls._drop(chat_id)
+            cls._stats['evictions'] += 1
+
+    @classmethod
+    def get_latest(cls, chat_id, limit, last_message_id):
+        """Devuelve {'messages', 'has_more'} con los `limit` mensajes más
+        recientes, o None si la ventana no puede responder la página.
+        last_message_id es el del resumen del chat, leído del primario."""
+        with cls._lock:
+            window = cls._get_window(chat_id)
+            if window is not None and window.newest_id != last_message_id:
+                cls._drop(chat_id)
+                cls._stats['stale'] += 1
+                window = None
+            if window is None or (len(window.messages) < limit and not window.complete):
+                cls._stats['misses'] += 1
+                return None
+            cls._chats.move_to_end(chat_id)
+            cls._stats['hits'] += 1
+            messages = list(window.messages)
+            has_more = len(messages) > limit or not window.complete
+            return {"messages": messages[-limit:], "has_more": has_more}
+
+    @classmethod
+    def fill(cls, chat_id, messages, complete):
+        """Guarda los mensajes más recientes leídos de la BD (en orden
+        cronológico). complete indica que no hay mensajes más antiguos."""
+        rows = [cls._row(message) for message in messages[-MESSAGE_CACHE_WINDOW:]]
+        with cls._lock:
+            cls._drop(chat_id)
+            window = _Window(rows, complete and len(messages) <= MESSAGE_CACHE_WINDOW)
+            cls._chats[chat_id] = window
+            cls._total += len(window.messages)
+            cls._evict()
+
+    @classmethod
+    def append(cls, message):
+        """Añade un mensaje recién creado si el chat está en caché"""
+        with cls._lock:
+            window = cls._get_window(message['chat_id'])
+            if window is None:
+                return
+            cls._total += window.insert(cls._row(message))
+            cls._chats.move_to_end(message['chat_id'])
+            cls._evict()
+
+    @classmethod
+    def remove(cls, chat_id, message_id):
+        with cls._lock:
+            window = cls._get_window(chat_id)
+            if window is None:
+                return
+            for message in window.messages:
+                if message['id'] == message_id:
+                    window.messages.remove(message)
+                    cls._total -= 1
+                    break
+
+    @classmethod
+    def update(cls, chat_id, message_id, **fields):
+        with cls._lock:
+            window = cls._get_window(chat_id)
+            if window is None:
+                return
+            for message in window.messages:
+                if message['id'] == message_id:
+                    message.update(fields)
+                    break
+
+    @classmethod
+    def mark_read_up_to(cls, chat_id, up_to_message_id, reader_id, read_at):
+        with cls._lock:
+            window = cls._get_window(chat_id)
+            if window is None:
+                return
+            for message in window.messages:
+                if (message['id'] <= up_to_message_id and message['user_id'] != reader_id
+                        and message.get('read_at') is None):
+                    message.update(read_at=read_at, message_status='read')
+
+    @classmethod
+    def invalidate(cls, chat_id):
+        with cls._lock:
+            cls._drop(chat_id)
+
+    @classmethod
+    def stats(cls):
+        with cls._lock:
+            stats = dict(cls._stats)
+            stats['chats'] = len(cls._chats)
+            stats['messages'] = cls._total
+            stats['max_messages'] = MESSAGE_CACHE_MAX_MESSAGES
+            lookups = stats['hits'] + stats['misses']
+            stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0
+            return stats
+
+
+Metrics.register('message_cache', RecentMessageCache.stats)
@@ -0,0 +1,62 @@
+import threading
+
+
+class Histogram:
+    """Histograma acumulado con cubetas fijas (valores en segundos)"""
+    DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self, buckets=None):
+        self.buckets = tuple(buckets or self.DEFAULT_BUCKETS)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self._count += 1
+            self._sum += value
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self._counts[i] += 1
+                    return
+            self._counts[-1] += 1
+
+    def snapshot(self):
+        with self._lock:
+            cumulative = 0
+            buckets = {}
+            for bound, count in zip(self.buckets, self._counts):
+                cumulative += count
+                buckets[f"le_{bound}"] = cumulative
+            buckets['le_inf'] = cumulative + self._counts[-1]
+            return {
+                'count': self._count,
+                'sum': round(self._sum, 6),
+                'avg': round(self._sum / self._count, 6) if self._count else 0,
+                'buckets': buckets
+            }
+
+
+class Metrics:
+    """Registro de métricas del proceso, expuesto en GET /api/metrics.
+    Cada componente registra una función que devuelve su estado actual."""
+    _providers = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def register(cls, name, provider):
+        with cls._lock:
+            cls._providers[name] = provider
+
+    @classmethod
+    def snapshot(cls):
+        with cls._lock:
+            providers = dict(cls._providers)
+        result = {}
+        for name, provider in providers.items():
+            try:
+                result[name] = provider()
+            except Exception as e:
+                result[name] = {'error': str(e)}
+        return result
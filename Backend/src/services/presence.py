@@ -0,0 +1,183 @@
+import threading
+import time
+from src.config.settings import PRESENCE_TTL, PRESENCE_STORE_URL
+from src.services.metrics import Metrics
+from src.services.redis_url import resolve_redis_url
+
+
+class LocalPresenceStore:
+    """Sockets vivos por usuario en memoria del proceso (un solo worker)"""
+
+    def __init__(self):
+        self._sockets = {}  # user_id -> {sid: expira_en}
+        self._lock = threading.Lock()
+
+    def touch(self, user_id, sid, expires_at):
+        """Registra o refresca un socket; True si el usuario pasa a estar en línea"""
+        with self._lock:
+            sockets = self._sockets.setdefault(user_id, {})
+            came_online = not sockets
+            sockets[sid] = expires_at
+            return came_online
+
+    def remove(self, user_id, sid):
+        """Quita un socket; True si era el último del usuario"""
+        with self._lock:
+            sockets = self._sockets.get(user_id)
+            if not sockets or sockets.pop(sid, None) is None:
+                return False
+            if sockets:
+                return False
+            del self._sockets[user_id]
+            return True
+
+    def online(self, user_ids, now):
+        with self._lock:
+            return {user_id for user_id in user_ids
+                    if any(exp > now for exp in self._sockets.get(user_id, {}).values())}
+
+    def expire(self, now):
+        """Elimina los sockets sin latido; devuelve los usuarios que quedan desconectados"""
+        offline = []
+        with self._lock:
+            for user_id in list(self._sockets):
+                sockets = self._sockets[user_id]
+                for sid in [sid for sid, exp in sockets.items() if exp <= now]:
+                    del sockets[sid]
+                if not sockets:
+                    del self._sockets[user_id]
+                    offline.append(user_id)
+        return offline
+
+    def count(self):
+        with self._lock:
+            return len(self._sockets)
+
+
+class RedisPresenceStore:
+    """Mismo contrato que LocalPresenceStore pero compartido entre workers.
+    Cada usuario es un sorted set {sid: expira_en} y un índice global
+    {user_id: última caducidad} permite barrer sin recorrer todas las claves.
+    Las transiciones se calculan en MULTI para que solo un worker las vea."""
+
+    def __init__(self, url, prefix='presence'):
+        import redis  # dependencia opcional: solo con varios workers
+        self._redis = redis.Redis.from_url(url)
+        self._prefix = prefix
+        self._index = f'{prefix}:users'
+
+    def _key(self, user_id):
+        return f'{self._prefix}:u:{user_id}'
+
+    def touch(self, user_id, sid, expires_at):
+        key = self._key(user_id)
+        pipe = self._redis.pipeline()
+        pipe.zremrangebyscore(key, '-inf', time.time())
+        pipe.zadd(key, {sid: expires_at})
+        pipe.zcard(key)
+        pipe.expireat(key, int(expires_at) + 1)
+        pipe.zadd(self._index, {user_id: expires_at}, gt=True)
+        _, added, count, _, _ = pipe.execute()
+        return added == 1 and count == 1
+
+    def remove(self, user_id, sid):
+        key = self._key(user_id)
+        pipe = self._redis.pipeline()
+        pipe.zrem(key, sid)
+        pipe.zremrangebyscore(key, '-inf', time.time())
+        pipe.zcard(key)
+        removed, _, count = pipe.execute()
+        if not removed or count:
+            return False
+        # Solo lo anuncia quien saca al usuario del índice
+        return self._redis.zrem(self._index, user_id) == 1
+
+    def online(self, user_ids, now):
+        pipe = self._redis.pipeline(transaction=False)
+        for user_id in user_ids:
+            pipe.zcount(self._key(user_id), f'({now}', '+inf')
+        return {user_id for user_id, count in zip(user_ids, pipe.execute()) if count}
+
+    def expire(self, now):
+        offline = []
+        for raw in self._redis.zrangebyscore(self._index, '-inf', now):
+            user_id = int(raw)
+            key = self._key(user_id)
+            pipe = self._redis.pipeline()
+            pipe.zremrangebyscore(key, '-inf', now)
+            pipe.zcard(key)
+            _, count = pipe.execute()
+            if not count and self._redis.zrem(self._index, user_id) == 1:
+                offline.append(user_id)
+        return offline
+
+    def count(self):
+        return self._redis.zcard(self._index)
+
+
+def create_presence_store(url=None):
+    url = resolve_redis_url(url or PRESENCE_STORE_URL)
+    return RedisPresenceStore(url) if url else LocalPresenceStore()
+
+
+class PresenceTracker:
+    """Estado en línea a partir de los sockets y sus latidos. Las consultas
+    se responden desde el store, sin tocar la BD. Los cambios de estado se
+    acumulan y se entregan agrupados con drain_changes(); un usuario que
+    entra y sale dentro de la misma ventana no genera ningún cambio."""
+
+    def __init__(self, store, ttl=PRESENCE_TTL):
+        self.store = store
+        self.ttl = ttl
+        self._pending = {}  # user_id -> en línea (último cambio sin publicar)
+        self._lock = threading.Lock()
+        self._stats = {'heartbeats': 0, 'transitions': 0, 'queries': 0, 'queried_ids': 0}
+
+    def _changed(self, user_id, online):
+        with self._lock:
+            self._stats['transitions'] += 1
+            if self._pending.get(user_id) == (not online):
+                del self._pending[user_id]  # se anula con el cambio anterior
+            else:
+                self._pending[user_id] = online
+
+    def connect(self, user_id, sid):
+        if self.store.touch(user_id, sid, time.time() + self.ttl):
+            self._changed(user_id, True)
+
+    def heartbeat(self, user_id, sid):
+        self._stats['heartbeats'] += 1
+        self.connect(user_id, sid)
+
+    def disconnect(self, user_id, sid):
+        if self.store.remove(user_id, sid):
+            self._changed(user_id, False)
+
+    def sweep(self):
+        for user_id in self.store.expire(time.time()):
+            self._changed(user_id, False)
+
+    def online(self, user_ids):
+        """{user_id: bool} para un lote de usuarios"""
+        self._stats['queries'] += 1
+        self._stats['queried_ids'] += len(user_ids)
+        online = self.store.online(user_ids, time.time())
+        return {user_id: user_id in online for user_id in user_ids}
+
+    def drain_changes(self):
+        with self._lock:
+            changes, self._pending = self._pending, {}
+            return changes
+
+    def stats(self):
+        stats = dict(self._stats)
+        stats['store'] = type(self.store).__name__
+        try:
+            stats['online_users'] = self.store.count()
+        except Exception as e:
+            stats['error'] = str(e)
+        return stats
+
+
+presence = PresenceTracker(create_presence_store())
+Metrics.register('presence', presence.stats)
@@ -0,0 +1,54 @@
+import threading
+import time
+from collections import OrderedDict
+from src.config.settings import PROFILE_CACHE_TTL, PROFILE_CACHE_MAX_ENTRIES
+
+
+class ProfileCache:
+    """Caché en memoria (por proceso) del perfil público de los usuarios:
+    nombre y avatar, que es lo que viaja en cada mensaje del chat"""
+    _profiles = OrderedDict()  # user_id -> (expira_en, perfil)
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls, user_id):
+        with cls._lock:
+            entry = cls._profiles.get(user_id)
+            if not entry:
+                return None
+            expires_at, profile = entry
+            if expires_at < time.monotonic():
+                del cls._profiles[user_id]
+                return None
+            cls._profiles.move_to_end(user_id)
+            return profile
+
+    @classmethod
+    def set(cls, user_id, name, avatar_url):
+        profile = {'name': name, 'avatar_url': avatar_url}
+        with cls._lock:
+            cls._profiles[user_id] = (time.monotonic() + PROFILE_CACHE_TTL, profile)
+            cls._profiles.move_to_end(user_id)
+            while len(cls._profiles) > PROFILE_CACHE_MAX_ENTRIES:
+                cls._profiles.popitem(last=False)
+        return profile
+
+    @classmethod
+    def load(cls, cursor, user_id):
+        """Devuelve el perfil desde la caché o, si no está, lo lee con el
+        cursor de la transacción en curso (sin pedir otra conexión)"""
+        profile = cls.get(user_id)
+        if profile:
+            return profile
+        cursor.execute("SELECT name, avatar_url FROM users WHERE id = %s", (user_id,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        if isinstance(row, dict):
+            return cls.set(user_id, row['name'], row['avatar_url'])
+        return cls.set(user_id, row[0], row[1])
+
+    @classmethod
+    def invalidate(cls, user_id):
+        with cls._lock:
+            cls._profiles.pop(user_id, None)
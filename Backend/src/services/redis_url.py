@@ -0,0 +1,12 @@
+from src.config.settings import SOCKETIO_MESSAGE_QUEUE
+
+
+def resolve_redis_url(explicit):
+    """URL de Redis para un almacén compartido entre workers: la propia si
+    se configuró y, si no, la cola de SocketIO cuando es Redis. None si no
+    hay ninguna (el llamador usa memoria local)."""
+    if explicit:
+        return explicit
+    if SOCKETIO_MESSAGE_QUEUE and SOCKETIO_MESSAGE_QUEUE.startswith(('redis://', 'rediss://')):
+        return SOCKETIO_MESSAGE_QUEUE
+    return None
@@ -0,0 +1,210 @@
+"""Miniaturas y pósters de adjuntos, generados en segundo plano.
+
+Al terminar una subida se encola su blob; unos pocos workers (tareas de
+SocketIO) lo procesan y el trabajo de CPU (Pillow) o de ffmpeg se hace en
+hilos del sistema (eventlet.tpool), así que ni la subida ni el resto de
+peticiones esperan. Los resultados son archivos junto al blob:
+<blob>.t<tamaño>.jpg y, para vídeos, <blob>.poster.jpg. Están listos
+cuando existen todos, por eso se escriben con un nombre temporal y se
+renombran. Al terminar se avisa con 'attachment_ready' al usuario que
+subió el archivo y a los chats cuyos mensajes lo usan."""
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+from src.config.settings import (
+    THUMBNAIL_SIZES, THUMBNAIL_QUALITY, THUMBNAIL_WORKERS, THUMBNAIL_QUEUE_MAX, THUMBNAIL_FFMPEG
+)
+from src.models.upload_blob import UploadBlob
+from src.services.metrics import Metrics, Histogram
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # sin Pillow no hay miniaturas de imágenes
+    Image = None
+
+try:
+    from eventlet import patcher, tpool
+except ImportError:
+    tpool = None
+
+IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+VIDEO_EXTENSIONS = {'mp4'}
+
+
+def _offload(func, *args):
+    """Ejecuta `func` en un hilo del sistema si eventlet ha parcheado los
+    hilos; si no, ya estamos en uno"""
+    if tpool is not None and patcher.is_monkey_patched('thread'):
+        return tpool.execute(func, *args)
+    return func(*args)
+
+
+def _replace_atomically(save, path):
+    temp_path = f"{path}.{threading.get_ident()}.tmp"
+    try:
+        save(temp_path)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+class ThumbnailPipeline:
+    def __init__(self, sizes=THUMBNAIL_SIZES, workers=THUMBNAIL_WORKERS,
+                 queue_max=THUMBNAIL_QUEUE_MAX, ffmpeg=THUMBNAIL_FFMPEG):
+        self.sizes = sorted(sizes, reverse=True)
+        self.workers = workers
+        self.ffmpeg = shutil.which(ffmpeg) if ffmpeg else None
+        self.blobs = None
+        self._notify = None
+        self._queue = queue.Queue(maxsize=queue_max)
+        # file_url -> {'users': {...}, 'messages': {(chat_id, message_id), ...}}
+        # de los blobs encolados o en proceso
+        self._pending = {}
+        self._socketio = None
+        self._lock = threading.Lock()
+        self._seconds = Histogram((0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+        self._stats = {'queued': 0, 'generated': 0, 'failed': 0, 'dropped': 0}
+
+    def configure(self, blobs, notify):
+        """`blobs` es el BlobStore; notify(socketio, file_url, thumbnails,
+        users, messages) publica 'attachment_ready'"""
+        self.blobs = blobs
+        self._notify = notify
+
+    def _variants(self, extension):
+        """Sufijos de los archivos a generar para esa extensión"""
+        variants = []
+        if extension in VIDEO_EXTENSIONS and self.ffmpeg:
+            variants.append('poster')
+        if Image is not None and (extension in IMAGE_EXTENSIONS or variants):
+            variants.extend(f"t{size}" for size in self.sizes)
+        return variants
+
+    def _targets(self, file_url):
+        key = UploadBlob.parse_url(file_url)
+        if self.blobs is None or not key:
+            return None, {}
+        source = self.blobs.path_for(*key)
+        return source, {variant: f"{source}.{variant}.jpg" for variant in self._variants(key[1])}
+
+    def urls(self, file_url):
+        """{variante: URL} si las miniaturas del adjunto están listas"""
+        _, targets = self._targets(file_url)
+        if not targets or not all(os.path.exists(path) for path in targets.values()):
+            return None
+        return {variant[1:] if variant.startswith('t') else variant: f"{file_url}.{variant}.jpg"
+                for variant in targets}
+
+    def submit(self, socketio, file_url, user_id=None, message=None):
+        """Encola el adjunto sin esperar; devuelve True si queda pendiente"""
+        _, targets = self._targets(file_url)
+        if not targets:
+            return False
+        with self._lock:
+            pending = self._pending.get(file_url)
+            if pending is None:
+                try:
+                    self._queue.put_nowait(file_url)
+                except queue.Full:
+                    self._stats['dropped'] += 1
+                    return False
+                pending = self._pending[file_url] = {'users': set(), 'messages': set()}
+                self._stats['queued'] += 1
+            if user_id is not None:
+                pending['users'].add(user_id)
+            if message is not None:
+                pending['messages'].add((message['chat_id'], message['id']))
+            if self._socketio is None:
+                self._socketio = socketio
+                for _ in range(self.workers):
+                    socketio.start_background_task(self._run)
+        return True
+
+    def decorate(self, socketio, message):
+        """Copia del mensaje con sus miniaturas si ya están; si no, el chat
+        recibirá 'attachment_ready' cuando se generen"""
+        file_url = message.get('file_url')
+        if not file_url or not self._targets(file_url)[1]:
+            return message
+        thumbnails = self.urls(file_url)
+        if thumbnails is None:
+            self.submit(socketio, file_url, message=message)
+        return dict(message, thumbnails=thumbnails)
+
+    def _run(self):
+        while True:
+            file_url = self._queue.get()
+            start = time.perf_counter()
+            try:
+                source, targets = self._targets(file_url)
+                missing = {variant: path for variant, path in targets.items()
+                           if not os.path.exists(path)}
+                if missing:
+                    _offload(self._render, source, missing)
+                thumbnails = self.urls(file_url)
+                with self._lock:
+                    self._stats['generated' if thumbnails else 'failed'] += 1
+            except Exception as e:
+                print(f"Error generando miniaturas de {file_url}: {str(e)}")
+                thumbnails = None
+                with self._lock:
+                    self._stats['failed'] += 1
+            self._seconds.observe(time.perf_counter() - start)
+            with self._lock:
+                pending = self._pending.pop(file_url, None)
+            if thumbnails and pending and self._notify:
+                try:
+                    self._notify(self._socketio, file_url, thumbnails,
+                                 pending['users'], pending['messages'])
+                except Exception as e:
+                    print(f"Error avisando de miniaturas: {str(e)}")
+
+    def _render(self, source, targets):
+        """Genera los archivos de `targets` (en un hilo del sistema)"""
+        if 'poster' in targets:
+            _replace_atomically(lambda path: subprocess.run(
+                [self.ffmpeg, '-v', 'error', '-y', '-i', source, '-frames:v', '1',
+                 '-f', 'image2', '-c:v', 'mjpeg', path],
+                check=True, timeout=60, stdin=subprocess.DEVNULL
+            ), targets['poster'])
+        sizes = [variant for variant in targets if variant != 'poster']
+        if not sizes:
+            return
+        if os.path.splitext(source)[1].lower() in {f".{ext}" for ext in VIDEO_EXTENSIONS}:
+            source = f"{source}.poster.jpg"
+        with Image.open(source) as image:
+            # Un JPEG se decodifica ya reducido (mucho más rápido que entero)
+            image.draft('RGB', (self.sizes[0], self.sizes[0]))
+            image = ImageOps.exif_transpose(image)
+            if image.mode in ('RGBA', 'LA', 'P'):
+                image = image.convert('RGBA')
+                background = Image.new('RGB', image.size, (255, 255, 255))
+                background.paste(image, mask=image.getchannel('A'))
+                image = background
+            elif image.mode != 'RGB':
+                image = image.convert('RGB')
+            # De mayor a menor: cada tamaño se reduce desde el anterior
+            for size in self.sizes:
+                image.thumbnail((size, size), Image.LANCZOS)
+                variant = f"t{size}"
+                if variant in targets:
+                    _replace_atomically(lambda path: image.save(
+                        path, 'JPEG', quality=THUMBNAIL_QUALITY, optimize=True
+                    ), targets[variant])
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pending'] = len(self._pending)
+        stats['pillow'] = Image is not None
+        stats['ffmpeg'] = self.ffmpeg is not None
+        stats['seconds'] = self._seconds.snapshot()
+        return stats
+
+
+thumbnails = ThumbnailPipeline()
+Metrics.register('thumbnails', thumbnails.stats)
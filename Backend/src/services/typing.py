@@ -0,0 +1,107 @@
+import threading
+import time
+from src.config.settings import TYPING_EMIT_INTERVAL, TYPING_TTL
+
+
+class _TypingState:
+    __slots__ = ('typing', 'pending', 'last_emit', 'expires_at', 'sid')
+
+    def __init__(self):
+        self.typing = False      # último estado emitido a la sala
+        self.pending = None      # cambio retenido hasta que pase el intervalo
+        self.last_emit = float('-inf')
+        self.expires_at = 0.0
+        self.sid = None          # socket que escribe: no recibe su propio indicador
+
+
+class TypingCoalescer:
+    """Agrupa los eventos de "escribiendo" por (chat, usuario): solo se emite
+    un cambio de estado real, como mucho uno por usuario cada `interval`
+    segundos, y un "escribiendo" sin refrescar caduca a los `ttl` segundos.
+    Los cambios retenidos y las caducidades los emite flush(), también sin
+    enviarlos al socket que originó el cambio."""
+
+    def __init__(self, emit, interval=TYPING_EMIT_INTERVAL, ttl=TYPING_TTL, clock=time.monotonic):
+        self._emit = emit  # emit(chat_id, user_id, is_typing, skip_sid)
+        self.interval = interval
+        self.ttl = ttl
+        self._clock = clock
+        self._states = {}  # (chat_id, user_id) -> _TypingState
+        self._lock = threading.Lock()
+        self._stats = {'received': 0, 'emitted': 0, 'suppressed': 0, 'expired': 0}
+
+    def update(self, chat_id, user_id, is_typing, skip_sid=None):
+        now = self._clock()
+        emit_now = False
+        with self._lock:
+            self._stats['received'] += 1
+            key = (chat_id, user_id)
+            state = self._states.get(key)
+            if state is None:
+                state = self._states[key] = _TypingState()
+            state.sid = skip_sid
+            if is_typing:
+                state.expires_at = now + self.ttl
+
+            if is_typing == state.typing:
+                # Sin cambio (p. ej. una tecla más): se descarta
+                state.pending = None
+                self._stats['suppressed'] += 1
+            elif now - state.last_emit >= self.interval:
+                state.typing = is_typing
+                state.pending = None
+                state.last_emit = now
+                self._stats['emitted'] += 1
+                emit_now = True
+            else:
+                state.pending = is_typing
+                self._stats['suppressed'] += 1
+
+            if not state.typing and state.pending is None:
+                del self._states[key]
+
+        if emit_now:
+            self._emit(chat_id, user_id, is_typing, skip_sid)
+
+    def flush(self):
+        """Emite los cambios retenidos cuyo intervalo ya pasó y apaga los
+        "escribiendo" caducados. Pensado para llamarse cada `interval`."""
+        now = self._clock()
+        changes = []
+        with self._lock:
+            for key, state in list(self._states.items()):
+                if state.typing and state.expires_at <= now:
+                    state.pending = False
+                    self._stats['expired'] += 1
+                if state.pending is not None and now - state.last_emit >= self.interval:
+                    if state.pending != state.typing:
+                        state.typing = state.pending
+                        state.last_emit = now
+                        self._stats['emitted'] += 1
+                        changes.append((key, state.typing, state.sid))
+                    state.pending = None
+                if not state.typing and state.pending is None:
+                    del self._states[key]
+        for (chat_id, user_id), is_typing, sid in changes:
+            self._emit(chat_id, user_id, is_typing, sid)
+
+    def forget_user(self, user_id):
+        """Apaga el indicador de un usuario en todos sus chats (desconexión)"""
+        changes = []
+        with self._lock:
+            for key, state in list(self._states.items()):
+                if key[1] == user_id:
+                    if state.typing:
+                        changes.append((key, state.sid))
+                        self._stats['emitted'] += 1
+                    del self._states[key]
+        for (chat_id, uid), sid in changes:
+            self._emit(chat_id, uid, False, sid)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['active'] = len(self._states)
+            stats['interval'] = self.interval
+            stats['ttl'] = self.ttl
+            return stats
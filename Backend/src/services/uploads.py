@@ -0,0 +1,172 @@
+import fcntl
+import hashlib
+import json
+import os
+import re
+import secrets
+import time
+from src.config.settings import (
+    UPLOAD_MAX_BYTES, UPLOAD_CHUNK_SIZE, UPLOAD_CHUNK_BUFFER, UPLOAD_INCOMPLETE_TTL
+)
+
+
+class UploadError(Exception):
+    """Error de una subida por partes; `status` es el código HTTP a devolver"""
+    status = 400
+
+    def __init__(self, message, **details):
+        super().__init__(message)
+        self.details = details
+
+
+class UploadNotFound(UploadError):
+    status = 404
+
+
+class UploadConflict(UploadError):
+    """Offset distinto del que tiene el servidor o subida ocupada por otra petición"""
+    status = 409
+
+
+class UploadTooLarge(UploadError):
+    status = 413
+
+
+class ChunkedUploadStore:
+    """Subidas por partes reanudables. Cada subida es un archivo .part en
+    `folder`/.incoming más un sidecar .json con sus metadatos; el offset es
+    el tamaño del .part en disco, así que sobrevive a cortes y reinicios.
+    Los datos se escriben según llegan, con un búfer de tamaño fijo, y el
+    límite se comprueba mientras se recibe, no al final. El sha256 también
+    se calcula según llegan los datos; al finalizar, el archivo pasa a
+    `blobs` (BlobStore) y, si ese contenido ya estaba, se reutiliza."""
+    _ID = re.compile(r'^[0-9a-f]{32}$')
+
+    def __init__(self, folder, blobs, max_bytes=UPLOAD_MAX_BYTES, buffer_size=UPLOAD_CHUNK_BUFFER):
+        self.folder = folder
+        self.blobs = blobs
+        self.incoming = os.path.join(folder, '.incoming')
+        self.max_bytes = max_bytes
+        self.buffer_size = buffer_size
+        os.makedirs(self.incoming, exist_ok=True)
+        # upload_id -> (bytes ya hasheados, sha256 en curso). Solo vive en
+        # este proceso: si una parte llega a otro worker o tras un reinicio,
+        # el hash se calcula al finalizar leyendo el .part
+        self._hashers = {}
+
+    def _paths(self, upload_id):
+        if not self._ID.match(upload_id or ''):
+            raise UploadNotFound('Subida no encontrada')
+        base = os.path.join(self.incoming, upload_id)
+        return base + '.part', base + '.json'
+
+    def _load(self, upload_id, user_id):
+        part_path, meta_path = self._paths(upload_id)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            raise UploadNotFound('Subida no encontrada')
+        if meta['user_id'] != user_id:
+            raise UploadNotFound('Subida no encontrada')
+        return meta, part_path, meta_path
+
+    def create(self, user_id, filename, size):
+        """Registra una subida de `size` bytes y devuelve su estado"""
+        if size <= 0:
+            raise UploadError('Tamaño inválido')
+        if size > self.max_bytes:
+            raise UploadTooLarge('Archivo demasiado grande', max_bytes=self.max_bytes)
+        upload_id = secrets.token_hex(16)
+        part_path, meta_path = self._paths(upload_id)
+        open(part_path, 'wb').close()
+        meta = {'id': upload_id, 'user_id': user_id, 'filename': filename,
+                'size': size, 'created_at': time.time()}
+        with open(meta_path, 'w') as f:
+            json.dump(meta, f)
+        return self._state(meta, 0)
+
+    def status(self, upload_id, user_id):
+        meta, part_path, _ = self._load(upload_id, user_id)
+        return self._state(meta, os.path.getsize(part_path))
+
+    def append(self, upload_id, user_id, offset, stream):
+        """Escribe en el .part lo que llega por `stream` a partir de `offset`
+        (debe coincidir con lo ya recibido). Si la conexión se corta, lo
+        escrito hasta ese momento queda y el cliente reanuda desde status()."""
+        meta, part_path, _ = self._load(upload_id, user_id)
+        with open(part_path, 'ab') as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise UploadConflict('La subida está recibiendo otra parte')
+            current = f.tell()
+            if offset != current:
+                raise UploadConflict('Offset incorrecto', offset=current)
+            remaining = meta['size'] - current
+            hashed, hasher = self._hashers.pop(upload_id, (0, None))
+            if hashed != current or hasher is None:
+                hasher = hashlib.sha256() if current == 0 else None
+            try:
+                while True:
+                    chunk = stream.read(min(self.buffer_size, remaining + 1))
+                    if not chunk:
+                        break
+                    if len(chunk) > remaining:
+                        raise UploadTooLarge('La parte supera el tamaño declarado',
+                                             offset=f.tell())
+                    f.write(chunk)
+                    if hasher:
+                        hasher.update(chunk)
+                    remaining -= len(chunk)
+            finally:
+                f.flush()
+                if hasher:
+                    self._hashers[upload_id] = (f.tell(), hasher)
+            return self._state(meta, f.tell())
+
+    def finalize(self, upload_id, user_id):
+        """Pasa la subida completa al almacén de blobs; devuelve (blob, metadatos)"""
+        meta, part_path, meta_path = self._load(upload_id, user_id)
+        received = os.path.getsize(part_path)
+        if received != meta['size']:
+            raise UploadConflict('La subida no está completa', offset=received)
+        hashed, hasher = self._hashers.pop(upload_id, (0, None))
+        sha256 = hasher.hexdigest() if hasher and hashed == received else None
+        blob = self.blobs.ingest(part_path, meta['filename'], received, sha256)
+        os.remove(meta_path)
+        return blob, meta
+
+    def cancel(self, upload_id, user_id):
+        _, part_path, meta_path = self._load(upload_id, user_id)
+        self._hashers.pop(upload_id, None)
+        for path in (part_path, meta_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def prune_incomplete(self, max_age=UPLOAD_INCOMPLETE_TTL):
+        """Borra las subidas sin terminar más antiguas que `max_age` segundos"""
+        removed = 0
+        limit = time.time() - max_age
+        for name in os.listdir(self.incoming):
+            if name.endswith('.tmp'):
+                # Restos de subidas directas (BlobStore.save_stream) interrumpidas
+                path = os.path.join(self.incoming, name)
+                if os.path.getmtime(path) < limit:
+                    os.remove(path)
+                continue
+            if not name.endswith('.json'):
+                continue
+            part_path, meta_path = self._paths(name[:-5])
+            # La última parte recibida cuenta como actividad
+            paths = [p for p in (part_path, meta_path) if os.path.exists(p)]
+            if max(os.path.getmtime(p) for p in paths) < limit:
+                for path in paths:
+                    os.remove(path)
+                self._hashers.pop(name[:-5], None)
+                removed += 1
+        return removed
+
+    def _state(self, meta, offset):
+        return {'upload_id': meta['id'], 'offset': offset, 'size': meta['size'],
+                'chunk_size': UPLOAD_CHUNK_SIZE}
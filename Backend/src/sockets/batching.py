@@ -0,0 +1,96 @@
+"""Micro-batching opcional de las difusiones a salas de /chat.
+
+Con SOCKET_BATCH_WINDOW_MS > 0 los eventos para una misma sala se acumulan
+y salen juntos como un único evento 'events' ({'chat_id', 'events': [{'e':
+nombre, 'd': datos}, ...]}), codificado una vez por variante de sala y
+reutilizado para todos sus sockets. Un evento espera como mucho la ventana
+configurada; con SOCKET_BATCH_MAX_EVENTS acumulados se envía en el acto.
+Si en la ventana solo hubo un evento se envía tal cual, sin envoltorio,
+así que una sala tranquila no nota el cambio."""
+import threading
+from src.config.settings import SOCKET_BATCH_WINDOW_MS, SOCKET_BATCH_MAX_EVENTS
+
+
+class RoomBatcher:
+    def __init__(self, send, window_ms=SOCKET_BATCH_WINDOW_MS, max_events=SOCKET_BATCH_MAX_EVENTS):
+        self._send = send  # send(socketio, evento, datos, chat_id, namespace)
+        self.window = window_ms / 1000.0
+        self.max_events = max_events
+        self._buffers = {}  # (namespace, chat_id) -> [(evento, datos), ...]
+        self._socketio = None
+        self._lock = threading.Lock()
+        # Marcado mientras hay eventos esperando: sin él la tarea duerme
+        self._pending = threading.Event()
+        self._stats = {'events': 0, 'frames': 0, 'window_flushes': 0,
+                       'size_flushes': 0, 'barrier_flushes': 0}
+
+    @property
+    def enabled(self):
+        return self.window > 0
+
+    def add(self, socketio, event, data, chat_id, namespace):
+        key = (namespace, chat_id)
+        with self._lock:
+            if self._socketio is None:
+                self._socketio = socketio
+                socketio.start_background_task(self._run)
+            buffer = self._buffers.setdefault(key, [])
+            buffer.append((event, data))
+            self._pending.set()
+            self._stats['events'] += 1
+            full = len(buffer) >= self.max_events
+            if full:
+                del self._buffers[key]
+                self._stats['size_flushes'] += 1
+        if full:
+            self._flush(socketio, key, buffer)
+
+    def barrier(self, socketio, chat_id, namespace):
+        """Vacía la sala antes de un evento que no se agrupa, para no
+        alterar el orden en que el cliente recibe los eventos"""
+        with self._lock:
+            buffer = self._buffers.pop((namespace, chat_id), None)
+            if buffer:
+                self._stats['barrier_flushes'] += 1
+        if buffer:
+            self._flush(socketio, (namespace, chat_id), buffer)
+
+    def _run(self):
+        # Solo se despierta cuando llega el primer evento de una ventana
+        while True:
+            self._pending.wait()
+            self._socketio.sleep(self.window)
+            self._flush_window()
+
+    def _flush_window(self):
+        with self._lock:
+            buffers, self._buffers = self._buffers, {}
+            self._pending.clear()
+            if buffers:
+                self._stats['window_flushes'] += 1
+        for key, buffer in buffers.items():
+            try:
+                self._flush(self._socketio, key, buffer)
+            except Exception as e:
+                print(f"Error enviando lote de eventos: {str(e)}")
+
+    def _flush(self, socketio, key, buffer):
+        namespace, chat_id = key
+        with self._lock:
+            self._stats['frames'] += 1
+        if len(buffer) == 1:
+            event, data = buffer[0]
+            self._send(socketio, event, data, chat_id, namespace)
+            return
+        self._send(socketio, 'events', {
+            'chat_id': chat_id,
+            'events': [{'e': event, 'd': data} for event, data in buffer]
+        }, chat_id, namespace)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pending_rooms'] = len(self._buffers)
+        stats['window_ms'] = self.window * 1000
+        stats['events_per_frame'] = round(stats['events'] / stats['frames'], 2) if stats['frames'] else 0
+        return stats
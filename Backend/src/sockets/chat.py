@@ -1,61 +1,392 @@
-from flask_socketio import Namespace
+from flask import request, session
+from flask_socketio import Namespace, ConnectionRefusedError, join_room, leave_room
+from src.config.settings import decode_token
 from src.models.chat import Chat, Message
+from src.services.metrics import Metrics, Histogram
+from src.services.typing import TypingCoalescer
+from src.services.presence import presence
+from src.services.delivery import delivery
+from src.services.thumbnails import thumbnails
+from src.sockets import encoding
+from src.sockets.batching import RoomBatcher
+from src.config.settings import (
+    PRESENCE_HEARTBEAT_INTERVAL, PRESENCE_DIFF_INTERVAL, SOCKETIO_MESSAGE_QUEUE
+)
 from datetime import datetime
+import re
+import time
+
+# Versión del esquema de eventos: va como 'v' en todo lo que emite el
+# servidor; un cliente puede enviarla y se rechaza si es más nueva
+SCHEMA_VERSION = 1
+
+# Identificador de dispositivo para la cola de entrega (auth {'device_id'})
+_DEVICE_ID = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+def room_for(chat_id):
+    """Sala de Socket.IO de un chat (único esquema de nombres)"""
+    return f"chat_{chat_id}"
+
+
+def user_room(user_id):
+    """Sala con todos los sockets de un usuario"""
+    return f"user_{user_id}"
+
+
+def versioned(data):
+    return dict(data, v=SCHEMA_VERSION) if isinstance(data, dict) else data
+
+
+def _send_to_room(socketio, event, data, room, namespace, **kwargs):
+    """Envía a la sala: una vez en JSON y, si la codificación compacta
+    está activa, otra ya codificada para su variante"""
+    data = versioned(data)
+    socketio.emit(event, data, to=room, namespace=namespace, **kwargs)
+    if encoding.enabled():
+        compact_room = encoding.room_variant(room, encoding.MSGPACK)
+        if SOCKETIO_MESSAGE_QUEUE or _has_members(socketio, namespace, compact_room):
+            socketio.emit(event, encoding.encode(data), to=compact_room,
+                          namespace=namespace, **kwargs)
+
+
+def _has_members(socketio, namespace, room):
+    """Si la sala tiene algún socket en este proceso (sin cola de mensajes
+    son todos): así no se codifica ni emite para una variante vacía"""
+    participants = socketio.server.manager.get_participants(namespace, room)
+    return next(iter(participants), None) is not None
+
+
+def _send_to_chat(socketio, event, data, chat_id, namespace, **kwargs):
+    _send_to_room(socketio, event, data, room_for(chat_id), namespace, **kwargs)
+
+
+batcher = RoomBatcher(_send_to_chat)
+Metrics.register('socket_batching', batcher.stats)
+
+
+def emit_to_chat(socketio, event, data, chat_id, namespace='/chat', **kwargs):
+    """Difunde un evento a la sala del chat, agrupado con los demás de la
+    ventana si el micro-batching está activo. Los eventos que excluyen a un
+    socket (skip_sid) no se pueden agrupar y salen al momento."""
+    if not batcher.enabled:
+        _send_to_chat(socketio, event, data, chat_id, namespace, **kwargs)
+    elif kwargs:
+        batcher.barrier(socketio, chat_id, namespace)
+        _send_to_chat(socketio, event, data, chat_id, namespace, **kwargs)
+    else:
+        batcher.add(socketio, event, data, chat_id, namespace)
+
+
+def emit_to_user(socketio, event, data, user_id, namespace='/chat'):
+    """Evento para todos los sockets de un usuario (sin agrupar)"""
+    _send_to_room(socketio, event, data, user_room(user_id), namespace)
+
+
+def attachment_ready(socketio, file_url, urls, users, messages):
+    """Miniaturas listas: a quien subió el archivo y a cada chat con un
+    mensaje que ya lo usa"""
+    for user_id in users:
+        emit_to_user(socketio, 'attachment_ready', {
+            'file_url': file_url,
+            'thumbnails': urls
+        }, user_id)
+    for chat_id, message_id in messages:
+        emit_to_chat(socketio, 'attachment_ready', {
+            'chat_id': chat_id,
+            'message_id': message_id,
+            'file_url': file_url,
+            'thumbnails': urls
+        }, chat_id)
+
 
 class ChatNamespace(Namespace):
-    def on_connect(self):
-        print('Cliente conectado')
+    def __init__(self, namespace=None):
+        super().__init__(namespace)
+        self.typing = TypingCoalescer(self._emit_typing)
+        self._typing_sweeper = None
+        self._presence_task = None
+        self._timings = {}  # evento -> Histogram del tiempo del handler
+        Metrics.register('typing', self.typing.stats)
+        Metrics.register('socket_events', self.timing_stats)
+
+    def trigger_event(self, event, *args):
+        """Despacha el evento midiendo cuánto tarda su handler"""
+        if not hasattr(self, 'on_' + event):
+            return super().trigger_event(event, *args)
+        data = args[1] if len(args) > 1 else None
+        version = data.get('v', SCHEMA_VERSION) if isinstance(data, dict) else SCHEMA_VERSION
+        # "2", null o true no son versiones: se rechazan igual que una más nueva
+        if not isinstance(version, int) or isinstance(version, bool) or version > SCHEMA_VERSION:
+            self.socketio.emit('error', versioned({
+                'error': 'Versión de esquema no soportada',
+                'event': event
+            }), to=args[0], namespace=self.namespace)
+            return None
+        histogram = self._timings.get(event)
+        if histogram is None:
+            histogram = self._timings.setdefault(event, Histogram())
+        start = time.perf_counter()
+        try:
+            return super().trigger_event(event, *args)
+        finally:
+            histogram.observe(time.perf_counter() - start)
+
+    def timing_stats(self):
+        return {event: histogram.snapshot() for event, histogram in list(self._timings.items())}
+
+    def _to_chat(self, event, data, chat_id, **kwargs):
+        # También sirve desde tareas en segundo plano, fuera de un evento
+        emit_to_chat(self.socketio, event, data, chat_id, namespace=self.namespace, **kwargs)
+
+    def _to_client(self, event, data):
+        """Evento solo para este socket, en la codificación que negoció"""
+        data = versioned(data)
+        if session.get('encoding') == encoding.MSGPACK:
+            data = encoding.encode(data)
+        self.emit(event, data, room=request.sid)
+
+    def _emit_typing(self, chat_id, user_id, is_typing, skip_sid):
+        # También se llama desde la tarea de barrido, fuera de un evento
+        self._to_chat('typing_indicator', {
+            'chat_id': chat_id,
+            'user_id': user_id,
+            'is_typing': is_typing
+        }, chat_id, skip_sid=skip_sid)
+
+    def _sweep_typing(self):
+        while True:
+            self.socketio.sleep(self.typing.interval)
+            self.typing.flush()
+
+    def _publish_presence(self):
+        """Cada PRESENCE_DIFF_INTERVAL publica los cambios de presencia
+        agrupados por sala: un 'presence_diff' por chat afectado. Cada
+        PRESENCE_HEARTBEAT_INTERVAL barre los sockets sin latido."""
+        last_sweep = 0.0
+        while True:
+            self.socketio.sleep(PRESENCE_DIFF_INTERVAL)
+            try:
+                now = time.monotonic()
+                if now - last_sweep >= PRESENCE_HEARTBEAT_INTERVAL:
+                    presence.sweep()
+                    last_sweep = now
+                diffs = {}
+                for user_id, online in presence.drain_changes().items():
+                    for chat_id in Chat.get_chat_ids(user_id):
+                        diff = diffs.setdefault(chat_id, {'online': [], 'offline': []})
+                        diff['online' if online else 'offline'].append(user_id)
+                for chat_id, diff in diffs.items():
+                    self._to_chat('presence_diff', {'chat_id': chat_id, **diff}, chat_id)
+            except Exception as e:
+                print(f"Error publicando presencia: {str(e)}")
+
+    @staticmethod
+    def _token(auth):
+        """JWT enviado en el handshake: auth {'token'}, cabecera Authorization
+        o query string ?token="""
+        if isinstance(auth, dict) and auth.get('token'):
+            return auth['token']
+        parts = request.headers.get('Authorization', '').split()
+        if len(parts) == 2 and parts[0].lower() == 'bearer':
+            return parts[1]
+        return request.args.get('token')
+
+    @staticmethod
+    def _ack_device(auth):
+        """device_id si el cliente pidió confirmaciones de entrega en el
+        handshake (auth {'acks': true, 'device_id'}); si no, None y sin cola"""
+        if not isinstance(auth, dict) or auth.get('acks') is not True:
+            return None
+        device_id = auth.get('device_id')
+        if isinstance(device_id, str) and _DEVICE_ID.match(device_id):
+            return device_id
+        return None
 
-    def on_disconnect(self):
+    def _authorize(self, chat_id):
+        """Usuario autenticado si participa en el chat (consulta en memoria
+        vía MembershipCache); si no, avisa al cliente y devuelve None"""
+        user_id = session.get('user_id')
+        if user_id is None or not Chat.is_participant(chat_id, user_id):
+            self._to_client('error', {
+                'error': 'No perteneces a este chat',
+                'chat_id': chat_id
+            })
+            return None
+        return user_id
+
+    def on_connect(self, auth=None):
+        # Se autentica una sola vez por conexión; el resto de eventos usan
+        # el user_id guardado en la sesión del socket, no el del cliente
+        token = self._token(auth)
+        payload = decode_token(token) if token else None
+        if not payload:
+            raise ConnectionRefusedError('Token inválido o expirado')
+        session['user_id'] = payload['user_id']
+        requested = auth.get('encoding') if isinstance(auth, dict) else None
+        requested = requested or request.args.get('encoding')
+        session['encoding'] = encoding.negotiate(requested)
+        if requested:
+            # Se confirma en JSON: el cliente aún no sabe qué se aceptó
+            self.emit('session', versioned({'encoding': session['encoding']}), room=request.sid)
+        if self._presence_task is None:
+            self._presence_task = self.socketio.start_background_task(self._publish_presence)
+        join_room(encoding.room_variant(user_room(payload['user_id']), session['encoding']))
+        presence.connect(payload['user_id'], request.sid)
+        session['device_id'] = self._ack_device(auth)
+        if session['device_id'] is not None:
+            delivery.register(payload['user_id'], session['device_id'])
+            self._replay(payload['user_id'], session['device_id'])
+        print(f"Cliente conectado: usuario {payload['user_id']}")
+
+    def _replay(self, user_id, device_id):
+        """Reenvía a este socket lo que su dispositivo dejó sin confirmar y
+        avisa de los huecos que no cupieron en la cola (el cliente los pide
+        con ?after=)"""
+        messages, gaps = delivery.replay(user_id, device_id)
+        for payload in messages:
+            self._to_client('new_message', dict(payload, replayed=True))
+        for chat_id, after_message_id in gaps.items():
+            self._to_client('sync_gap', {
+                'chat_id': chat_id,
+                'after_message_id': after_message_id
+            })
+
+    def on_disconnect(self, reason=None):
+        user_id = session.get('user_id')
+        if user_id is not None:
+            self.typing.forget_user(user_id)
+            presence.disconnect(user_id, request.sid)
         print('Cliente desconectado')
 
+    def on_heartbeat(self, data=None):
+        """Latido del cliente cada PRESENCE_HEARTBEAT_INTERVAL segundos"""
+        user_id = session.get('user_id')
+        if user_id is not None:
+            presence.heartbeat(user_id, request.sid)
+            if session.get('device_id') is not None:
+                # Mantiene viva la cola de entrega del dispositivo
+                delivery.register(user_id, session['device_id'])
+
     def on_join_chat(self, data):
         chat_id = data['chat_id']
-        self.enter_room(str(chat_id))
-        self.emit('user_joined', {
-            'user_id': data['user_id'],
+        user_id = self._authorize(chat_id)
+        if user_id is None:
+            return
+        client_encoding = session.get('encoding', encoding.JSON)
+        join_room(encoding.room_variant(room_for(chat_id), client_encoding))
+        if client_encoding != encoding.JSON:
+            # Perfiles internados una vez por conexión: los mensajes
+            # compactos solo llevan el id del autor y la versión del perfil
+            self._send_profiles(chat_id)
+        self._to_chat('user_joined', {
+            'user_id': user_id,
             'chat_id': chat_id,
             'timestamp': datetime.now().isoformat()
-        }, room=str(chat_id), skip_sid=self.request.sid)
+        }, chat_id, skip_sid=request.sid)
+
+    def _send_profiles(self, chat_id):
+        payload = encoding.profiles_payload(Chat.get_participants(chat_id))
+        payload['chat_id'] = chat_id
+        self._to_client('profiles', payload)
+
+    def on_get_profiles(self, data):
+        """El cliente compacto vio una versión de perfil que no tiene"""
+        if self._authorize(data['chat_id']) is not None:
+            self._send_profiles(data['chat_id'])
 
     def on_leave_chat(self, data):
         chat_id = data['chat_id']
-        self.leave_room(str(chat_id))
-        self.emit('user_left', {
-            'user_id': data['user_id'],
+        leave_room(encoding.room_variant(room_for(chat_id), session.get('encoding', encoding.JSON)))
+        self._to_chat('user_left', {
+            'user_id': session.get('user_id'),
             'chat_id': chat_id,
             'timestamp': datetime.now().isoformat()
-        }, room=str(chat_id))
+        }, chat_id)
 
     def on_typing(self, data):
-        self.emit('typing_indicator', {
-            'chat_id': data['chat_id'],
-            'user_id': data['user_id'],
-            'is_typing': data['is_typing']
-        }, room=str(data['chat_id']), skip_sid=self.request.sid)
+        user_id = self._authorize(data['chat_id'])
+        if user_id is None:
+            return
+        # Se coalescen en el servidor: solo salen cambios reales de estado
+        if self._typing_sweeper is None:
+            self._typing_sweeper = self.socketio.start_background_task(self._sweep_typing)
+        self.typing.update(data['chat_id'], user_id, bool(data['is_typing']),
+                           skip_sid=request.sid)
+
+    def on_ack(self, data):
+        """Confirmación acumulativa de entrega: todo lo recibido del chat
+        hasta up_to_message_id sale de la cola de reenvío de este dispositivo"""
+        self._ack(data['chat_id'], data['up_to_message_id'])
+
+    def _ack(self, chat_id, up_to_message_id):
+        user_id, device_id = session.get('user_id'), session.get('device_id')
+        if user_id is not None and device_id is not None:
+            delivery.ack(user_id, device_id, chat_id, up_to_message_id)
 
     def on_mark_as_read(self, data):
-        Message.mark_as_read(data['message_id'], data['user_id'])
-        self.emit('message_read', {
+        user_id = self._authorize(data['chat_id'])
+        if user_id is None:
+            return
+        Message.mark_as_read(data['message_id'], user_id)
+        self._ack(data['chat_id'], data['message_id'])
+        self._to_chat('message_read', {
             'message_id': data['message_id'],
             'chat_id': data['chat_id'],
-            'user_id': data['user_id']
-        }, room=str(data['chat_id']))
+            'user_id': user_id
+        }, data['chat_id'])
+
+    def on_mark_read_up_to(self, data):
+        """Lectura en bloque: todo lo anterior a up_to_message_id en un UPDATE
+        y un solo evento, en lugar de un mark_as_read por mensaje visible"""
+        user_id = self._authorize(data['chat_id'])
+        if user_id is None:
+            return
+        up_to_message_id = data.get('up_to_message_id')
+        try:
+            if not isinstance(up_to_message_id, int) or isinstance(up_to_message_id, bool):
+                raise ValueError("Se requiere up_to_message_id")
+            result = Message.mark_read_up_to(data['chat_id'], user_id, up_to_message_id)
+        except ValueError as e:
+            self._to_client('error', {'error': str(e), 'chat_id': data['chat_id']})
+            return
+        if result is None:
+            return
+        # Leído implica entregado (a este dispositivo)
+        self._ack(data['chat_id'], result['up_to_message_id'])
+        if result['marked']:
+            self._to_chat('messages_read', {
+                'chat_id': data['chat_id'],
+                'user_id': user_id,
+                'up_to_message_id': result['up_to_message_id']
+            }, data['chat_id'])
 
     def on_new_message(self, data):
-        message_id = Message.create(
+        user_id = self._authorize(data['chat_id'])
+        if user_id is None:
+            return
+        # Message.create ya devuelve el mensaje persistido: un solo viaje a la BD
+        message = Message.create(
             chat_id=data['chat_id'],
-            user_id=data['user_id'],
+            user_id=user_id,
             content=data['content'],
             message_type=data.get('message_type', 'text'),
             file_url=data.get('file_url'),
             file_size=data.get('file_size')
         )
         
-        if message_id:
-            message = Message.get_message(message_id)
-            if message:
-                self.emit('new_message', {
-                    'chat_id': data['chat_id'],
-                    'message': message
-                }, room=str(data['chat_id']))
\ No newline at end of file
+        if message:
+            # Con adjunto, sus miniaturas (o null y 'attachment_ready' después)
+            message = thumbnails.decorate(self.socketio, message)
+            payload = {
+                'chat_id': data['chat_id'],
+                'message': message
+            }
+            # Queda pendiente para el resto de participantes hasta su ack
+            recipients = Chat.get_participant_ids(data['chat_id']) - {user_id}
+            delivery.enqueue(recipients, data['chat_id'], message['id'], payload)
+            self._to_chat('new_message', payload, data['chat_id'])
+
+    def on_send_message(self, data):
+        """Nombre antiguo de new_message (routes/socket_events.py)"""
+        self.on_new_message(data)
@@ -0,0 +1,104 @@
+"""Codificación compacta opcional de los eventos de /chat.
+
+El cliente la pide al conectar (auth {'encoding': 'msgpack'} o
+?encoding=msgpack) y a partir de ahí recibe cada evento como un único
+argumento binario MessagePack con claves cortas, sin campos nulos, fechas
+como segundos epoch y, en los mensajes, el autor solo por id y versión de
+perfil ('pv'): nombre y avatar le llegan una vez por conexión con el
+evento 'profiles'.
+
+Cada sala tiene una variante por codificación (chat_1 y chat_1|mp); una
+difusión se codifica una sola vez por variante, no por destinatario."""
+import time
+import zlib
+from datetime import date, datetime
+from src.config.settings import SOCKET_COMPACT_ENCODING
+from src.services.metrics import Metrics, Histogram
+
+try:
+    import msgpack
+except ImportError:  # sin msgpack todos los clientes reciben JSON
+    msgpack = None
+
+JSON = 'json'
+MSGPACK = 'msgpack'
+
+# Claves largas -> cortas (el resto viaja tal cual)
+KEYS = {
+    'id': 'i', 'chat_id': 'c', 'user_id': 'u', 'content': 't',
+    'message_type': 'k', 'file_url': 'f', 'file_size': 'z', 'sent_at': 's',
+    'read_at': 'r', 'status': 'st', 'message': 'm', 'is_typing': 'y',
+    'message_id': 'mi', 'up_to_message_id': 'up', 'after_message_id': 'am',
+    'online': 'on', 'offline': 'off', 'timestamp': 'ts', 'replayed': 'rp',
+    'error': 'e', 'users': 'us', 'name': 'n', 'avatar_url': 'a',
+    'thumbnails': 'th',
+}
+
+_stats = {'frames': 0, 'bytes': 0}
+_encode_seconds = Histogram((0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.005))
+
+
+def enabled():
+    return SOCKET_COMPACT_ENCODING and msgpack is not None
+
+
+def negotiate(requested):
+    """Codificación a usar para la conexión según lo que pide el cliente"""
+    return MSGPACK if requested == MSGPACK and enabled() else JSON
+
+
+def room_variant(room, encoding):
+    return room if encoding == JSON else f"{room}|mp"
+
+
+def profile_version(name, avatar_url):
+    """Versión corta del perfil: cambia si cambia el nombre o el avatar"""
+    return zlib.crc32(f"{name}\0{avatar_url or ''}".encode('utf-8')) & 0xFFFF
+
+
+def compact(value):
+    if isinstance(value, dict):
+        if 'user_name' in value:
+            # Mensaje: el perfil ya lo tiene el cliente; va su versión
+            value = dict(value)
+            value['pv'] = profile_version(value.pop('user_name'), value.pop('user_avatar', None))
+            value.pop('message_status', None)  # duplicado de status
+        # Los None no viajan: el cliente trata la clave ausente como null
+        return {KEYS.get(key, key): compact(item) for key, item in value.items() if item is not None}
+    if isinstance(value, (list, tuple)):
+        return [compact(item) for item in value]
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def encode(data):
+    start = time.perf_counter()
+    frame = msgpack.packb(compact(data), use_bin_type=True)
+    _encode_seconds.observe(time.perf_counter() - start)
+    _stats['frames'] += 1
+    _stats['bytes'] += len(frame)
+    return frame
+
+
+def profiles_payload(participants):
+    """Tabla de perfiles para internar en el cliente (evento 'profiles')"""
+    return {'users': [{
+        'id': user['id'],
+        'name': user['name'],
+        'avatar_url': user['avatar_url'],
+        'pv': profile_version(user['name'], user['avatar_url'])
+    } for user in participants]}
+
+
+def stats():
+    snapshot = dict(_stats)
+    snapshot['enabled'] = enabled()
+    snapshot['avg_bytes'] = round(_stats['bytes'] / _stats['frames'], 1) if _stats['frames'] else 0
+    snapshot['encode_seconds'] = _encode_seconds.snapshot()
+    return snapshot
+
+
+Metrics.register('socket_encoding', stats)
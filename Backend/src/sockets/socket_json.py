@@ -0,0 +1,25 @@
+"""Serializador JSON de los eventos de SocketIO.
+
+Convierte fechas igual que las respuestas REST de Flask (formato HTTP, que es
+el que parsea el cliente) y funciona también fuera de un contexto de app,
+p. ej. desde tareas en segundo plano."""
+import json
+from datetime import date
+from decimal import Decimal
+from werkzeug.http import http_date
+
+
+def _default(obj):
+    if isinstance(obj, date):
+        return http_date(obj)
+    if isinstance(obj, Decimal):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj, *args, **kwargs):
+    kwargs.setdefault('default', _default)
+    return json.dumps(obj, *args, **kwargs)
+
+
+loads = json.loads
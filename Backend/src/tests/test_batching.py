@@ -0,0 +1,85 @@
+"""Micro-batching de difusiones a salas (RoomBatcher y emit_to_chat).
+Uso (desde Backend/): python -m pytest -q src/tests"""
+import threading
+import time
+
+import pytest
+
+from src.sockets import chat
+from src.sockets.batching import RoomBatcher
+
+
+class FakeSocketIO:
+    def __init__(self):
+        self.emitted = []
+        self.tasks = []
+        self.sleeps = 0
+
+    def emit(self, event, data, to=None, namespace=None, **kwargs):
+        self.emitted.append((event, data, kwargs))
+
+    def start_background_task(self, target):
+        self.tasks.append(target)
+
+    def sleep(self, seconds):
+        self.sleeps += 1
+        time.sleep(seconds)
+
+
+@pytest.fixture
+def socketio():
+    return FakeSocketIO()
+
+
+@pytest.fixture
+def sent():
+    return []
+
+
+def make_batcher(sent, window_ms=1000, max_events=3):
+    return RoomBatcher(lambda socketio, event, data, chat_id, namespace:
+                       sent.append((event, data)), window_ms=window_ms, max_events=max_events)
+
+
+def test_full_buffer_is_sent_at_once(socketio, sent):
+    batcher = make_batcher(sent)
+    for n in range(3):
+        batcher.add(socketio, 'typing_indicator', {'n': n}, 1, '/chat')
+    assert sent == [('events', {'chat_id': 1, 'events': [
+        {'e': 'typing_indicator', 'd': {'n': n}} for n in range(3)]})]
+    assert batcher.stats()['size_flushes'] == 1
+
+
+def test_single_event_window_goes_out_plain(socketio, sent):
+    batcher = make_batcher(sent)
+    batcher.add(socketio, 'new_message', {'id': 1}, 1, '/chat')
+    batcher.add(socketio, 'new_message', {'id': 2}, 2, '/chat')
+    batcher._flush_window()
+    assert sorted(sent, key=lambda item: item[1]['id']) == [
+        ('new_message', {'id': 1}), ('new_message', {'id': 2})]
+    assert batcher.stats()['window_flushes'] == 1
+
+
+def test_idle_batcher_does_not_wake(socketio, sent):
+    batcher = make_batcher(sent, window_ms=5)
+    batcher.add(socketio, 'new_message', {'id': 1}, 1, '/chat')
+    worker = threading.Thread(target=socketio.tasks[0], daemon=True)
+    worker.start()
+    time.sleep(0.1)
+    assert sent == [('new_message', {'id': 1})]
+    # Una ventana por el evento y después nada: no se despierta cada 5 ms
+    assert socketio.sleeps == 1
+    batcher.add(socketio, 'new_message', {'id': 2}, 1, '/chat')
+    time.sleep(0.1)
+    assert sent[-1] == ('new_message', {'id': 2}) and socketio.sleeps == 2
+
+
+def test_skip_sid_event_flushes_room_first(socketio, monkeypatch):
+    monkeypatch.setattr(chat, 'batcher', RoomBatcher(chat._send_to_chat, window_ms=1000))
+    chat.emit_to_chat(socketio, 'new_message', {'id': 1}, 1)
+    chat.emit_to_chat(socketio, 'new_message', {'id': 2}, 1)
+    chat.emit_to_chat(socketio, 'user_joined', {'user_id': 7}, 1, skip_sid='sid7')
+    assert [event for event, _, _ in socketio.emitted] == ['events', 'user_joined']
+    assert [e['d']['id'] for e in socketio.emitted[0][1]['events']] == [1, 2]
+    assert socketio.emitted[1][2] == {'skip_sid': 'sid7'}
+    assert chat.batcher.stats()['barrier_flushes'] == 1
@@ -0,0 +1,74 @@
+"""gc-uploads frente a una subida del mismo contenido.
+Uso (desde Backend/): python -m pytest -q src/tests"""
+import os
+
+import pytest
+
+from src.models.upload_blob import UploadBlob
+from src.services.blob_store import BlobStore
+
+SHA = 'ab' * 32
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BlobStore(str(tmp_path))
+
+
+def write(path, data=b'x'):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as file:
+        file.write(data)
+
+
+def test_files_removed_before_each_row_commit(store, monkeypatch):
+    path = store.path_for(SHA, 'png')
+    write(path, b'12345')
+    write(path + '.t256.jpg')
+    seen = []
+
+    def collect_garbage(grace_seconds, remove_files):
+        blob = {'sha256': SHA, 'extension': 'png', 'size': 5}
+        remove_files(blob)
+        # Aún sin commit: la fila sigue bloqueada y los archivos ya no están
+        seen.append(os.path.exists(path) or os.path.exists(path + '.t256.jpg'))
+        return [blob]
+
+    monkeypatch.setattr(UploadBlob, 'collect_garbage', collect_garbage)
+    assert store.collect_garbage(60) == (1, 5)
+    assert seen == [False]
+
+
+def test_upload_after_gc_commit_keeps_its_file(store, monkeypatch):
+    path = store.path_for(SHA, 'png')
+    write(path, b'old')
+    rows = {(SHA, 'png')}
+
+    def collect_garbage(grace_seconds, remove_files):
+        rows.discard((SHA, 'png'))
+        blob = {'sha256': SHA, 'extension': 'png', 'size': 3}
+        remove_files(blob)
+        return [blob]
+
+    def register(sha256, extension, size):
+        created = (sha256, extension) not in rows
+        rows.add((sha256, extension))
+        return created
+
+    monkeypatch.setattr(UploadBlob, 'collect_garbage', collect_garbage)
+    monkeypatch.setattr(UploadBlob, 'register', register)
+    store.collect_garbage(60)
+    # register() esperaba el commit de gc-uploads; ahora inserta y coloca el archivo
+    incoming = os.path.join(store.incoming, 'subida')
+    write(incoming, b'new')
+    store.ingest(incoming, 'foto.png', 3, sha256=SHA)
+    with open(path, 'rb') as file:
+        assert file.read() == b'new'
+
+
+def test_lookup_does_not_resurrect_collected_blob(store, monkeypatch):
+    write(store.path_for(SHA, 'png'), b'12345')
+    monkeypatch.setattr(UploadBlob, 'get', lambda sha256, extension: {'size': 5})
+    # Entre get() y register() gc-uploads borró la fila: register la crea de nuevo
+    monkeypatch.setattr(UploadBlob, 'register', lambda sha256, extension, size: True)
+    assert store.lookup(SHA, 'foto.png', 5) is None
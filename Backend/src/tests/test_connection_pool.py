@@ -0,0 +1,126 @@
+"""Pool de conexiones (ConnectionPool) con una fábrica de conexiones falsa.
+Uso (desde Backend/): python -m pytest -q src/tests"""
+import threading
+import time
+
+import pytest
+
+from src.config.database import ConnectionPool, PoolTimeout
+
+
+class FakeRaw:
+    """Conexión física falsa: solo lo que el pool consulta al devolverla"""
+
+    def __init__(self, number):
+        self.number = number
+        self.unread_result = False
+        self.in_transaction = False
+        self.closed = False
+        self.rollbacks = 0
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.in_transaction = False
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(size=1, max_overflow=0, timeout=1.0, recycle=0):
+    pool = ConnectionPool('test', size, max_overflow, timeout, recycle)
+    pool.opened = []
+
+    def connect():
+        raw = FakeRaw(len(pool.opened) + 1)
+        pool.opened.append(raw)
+        return raw
+
+    pool._connect = connect
+    return pool
+
+
+def test_released_connection_is_reused():
+    pool = make_pool()
+    first = pool.get_connection()
+    raw = first._raw
+    first.close()
+    second = pool.get_connection()
+    assert second._raw is raw
+    assert len(pool.opened) == 1
+    assert pool.stats()['checkouts'] == 2
+
+
+def test_waits_until_a_connection_is_released():
+    pool = make_pool(timeout=5)
+    held = pool.get_connection()
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.get_connection()))
+    waiter.start()
+    time.sleep(0.05)
+    assert not got and pool.stats()['waiters'] == 1
+    held.close()
+    waiter.join(2)
+    assert got and got[0]._raw is pool.opened[0]
+    assert pool.stats()['timeouts'] == 0
+
+
+def test_timeout_when_nothing_is_released():
+    pool = make_pool(timeout=0.05)
+    pool.get_connection()
+    start = time.monotonic()
+    with pytest.raises(PoolTimeout):
+        pool.get_connection()
+    assert time.monotonic() - start >= 0.05
+    stats = pool.stats()
+    assert stats['timeouts'] == 1 and stats['waiters'] == 0 and stats['in_use'] == 1
+
+
+def test_overflow_connections_are_closed_on_release():
+    pool = make_pool(size=1, max_overflow=1, timeout=0.05)
+    base = pool.get_connection()
+    overflow = pool.get_connection()
+    assert pool.stats()['open'] == 2
+    with pytest.raises(PoolTimeout):
+        pool.get_connection()
+    overflow_raw = overflow._raw
+    overflow.close()
+    assert overflow_raw.closed
+    base.close()
+    stats = pool.stats()
+    assert stats['open'] == 1 and stats['idle'] == 1 and stats['in_use'] == 0
+
+
+def test_old_connection_is_recycled_on_checkout():
+    pool = make_pool(recycle=0.01)
+    first = pool.get_connection()
+    old = first._raw
+    first.close()
+    time.sleep(0.02)
+    second = pool.get_connection()
+    assert old.closed
+    assert second._raw is not old and len(pool.opened) == 2
+    assert pool.stats()['open'] == 1
+
+
+def test_release_rolls_back_open_transaction():
+    pool = make_pool()
+    connection = pool.get_connection()
+    raw = connection._raw
+    raw.in_transaction = True
+    connection.close()
+    connection.close()  # segundo close(): no se devuelve dos veces
+    assert raw.rollbacks == 1
+    assert pool.stats()['idle'] == 1
+
+
+def test_failed_connect_frees_the_slot():
+    pool = make_pool(timeout=0.05)
+
+    def refuse():
+        raise ConnectionError('sin servidor')
+
+    pool._connect = refuse
+    with pytest.raises(ConnectionError):
+        pool.get_connection()
+    stats = pool.stats()
+    assert stats['open'] == 0 and stats['errors'] == 1
@@ -0,0 +1,115 @@
+"""Reparto de lecturas entre primario y réplica (Database.get_connection):
+solo un commit hace que un usuario lea del primario.
+Uso (desde Backend/): python -m pytest -q src/tests"""
+import pytest
+
+from src.config import settings
+from src.config.database import Database, PooledConnection
+
+
+class FakeRaw:
+    unread_result = False
+    in_transaction = False
+
+    def __init__(self):
+        self.commits = 0
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakePool:
+    def __init__(self, name):
+        self.name = name
+        self.checkouts = 0
+
+    def get_connection(self):
+        self.checkouts += 1
+        return PooledConnection(self, FakeRaw(), 0)
+
+    def _release(self, raw, created_at):
+        pass
+
+    def statement_cache(self, raw):
+        return None
+
+    def stats(self):
+        return {}
+
+
+@pytest.fixture
+def pools(monkeypatch):
+    primary, replica = FakePool('primary'), FakePool('replica')
+    monkeypatch.setattr(Database, '_Database__connection_pool', primary)
+    monkeypatch.setattr(Database, '_Database__replica_pool', replica)
+    monkeypatch.setattr(Database, '_Database__recent_writers', {})
+    monkeypatch.setattr(Database, '_Database__routing', {
+        'writes': 0, 'primary_checkouts': 0, 'reads_primary': 0,
+        'reads_replica': 0, 'sticky_reads': 0})
+    return primary, replica
+
+
+def read(user_id):
+    connection = Database.get_connection(read_only=True, user_id=user_id)
+    connection.close()
+    return connection._pool.name
+
+
+def test_primary_read_without_commit_is_not_sticky(pools):
+    connection = Database.get_connection(user_id=1)
+    connection.close()
+    assert read(1) == 'replica'
+    stats = Database.routing_stats()
+    assert stats['writes'] == 0 and stats['primary_checkouts'] == 1
+
+
+def test_commit_makes_user_sticky(pools):
+    connection = Database.get_connection(user_id=1)
+    connection.commit()
+    connection.close()
+    assert read(1) == 'primary'
+    assert read(2) == 'replica'
+    stats = Database.routing_stats()
+    assert stats['writes'] == 1 and stats['sticky_reads'] == 1
+
+
+def test_scoped_commit_makes_user_sticky(pools):
+    token = Database.begin_scope()
+    try:
+        Database.get_connection(user_id=1).close()
+        assert Database.routing_stats()['writes'] == 0
+        Database.get_connection(user_id=1).commit()
+    finally:
+        Database.end_scope(token)
+    assert read(1) == 'primary'
+
+
+def test_transaction_records_writer_on_final_commit(pools):
+    with Database.transaction():
+        Database.get_connection(user_id=1).commit()
+        # Aplazado: aún no se ha confirmado nada
+        assert Database.routing_stats()['writes'] == 0
+    assert Database.routing_stats()['writes'] == 1
+    assert read(1) == 'primary'
+
+
+def test_rolled_back_transaction_is_not_a_write(pools):
+    with pytest.raises(RuntimeError):
+        with Database.transaction():
+            Database.get_connection(user_id=1).commit()
+            raise RuntimeError('falla el modelo')
+    assert Database.routing_stats()['writes'] == 0
+    assert read(1) == 'replica'
+
+
+def test_warm_up_without_credentials_only_logs(monkeypatch, capsys):
+    monkeypatch.setattr(Database, '_Database__connection_pool', None)
+    monkeypatch.setattr(settings, 'DB_HOST', None)
+    assert Database.warm_up() == 0
+    assert 'DB_HOST' in capsys.readouterr().out
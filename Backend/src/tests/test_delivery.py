@@ -0,0 +1,193 @@
+"""Colas de entrega por dispositivo: lo reenviado al reconectar debe salir
+igual que en vivo, sea cual sea el almacén, y el ack de un dispositivo no
+vacía la cola de otro. Uso (desde Backend/): python -m pytest -q src/tests"""
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+
+from src.services.delivery import (
+    DeliveryTracker, LocalDeliveryStore, RedisDeliveryStore, dumps_entry, loads_entry
+)
+from src.sockets import encoding
+from src.sockets.chat import ChatNamespace
+
+
+class FakeRedis:
+    """Lo justo de Redis (sorted sets y hashes) para RedisDeliveryStore"""
+
+    def __init__(self):
+        self.zsets = {}
+        self.hashes = {}
+        self._queued = None
+
+    def pipeline(self):
+        self._queued = []
+        return self
+
+    def execute(self):
+        queued, self._queued = self._queued, None
+        return [call() for call in queued]
+
+    def _run(self, call):
+        if self._queued is not None:
+            self._queued.append(call)
+            return self
+        return call()
+
+    def zadd(self, key, mapping):
+        return self._run(lambda: self.zsets.setdefault(key, {}).update(mapping))
+
+    def zcard(self, key):
+        return self._run(lambda: len(self.zsets.get(key, {})))
+
+    def expire(self, key, ttl):
+        return self._run(lambda: True)
+
+    def zrange(self, key, start, stop):
+        return self._run(lambda: [m for m, _ in sorted(self.zsets.get(key, {}).items(),
+                                                       key=lambda item: item[1])])
+
+    def zrangebyscore(self, key, low, high):
+        return [m for m, score in self.zsets.get(key, {}).items() if score <= high]
+
+    def zpopmin(self, key, count):
+        zset = self.zsets.get(key, {})
+        popped = sorted(zset.items(), key=lambda item: item[1])[:count]
+        for member, _ in popped:
+            del zset[member]
+        return popped
+
+    def hsetnx(self, key, field, value):
+        return self._run(lambda: self.hashes.setdefault(key, {}).setdefault(str(field), value))
+
+    def zrem(self, key, *members):
+        zset = self.zsets.get(key, {})
+        return sum(1 for m in members if zset.pop(m, None) is not None)
+
+    def hget(self, key, field):
+        return self.hashes.get(key, {}).get(field)
+
+    def hset(self, key, field, value):
+        return self._run(lambda: self.hashes.setdefault(key, {}).__setitem__(field, value))
+
+    def hdel(self, key, *fields):
+        return sum(1 for f in fields if self.hashes.get(key, {}).pop(f, None) is not None)
+
+    def hgetall(self, key):
+        return self._run(lambda: dict(self.hashes.get(key, {})))
+
+    def delete(self, *keys):
+        def delete():
+            for key in keys:
+                self.hashes.pop(key, None)
+                self.zsets.pop(key, None)
+        return self._run(delete)
+
+
+@pytest.fixture
+def redis_store():
+    store = RedisDeliveryStore('redis://localhost:6379/0')
+    store._redis = FakeRedis()
+    return store
+
+
+def payload():
+    return {'chat_id': 3, 'message': {
+        'id': 10, 'chat_id': 3, 'content': 'hola', 'file_size': 12,
+        'sent_at': datetime(2025, 5, 1, 9, 30, 15), 'read_at': None,
+        'due': date(2025, 5, 2)}}
+
+
+def test_entry_round_trip_keeps_types():
+    original = payload()
+    original['message']['amount'] = Decimal('12.50')
+    entry = loads_entry(dumps_entry({'chat_id': 3, 'payload': original}))
+    message = entry['payload']['message']
+    assert message['sent_at'] == datetime(2025, 5, 1, 9, 30, 15)
+    assert message['due'] == date(2025, 5, 2)
+    assert message['amount'] == '12.50'
+
+
+def test_redis_replay_matches_local_replay(redis_store):
+    local = LocalDeliveryStore()
+    for store in (local, redis_store):
+        store.register(1, 'phone')
+        store.push(1, 'phone', 3, 10, payload())
+    local_payloads, _ = local.pending(1, 'phone')
+    redis_payloads, _ = redis_store.pending(1, 'phone')
+    # El cliente compacto recibe la fecha como epoch en los dos casos
+    assert encoding.compact(redis_payloads[0]) == encoding.compact(local_payloads[0])
+    assert isinstance(encoding.compact(redis_payloads[0])['m']['s'], int)
+
+
+@pytest.fixture(params=['local', 'redis'])
+def tracker(request, redis_store):
+    store = LocalDeliveryStore() if request.param == 'local' else redis_store
+    store.max_len = 2
+    return DeliveryTracker(store)
+
+
+def message(message_id, chat_id=3):
+    return {'chat_id': chat_id, 'message': {'id': message_id}}
+
+
+def replayed_ids(tracker, device_id):
+    payloads, gaps = tracker.replay(1, device_id)
+    return [p['message']['id'] for p in payloads], gaps
+
+
+def test_ack_from_one_device_keeps_the_others_queue(tracker):
+    tracker.register(1, 'phone')
+    tracker.register(1, 'laptop')
+    tracker.enqueue({1}, 3, 10, message(10))
+    tracker.ack(1, 'phone', 3, 10)
+    assert replayed_ids(tracker, 'phone') == ([], {})
+    assert replayed_ids(tracker, 'laptop') == ([10], {})
+
+
+def test_overflow_gap_is_per_device(tracker):
+    tracker.register(1, 'phone')
+    tracker.register(1, 'laptop')
+    tracker.enqueue({1}, 3, 10, message(10))
+    tracker.ack(1, 'phone', 3, 10)
+    for message_id in (11, 12):
+        tracker.enqueue({1}, 3, message_id, message(message_id))
+    assert replayed_ids(tracker, 'phone') == ([11, 12], {})
+    # El portátil perdió el 10 al desbordarse: se le señala el hueco una vez
+    assert replayed_ids(tracker, 'laptop') == ([11, 12], {3: 9})
+    assert replayed_ids(tracker, 'laptop') == ([11, 12], {})
+
+
+def test_clients_without_acks_get_no_queue(tracker):
+    tracker.enqueue({1}, 3, 10, message(10))
+    tracker.register(1, 'phone')
+    assert replayed_ids(tracker, 'phone') == ([], {})
+    assert tracker.stats()['queued'] == 0
+
+
+def test_expired_device_starts_empty(monkeypatch):
+    store = LocalDeliveryStore(ttl=60)
+    tracker = DeliveryTracker(store)
+    now = [1000.0]
+    monkeypatch.setattr('src.services.delivery.time.monotonic', lambda: now[0])
+    tracker.register(1, 'phone')
+    tracker.enqueue({1}, 3, 10, message(10))
+    now[0] += 61
+    assert store.devices(1) == []
+    tracker.enqueue({1}, 3, 11, message(11))
+    tracker.register(1, 'phone')
+    # Sin el 11 (no se guardó mientras estaba caducada) no se reenvía el 10 solo
+    assert replayed_ids(tracker, 'phone') == ([], {})
+
+
+@pytest.mark.parametrize('auth, device_id', [
+    ({'acks': True, 'device_id': 'phone-1'}, 'phone-1'),
+    ({'device_id': 'phone-1'}, None),                     # el cliente no confirma
+    ({'acks': 'yes', 'device_id': 'phone-1'}, None),
+    ({'acks': True, 'device_id': 'a:b'}, None),           # no puede formar claves
+    ({'acks': True}, None),
+    (None, None),
+])
+def test_only_ack_capable_devices_get_a_queue(auth, device_id):
+    assert ChatNamespace._ack_device(auth) == device_id
@@ -0,0 +1,165 @@
+"""Ventana caliente de mensajes (RecentMessageCache) y su uso en
+Message.get_by_chat. Uso (desde Backend/): python -m pytest -q src/tests"""
+from datetime import datetime
+
+import pytest
+
+from src.config.database import Database
+from src.config.settings import MESSAGE_CACHE_WINDOW
+from src.models.chat import Message
+from src.services.message_cache import RecentMessageCache
+
+
+def make_message(message_id, chat_id=1):
+    return {'id': message_id, 'chat_id': chat_id, 'user_id': 7, 'content': f"m{message_id}",
+            'message_type': 'text', 'file_url': None, 'file_size': None,
+            'sent_at': datetime(2025, 5, 1), 'read_at': None, 'status': 'sent',
+            'message_status': 'sent', 'user_name': 'Ana', 'user_avatar': None}
+
+
+def ids(page):
+    return [message['id'] for message in page['messages']]
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    RecentMessageCache._chats.clear()
+    RecentMessageCache._total = 0
+    yield
+    RecentMessageCache._chats.clear()
+    RecentMessageCache._total = 0
+
+
+def test_hit_when_newest_matches_summary():
+    RecentMessageCache.fill(1, [make_message(i) for i in (1, 2, 3)], complete=True)
+    page = RecentMessageCache.get_latest(1, 2, last_message_id=3)
+    assert ids(page) == [2, 3]
+    assert page['has_more'] is True
+
+
+def test_stale_window_is_dropped():
+    # Se llenó antes de que otro worker (o un envío concurrente) escribiera el 4
+    RecentMessageCache.fill(1, [make_message(i) for i in (1, 2, 3)], complete=True)
+    assert RecentMessageCache.get_latest(1, 10, last_message_id=4) is None
+    assert 1 not in RecentMessageCache._chats
+    assert RecentMessageCache._total == 0
+
+
+def test_empty_chat_matches_missing_summary():
+    RecentMessageCache.fill(1, [], complete=True)
+    assert RecentMessageCache.get_latest(1, 10, last_message_id=None) == {
+        'messages': [], 'has_more': False}
+
+
+def test_append_keeps_id_order():
+    RecentMessageCache.fill(1, [make_message(i) for i in (1, 2)], complete=True)
+    RecentMessageCache.append(make_message(4))
+    RecentMessageCache.append(make_message(3))
+    RecentMessageCache.append(make_message(4))  # repetido: se ignora
+    assert ids(RecentMessageCache.get_latest(1, 10, last_message_id=4)) == [1, 2, 3, 4]
+    assert RecentMessageCache._total == 4
+
+
+def test_append_without_window_is_noop():
+    RecentMessageCache.append(make_message(5))
+    assert RecentMessageCache._total == 0
+    assert RecentMessageCache.get_latest(1, 10, last_message_id=5) is None
+
+
+def test_full_window_drops_oldest_and_keeps_order():
+    first = list(range(1, MESSAGE_CACHE_WINDOW + 1))
+    RecentMessageCache.fill(1, [make_message(i) for i in first], complete=True)
+    newest = MESSAGE_CACHE_WINDOW + 2
+    RecentMessageCache.append(make_message(newest))
+    RecentMessageCache.append(make_message(newest - 1))
+    page = RecentMessageCache.get_latest(1, MESSAGE_CACHE_WINDOW, last_message_id=newest)
+    assert ids(page) == list(range(3, newest + 1))
+    assert page['has_more'] is True
+    assert RecentMessageCache._total == MESSAGE_CACHE_WINDOW
+    # Más antiguo que toda la ventana llena: no entra
+    RecentMessageCache.append(make_message(0))
+    assert ids(RecentMessageCache.get_latest(1, 1, last_message_id=newest)) == [newest]
+    assert RecentMessageCache._total == MESSAGE_CACHE_WINDOW
+
+
+def test_remove_last_message_matches_refreshed_summary():
+    RecentMessageCache.fill(1, [make_message(i) for i in (1, 2, 3)], complete=True)
+    RecentMessageCache.remove(1, 3)
+    assert ids(RecentMessageCache.get_latest(1, 10, last_message_id=2)) == [1, 2]
+
+
+class FakeCursor:
+    """Responde al resumen y a la página de mensajes desde `db`"""
+
+    def __init__(self, db):
+        self.db = db
+        self.result = None
+
+    def execute(self, query, params=()):
+        self.db['queries'].append(query)
+        if 'chat_summaries' in query:
+            newest = max((m['id'] for m in self.db['messages']), default=None)
+            self.result = [{'last_message_id': newest}] if newest else []
+        else:
+            rows = sorted(self.db['messages'], key=lambda m: m['id'], reverse=True)
+            if 'm.id < %s' in query:
+                rows = [m for m in rows if m['id'] < params[1]]
+            self.result = [dict(m) for m in rows[:params[-1]]]
+
+    def fetchone(self):
+        return self.result[0] if self.result else None
+
+    def fetchall(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self, dictionary=False):
+        return FakeCursor(self.db)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = {'messages': [], 'queries': [], 'read_only': []}
+
+    def get_connection(read_only=False, user_id=None):
+        db['read_only'].append(read_only)
+        return FakeConnection(db)
+
+    monkeypatch.setattr(Database, 'get_connection', get_connection)
+    return db
+
+
+def test_first_page_reads_primary_and_fills(db):
+    db['messages'] = [make_message(i) for i in (1, 2, 3)]
+    assert ids(Message.get_by_chat(1, limit=2)) == [2, 3]
+    assert db['read_only'] == [False]
+    db['queries'].clear()
+    # Segunda vez: solo la consulta del resumen
+    assert ids(Message.get_by_chat(1, limit=2)) == [2, 3]
+    assert len(db['queries']) == 1 and 'chat_summaries' in db['queries'][0]
+
+
+def test_message_written_elsewhere_forces_refill(db):
+    db['messages'] = [make_message(i) for i in (1, 2, 3)]
+    Message.get_by_chat(1, limit=10)
+    # Escrito sin pasar por este proceso (otro worker, o entre la lectura
+    # de la página y el llenado): append() no llegó a la ventana
+    db['messages'].append(make_message(4))
+    assert ids(Message.get_by_chat(1, limit=10)) == [1, 2, 3, 4]
+    assert ids(Message.get_by_chat(1, limit=10)) == [1, 2, 3, 4]
+
+
+def test_older_pages_may_use_replica(db):
+    db['messages'] = [make_message(i) for i in (1, 2, 3)]
+    assert ids(Message.get_by_chat(1, limit=10, before_message_id=3)) == [1, 2]
+    assert db['read_only'] == [True]
@@ -0,0 +1,97 @@
+"""Cursor de lectura (Message.mark_read_up_to): el id recibido del cliente
+se valida y se acota al último mensaje del chat.
+Uso (desde Backend/): python -m pytest -q src/tests"""
+import pytest
+
+from src.config.database import Database
+from src.models.chat import Message
+from src.services.message_cache import RecentMessageCache
+
+
+class FakeCursor:
+    """Lo justo de messages, chat_summaries y chat_participants"""
+
+    def __init__(self, db):
+        self.db = db
+        self.result = None
+
+    def execute(self, query, params=()):
+        db = self.db
+        if 'LEAST(m.id' in query:
+            message_id, chat_id = params
+            found = [m for m in db['messages'] if m['id'] == message_id and m['chat_id'] == chat_id]
+            last = max((m['id'] for m in db['messages'] if m['chat_id'] == chat_id), default=None)
+            self.result = [{'up_to': min(message_id, last)}] if found else []
+        elif query.lstrip().startswith('SELECT last_read_message_id'):
+            self.result = [dict(db['participant'])]
+        elif 'COUNT(*)' in query:
+            chat_id, after, user_id = params
+            self.result = [{'unread': sum(1 for m in db['messages'] if m['chat_id'] == chat_id
+                                          and m['id'] > after and m['user_id'] != user_id)}]
+        elif query.lstrip().startswith('UPDATE chat_participants'):
+            db['participant'].update(last_read_message_id=params[0], unread_count=params[1])
+        else:
+            self.result = []
+
+    def fetchone(self):
+        return self.result[0] if self.result else None
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self, dictionary=False):
+        return FakeCursor(self.db)
+
+    def commit(self):
+        self.db['commits'] += 1
+
+    def rollback(self):
+        self.db['rollbacks'] += 1
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = {'messages': [{'id': i, 'chat_id': 1, 'user_id': 2} for i in (10, 11, 12)]
+          + [{'id': 20, 'chat_id': 9, 'user_id': 2}],
+          'participant': {'last_read_message_id': 0, 'unread_count': 3},
+          'commits': 0, 'rollbacks': 0}
+    monkeypatch.setattr(Database, 'get_connection',
+                        lambda read_only=False, user_id=None: FakeConnection(db))
+    monkeypatch.setattr(RecentMessageCache, 'mark_read_up_to', lambda *args: None)
+    return db
+
+
+def test_marks_up_to_message(db):
+    assert Message.mark_read_up_to(1, 7, 11) == {'marked': 2, 'up_to_message_id': 11}
+    assert db['participant'] == {'last_read_message_id': 11, 'unread_count': 1}
+
+
+@pytest.mark.parametrize('bogus', [0, -5])
+def test_non_positive_id_is_rejected(db, bogus):
+    with pytest.raises(ValueError):
+        Message.mark_read_up_to(1, 7, bogus)
+    assert db['participant']['last_read_message_id'] == 0
+
+
+@pytest.mark.parametrize('bogus', [20, 10 ** 12])
+def test_id_outside_the_chat_is_rejected(db, bogus):
+    # 20 es de otro chat; el otro no existe y dejaría el cursor por delante
+    # de todos los mensajes futuros
+    with pytest.raises(ValueError):
+        Message.mark_read_up_to(1, 7, bogus)
+    assert db['participant']['last_read_message_id'] == 0
+    assert db['commits'] == 0 and db['rollbacks'] == 1
+
+
+def test_cursor_only_moves_forward(db):
+    Message.mark_read_up_to(1, 7, 12)
+    assert Message.mark_read_up_to(1, 7, 10) == {'marked': 0, 'up_to_message_id': 10}
+    assert db['participant']['last_read_message_id'] == 12
@@ -0,0 +1,21 @@
+"""Elección del almacén compartido (resolve_redis_url).
+Uso (desde Backend/): python -m pytest -q src/tests"""
+from src.services import redis_url
+from src.services.redis_url import resolve_redis_url
+
+
+def test_explicit_url_wins(monkeypatch):
+    monkeypatch.setattr(redis_url, 'SOCKETIO_MESSAGE_QUEUE', 'redis://queue:6379/0')
+    assert resolve_redis_url('redis://own:6379/1') == 'redis://own:6379/1'
+
+
+def test_falls_back_to_redis_message_queue(monkeypatch):
+    monkeypatch.setattr(redis_url, 'SOCKETIO_MESSAGE_QUEUE', 'rediss://queue:6380/0')
+    assert resolve_redis_url(None) == 'rediss://queue:6380/0'
+
+
+def test_non_redis_queue_means_local_memory(monkeypatch):
+    monkeypatch.setattr(redis_url, 'SOCKETIO_MESSAGE_QUEUE', 'amqp://queue')
+    assert resolve_redis_url(None) is None
+    monkeypatch.setattr(redis_url, 'SOCKETIO_MESSAGE_QUEUE', None)
+    assert resolve_redis_url('') is None
@@ -0,0 +1,41 @@
+"""Versión de esquema ('v') en los eventos que envía el cliente.
+Uso (desde Backend/): python -m pytest -q src/tests"""
+import pytest
+from flask_socketio import Namespace
+
+from src.sockets.chat import SCHEMA_VERSION, ChatNamespace
+
+
+class FakeSocketIO:
+    def __init__(self):
+        self.emitted = []
+
+    def emit(self, event, data, to=None, namespace=None):
+        self.emitted.append((event, data, to))
+
+
+@pytest.fixture
+def namespace(monkeypatch):
+    dispatched = []
+    monkeypatch.setattr(Namespace, 'trigger_event',
+                        lambda self, event, *args: dispatched.append(event))
+    namespace = ChatNamespace('/chat')
+    namespace.socketio = FakeSocketIO()
+    namespace.dispatched = dispatched
+    return namespace
+
+
+@pytest.mark.parametrize('data', [{}, {'v': SCHEMA_VERSION}, {'v': 0}, None])
+def test_current_or_missing_version_is_dispatched(namespace, data):
+    namespace.trigger_event('typing', 'sid1', data)
+    assert namespace.dispatched == ['typing']
+    assert namespace.socketio.emitted == []
+
+
+@pytest.mark.parametrize('version', [SCHEMA_VERSION + 1, '2', None, True, 1.5, [1]])
+def test_unsupported_version_gets_error_event(namespace, version):
+    namespace.trigger_event('typing', 'sid1', {'v': version, 'chat_id': 1})
+    assert namespace.dispatched == []
+    [(event, data, to)] = namespace.socketio.emitted
+    assert event == 'error' and to == 'sid1'
+    assert data['error'] == 'Versión de esquema no soportada' and data['event'] == 'typing'
@@ -0,0 +1,54 @@
+"""Difusión a las variantes de sala (JSON y compacta) de /chat.
+Uso (desde Backend/): python -m pytest -q src/tests"""
+import pytest
+
+from src.sockets import chat, encoding
+
+
+class FakeManager:
+    def __init__(self, rooms):
+        self.rooms = rooms
+
+    def get_participants(self, namespace, room):
+        return iter(self.rooms.get(room, ()))
+
+
+class FakeSocketIO:
+    def __init__(self, rooms):
+        self.server = type('Server', (), {'manager': FakeManager(rooms)})()
+        self.emitted = []
+
+    def emit(self, event, data, to=None, namespace=None, **kwargs):
+        self.emitted.append(to)
+
+
+@pytest.fixture
+def compact_on(monkeypatch):
+    monkeypatch.setattr(encoding, 'SOCKET_COMPACT_ENCODING', True)
+    monkeypatch.setattr(chat, 'SOCKETIO_MESSAGE_QUEUE', None)
+
+
+def test_compact_is_off_by_default():
+    socketio = FakeSocketIO({'chat_1|mp': [('sid', 'eio')]})
+    chat._send_to_chat(socketio, 'typing', {'chat_id': 1}, 1, '/chat')
+    assert socketio.emitted == ['chat_1']
+
+
+def test_compact_variant_skipped_without_compact_sockets(compact_on):
+    socketio = FakeSocketIO({'chat_1': [('sid', 'eio')]})
+    chat._send_to_chat(socketio, 'typing', {'chat_id': 1}, 1, '/chat')
+    assert socketio.emitted == ['chat_1']
+
+
+def test_compact_variant_sent_when_room_has_compact_socket(compact_on):
+    socketio = FakeSocketIO({'chat_1|mp': [('sid', 'eio')]})
+    chat._send_to_chat(socketio, 'typing', {'chat_id': 1}, 1, '/chat')
+    assert socketio.emitted == ['chat_1', 'chat_1|mp']
+
+
+def test_message_queue_always_publishes_compact_variant(compact_on, monkeypatch):
+    # Los sockets compactos pueden estar en otro worker
+    monkeypatch.setattr(chat, 'SOCKETIO_MESSAGE_QUEUE', 'redis://localhost:6379/0')
+    socketio = FakeSocketIO({})
+    chat._send_to_chat(socketio, 'typing', {'chat_id': 1}, 1, '/chat')
+    assert socketio.emitted == ['chat_1', 'chat_1|mp']
@@ -0,0 +1,117 @@
+"""Sincronización incremental (GET /api/sync): token, instantánea completa,
+paginación y margen de asentamiento. Uso (desde Backend/): python -m pytest -q src/tests"""
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask
+
+from src.config.settings import generate_token
+from src.models.change_log import ChangeLog
+from src.models.chat import Chat
+from src.routes import sync as sync_route
+from src.routes.sync import _decode_token, _encode_token, sync
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """change_log en memoria; las entidades se devuelven tal cual se piden"""
+    db = {'log': [], 'first_id': None, 'settled_id': 0, 'chats': []}
+    monkeypatch.setattr(ChangeLog, 'get_since', lambda user_id, since_id, limit:
+                        [row for row in db['log'] if row['id'] > since_id][:limit])
+    monkeypatch.setattr(ChangeLog, 'get_first_id', lambda: db['first_id'])
+    monkeypatch.setattr(ChangeLog, 'get_settled_id', lambda user_id, before: db['settled_id'])
+    monkeypatch.setattr(Chat, 'get_user_chats', lambda user_id, chat_ids=None, active_since=None:
+                        [{'id': chat_id} for chat_id in (chat_ids or [])])
+    monkeypatch.setitem(sync_route.ENTITIES, 'note', ('notes', lambda user_id, ids:
+                        [{'id': note_id} for note_id in (ids if ids is not None else [1, 2])]))
+    for entity, key in (('task', 'tasks'), ('event', 'events')):
+        monkeypatch.setitem(sync_route.ENTITIES, entity, (key, lambda user_id, ids: []))
+    monkeypatch.setattr(sync_route, 'SYNC_SETTLE_SECONDS', 2)
+    return db
+
+
+def log(change_id, entity_id, seconds_ago=60, op='upsert', entity='note'):
+    return {'id': change_id, 'entity': entity, 'entity_id': entity_id, 'op': op,
+            'changed_at': datetime.now().replace(microsecond=0) - timedelta(seconds=seconds_ago)}
+
+
+def call(since=None):
+    app = Flask(__name__)
+    url = '/api/sync' + (f'?since={since}' if since is not None else '')
+    headers = {'Authorization': f'Bearer {generate_token(7)}'}
+    with app.test_request_context(url, headers=headers):
+        response, status = sync()
+    return status, response.get_json()
+
+
+def token_at(change_id, seconds_ago=3600):
+    return _encode_token(change_id, datetime.now().replace(microsecond=0) - timedelta(seconds=seconds_ago))
+
+
+def test_token_round_trip():
+    horizon = datetime(2025, 5, 1, 9, 30, 15)
+    assert _encode_token(42, horizon) == '42.20250501093015'
+    assert _decode_token('42.20250501093015') == (42, horizon)
+
+
+@pytest.mark.parametrize('token', ['abc', '42', '42.', '42.2025', 'x.20250501093015',
+                                   '42.20250501093015junk', '42.20251301093015'])
+def test_malformed_token_is_400(db, token):
+    with pytest.raises(ValueError):
+        _decode_token(token)
+    status, body = call(token)
+    assert status == 400 and 'error' in body
+
+
+def test_without_token_returns_full_snapshot(db):
+    db['settled_id'] = 9
+    status, body = call()
+    assert status == 200 and body['full'] is True and body['has_more'] is False
+    assert body['notes'] == {'upserts': [{'id': 1}, {'id': 2}], 'deleted': []}
+    assert _decode_token(body['token'])[0] == 9
+
+
+def test_token_older_than_pruned_log_falls_back_to_snapshot(db):
+    db['first_id'] = 100
+    db['log'] = [log(100, 5)]
+    assert call(token_at(50))[1]['full'] is True
+    # 99 es justo el anterior al primero conservado: el registro aún lo cubre
+    status, body = call(token_at(99))
+    assert body['full'] is False and body['notes']['upserts'] == [{'id': 5}]
+
+
+def test_has_more_pages_through_the_log(db, monkeypatch):
+    monkeypatch.setattr(sync_route, 'SYNC_PAGE_SIZE', 2)
+    db['log'] = [log(1, 10), log(2, 11), log(3, 12, op='delete')]
+    status, body = call(token_at(0))
+    assert body['has_more'] is True
+    assert body['notes'] == {'upserts': [{'id': 10}, {'id': 11}], 'deleted': []}
+    assert _decode_token(body['token'])[0] == 2
+    status, body = call(body['token'])
+    assert body['has_more'] is False
+    assert body['notes'] == {'upserts': [], 'deleted': [12]}
+    assert _decode_token(body['token'])[0] == 3
+
+
+def test_token_stops_before_first_unsettled_change(db):
+    # El 2 se escribió hace nada: una transacción anterior aún sin confirmar
+    # podría tener un id menor, así que el token no pasa del 1 aunque el 3
+    # ya esté asentado
+    db['log'] = [log(1, 10), log(2, 11, seconds_ago=0), log(3, 12)]
+    status, body = call(token_at(0))
+    assert {note['id'] for note in body['notes']['upserts']} == {10, 11, 12}
+    assert _decode_token(body['token'])[0] == 1
+    # La siguiente llamada los repite: son upserts, no cambia nada
+    assert {note['id'] for note in call(body['token'])[1]['notes']['upserts']} == {11, 12}
+
+
+def test_chat_horizon_never_moves_backwards(db):
+    ahead = datetime.now().replace(microsecond=0) + timedelta(hours=1)
+    status, body = call(_encode_token(0, ahead))
+    assert _decode_token(body['token'])[1] == ahead
+
+
+def test_upsert_of_row_deleted_later_becomes_tombstone(db, monkeypatch):
+    monkeypatch.setitem(sync_route.ENTITIES, 'note', ('notes', lambda user_id, ids: []))
+    db['log'] = [log(1, 10)]
+    assert call(token_at(0))[1]['notes'] == {'upserts': [], 'deleted': [10]}
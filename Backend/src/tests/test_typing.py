@@ -0,0 +1,81 @@
+"""Indicadores de "escribiendo" (TypingCoalescer) con un reloj inyectado.
+Uso (desde Backend/): python -m pytest -q src/tests"""
+import pytest
+
+from src.services.typing import TypingCoalescer
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def emitted():
+    return []
+
+
+@pytest.fixture
+def typing(clock, emitted):
+    return TypingCoalescer(lambda *event: emitted.append(event), interval=1.0, ttl=6.0, clock=clock)
+
+
+def test_repeated_state_is_emitted_once(typing, emitted):
+    typing.update(1, 7, True, skip_sid='a')
+    typing.update(1, 7, True, skip_sid='a')
+    typing.update(1, 7, True, skip_sid='a')
+    assert emitted == [(1, 7, True, 'a')]
+    assert typing.stats()['suppressed'] == 2
+
+
+def test_change_within_interval_is_held_and_skips_sender(typing, clock, emitted):
+    typing.update(1, 7, True, skip_sid='a')
+    clock.now += 0.3
+    typing.update(1, 7, False, skip_sid='a')
+    typing.flush()
+    assert emitted == [(1, 7, True, 'a')]
+    clock.now += 0.7
+    typing.flush()
+    # El barrido tampoco devuelve el indicador a quien escribe
+    assert emitted == [(1, 7, True, 'a'), (1, 7, False, 'a')]
+    assert typing.stats()['active'] == 0
+
+
+def test_held_change_that_reverts_is_dropped(typing, clock, emitted):
+    typing.update(1, 7, True, skip_sid='a')
+    clock.now += 0.3
+    typing.update(1, 7, False, skip_sid='a')
+    typing.update(1, 7, True, skip_sid='a')
+    clock.now += 1
+    typing.flush()
+    assert emitted == [(1, 7, True, 'a')]
+
+
+def test_typing_expires_without_refresh(typing, clock, emitted):
+    typing.update(1, 7, True, skip_sid='a')
+    clock.now += 5
+    typing.update(1, 7, True, skip_sid='a')  # refresco: alarga la caducidad
+    clock.now += 5
+    typing.flush()
+    assert emitted == [(1, 7, True, 'a')]
+    clock.now += 1.5
+    typing.flush()
+    assert emitted == [(1, 7, True, 'a'), (1, 7, False, 'a')]
+    assert typing.stats()['expired'] == 1
+
+
+def test_forget_user_turns_off_every_chat(typing, emitted):
+    typing.update(1, 7, True, skip_sid='a')
+    typing.update(2, 7, True, skip_sid='b')
+    typing.update(2, 8, True, skip_sid='c')
+    typing.forget_user(7)
+    assert sorted(emitted[3:]) == [(1, 7, False, 'a'), (2, 7, False, 'b')]
+    assert typing.stats()['active'] == 1
@@ -0,0 +1,119 @@
+"""Subidas por partes (ChunkedUploadStore): offsets, límites, reanudación y
+limpieza. Uso (desde Backend/): python -m pytest -q src/tests"""
+import fcntl
+import hashlib
+import io
+import os
+import time
+
+import pytest
+
+from src.services.uploads import (
+    ChunkedUploadStore, UploadConflict, UploadError, UploadNotFound, UploadTooLarge
+)
+
+DATA = b'0123456789abcdef'
+
+
+class FakeBlobs:
+    """Lo que ChunkedUploadStore usa de BlobStore, sin base de datos"""
+
+    def __init__(self):
+        self.ingested = []
+
+    def ingest(self, path, filename, size, sha256=None):
+        with open(path, 'rb') as f:
+            data = f.read()
+        os.remove(path)
+        self.ingested.append((filename, size, sha256, data))
+        return {'file_url': f"/uploads/blobs/{filename}", 'size': size}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ChunkedUploadStore(str(tmp_path), FakeBlobs(), max_bytes=64, buffer_size=4)
+
+
+def test_offset_conflict_reports_server_offset(store):
+    upload = store.create(1, 'a.txt', len(DATA))
+    store.append(upload['upload_id'], 1, 0, io.BytesIO(DATA[:6]))
+    with pytest.raises(UploadConflict) as error:
+        store.append(upload['upload_id'], 1, 4, io.BytesIO(DATA[4:]))
+    assert error.value.status == 409
+    assert error.value.details == {'offset': 6}
+
+
+def test_declared_size_over_limit_is_413(store):
+    with pytest.raises(UploadTooLarge) as error:
+        store.create(1, 'a.txt', 65)
+    assert error.value.status == 413
+    with pytest.raises(UploadError):
+        store.create(1, 'a.txt', 0)
+
+
+def test_part_beyond_declared_size_is_413_and_keeps_what_fits(store):
+    upload = store.create(1, 'a.txt', 10)
+    with pytest.raises(UploadTooLarge) as error:
+        store.append(upload['upload_id'], 1, 0, io.BytesIO(DATA))
+    # Se corta al leer, no al final: lo que cabía queda escrito
+    assert error.value.details['offset'] <= 10
+    assert store.status(upload['upload_id'], 1)['offset'] == error.value.details['offset']
+
+
+def test_resume_after_cut_and_finalize(store):
+    upload = store.create(1, 'a.txt', len(DATA))
+    upload_id = upload['upload_id']
+    assert store.append(upload_id, 1, 0, io.BytesIO(DATA[:5]))['offset'] == 5
+    with pytest.raises(UploadConflict):
+        store.finalize(upload_id, 1)
+    # Otro worker (o tras un reinicio): sin el hash en curso
+    store._hashers.clear()
+    offset = store.status(upload_id, 1)['offset']
+    assert store.append(upload_id, 1, offset, io.BytesIO(DATA[offset:]))['offset'] == len(DATA)
+    blob, meta = store.finalize(upload_id, 1)
+    assert meta['filename'] == 'a.txt'
+    # El hash se recalcula en ingest() al no tenerlo completo
+    assert store.blobs.ingested == [('a.txt', len(DATA), None, DATA)]
+    with pytest.raises(UploadNotFound):
+        store.status(upload_id, 1)
+
+
+def test_hash_is_computed_while_receiving(store):
+    upload = store.create(1, 'a.txt', len(DATA))
+    store.append(upload['upload_id'], 1, 0, io.BytesIO(DATA[:7]))
+    store.append(upload['upload_id'], 1, 7, io.BytesIO(DATA[7:]))
+    store.finalize(upload['upload_id'], 1)
+    assert store.blobs.ingested[0][2] == hashlib.sha256(DATA).hexdigest()
+
+
+def test_concurrent_part_is_rejected(store):
+    upload = store.create(1, 'a.txt', len(DATA))
+    part_path, _ = store._paths(upload['upload_id'])
+    with open(part_path, 'ab') as busy:
+        fcntl.flock(busy, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        with pytest.raises(UploadConflict, match='otra parte'):
+            store.append(upload['upload_id'], 1, 0, io.BytesIO(DATA))
+    assert store.append(upload['upload_id'], 1, 0, io.BytesIO(DATA))['offset'] == len(DATA)
+
+
+def test_other_user_cannot_see_upload(store):
+    upload = store.create(1, 'a.txt', len(DATA))
+    with pytest.raises(UploadNotFound):
+        store.status(upload['upload_id'], 2)
+    with pytest.raises(UploadNotFound):
+        store.status('../etc/passwd', 1)
+
+
+def test_prune_incomplete_removes_only_stale(store):
+    stale = store.create(1, 'old.txt', len(DATA))['upload_id']
+    fresh = store.create(1, 'new.txt', len(DATA))['upload_id']
+    leftover = os.path.join(store.incoming, 'direct.tmp')
+    open(leftover, 'wb').close()
+    past = time.time() - 3600
+    for path in (*store._paths(stale), leftover):
+        os.utime(path, (past, past))
+    assert store.prune_incomplete(max_age=60) == 1
+    assert not os.path.exists(leftover)
+    with pytest.raises(UploadNotFound):
+        store.status(stale, 1)
+    assert store.status(fresh, 1)['offset'] == 0